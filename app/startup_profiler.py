@@ -0,0 +1,97 @@
+# app/startup_profiler.py
+"""
+Modo de medição da inicialização: `python main.py --profile-startup`
+(no executável: variável de ambiente AUTOMATETOOLS_PROFILE_STARTUP=1).
+- Custo de importação por módulo, próprio e acumulado (como o `-X importtime`),
+  medido por um gancho em builtins.__import__, o que funciona também no .exe;
+- marcos da abertura (QApplication, janela criada, janela exibida).
+O relatório sai no stderr e em startup_profile.txt na pasta AppData
+(o .exe não tem console).
+"""
+
+import os
+import sys
+import time
+import builtins
+import threading
+
+PROFILE_FLAG = "--profile-startup"
+PROFILE_ENV = "AUTOMATETOOLS_PROFILE_STARTUP"
+REPORT_FILENAME = "startup_profile.txt"
+
+def requested(argv):
+    """O modo foi pedido pela linha de comando ou pelo ambiente?"""
+    return PROFILE_FLAG in argv or bool(os.environ.get(PROFILE_ENV))
+
+class StartupProfiler:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.imports = {}     # módulo -> (próprio, acumulado) em segundos
+        self.milestones = []  # [(marco, segundos desde o início)]
+        self._stack = []      # tempo gasto pelas importações filhas, por nível
+        self._thread = threading.get_ident()
+        self._original_import = None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def mark(self, nome):
+        self.milestones.append((nome, time.perf_counter() - self.t0))
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if threading.get_ident() != self._thread:
+            return original(name, globals, locals, fromlist, level)
+
+        module = name
+        if level > 0 and globals:
+            package = (globals.get('__package__') or '').rsplit('.', level - 1)[0]
+            module = f"{package}.{name}" if name else package
+        # Só a 1ª importação custa; as demais são consulta ao sys.modules
+        if module in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        inicio = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - inicio
+            filhos = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += total
+            self.imports.setdefault(module, (total - filhos, total))
+
+    def report(self, top=30):
+        linhas = ["== Inicialização =="]
+        linhas += [f"{segundos:8.3f}s  {nome}" for nome, segundos in self.milestones]
+        proprio_total = sum(p for p, _ in self.imports.values())
+        linhas.append(f"\n== Importações: {len(self.imports)} módulos, {proprio_total:.3f}s ==")
+        linhas.append(f"{'próprio':>10} {'acumulado':>10}  módulo")
+        ordenados = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for modulo, (proprio, acumulado) in ordenados[:top]:
+            linhas.append(f"{proprio * 1000:8.1f}ms {acumulado * 1000:8.1f}ms  {modulo}")
+        return "\n".join(linhas)
+
+    def finish(self, nome="Janela exibida"):
+        """Registra o último marco, remove o gancho e grava o relatório."""
+        self.mark(nome)
+        self.uninstall()
+        texto = self.report()
+        try:
+            from app.tasks.app_context import app_data_dir
+            pasta = app_data_dir()
+            os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, REPORT_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(texto + "\n")
+        except Exception:
+            pass # Sem o arquivo, fica o relatório no stderr
+        if sys.stderr is not None: # .exe sem console não tem stderr
+            print(texto, file=sys.stderr)
+        return texto
@@ -0,0 +1,69 @@
+# app/tasks/app_context.py
+"""
+Recursos compartilhados pelos managers, resolvidos sob demanda (não na importação):
+- root_data_dir(): raiz do AppData, SEM os nomes do programa (mapeamento, config.ini,
+  cache de extração), onde esses arquivos sempre ficaram: os managers eram criados
+  na importação, antes de o main.py registrar organização/aplicação;
+- app_data_dir(): pasta do programa, .../SuaOrganizacao/AutomateTools (banco EPG,
+  relatório de inicialização), como o banco EPG criado já com a janela aberta;
+- LazySingleton: cria a instância de um manager no primeiro uso, uma única vez.
+Assim importar as tasks não toca o disco nem carrega o Qt, e as pastas não
+dependem da ordem em que os nomes são definidos (GUI e batch_cli usam as mesmas).
+"""
+
+import os
+import threading
+
+# Nomes registrados no QCoreApplication pelo main.py
+ORGANIZATION_NAME = "SuaOrganizacao"
+APPLICATION_NAME = "AutomateTools"
+
+_app_data_dir = None
+_app_data_lock = threading.Lock()
+
+def app_data_dir():
+    """
+    Pasta AppData do programa (ex.: AppData/Roaming/SuaOrganizacao/AutomateTools),
+    resolvida UMA vez por processo com os nomes acima, estejam eles definidos ou não
+    no QCoreApplication (os nomes atuais são restaurados em seguida).
+    """
+    global _app_data_dir
+    if _app_data_dir is None:
+        with _app_data_lock:
+            if _app_data_dir is None:
+                from PySide6.QtCore import QCoreApplication, QStandardPaths
+                current = (QCoreApplication.organizationName(), QCoreApplication.applicationName())
+                QCoreApplication.setOrganizationName(ORGANIZATION_NAME)
+                QCoreApplication.setApplicationName(APPLICATION_NAME)
+                try:
+                    _app_data_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+                finally:
+                    QCoreApplication.setOrganizationName(current[0])
+                    QCoreApplication.setApplicationName(current[1])
+    return _app_data_dir
+
+def root_data_dir():
+    """
+    Raiz do AppData (ex.: AppData/Roaming): mapeamento, config.ini e cache de extração.
+    É a AppDataLocation sem nomes; derivada de app_data_dir() (<raiz>/<organização>/<aplicação>)
+    porque, com o QApplication já criado, o Qt trocaria os nomes vazios pelo do executável.
+    """
+    return os.path.dirname(os.path.dirname(app_data_dir()))
+
+class LazySingleton:
+    """Instância única criada por `factory()` na primeira chamada de get() (thread-safe)."""
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    @property
+    def created(self):
+        return self._instance is not None
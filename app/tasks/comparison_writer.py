@@ -0,0 +1,173 @@
+# app/tasks/comparison_writer.py
+"""
+Escrita da Grade Comparada a partir do DataFrame do diff (schedule_diff).
+Dois modos:
+- 'openpyxl'  : abre o template inteiro e reescreve as linhas de dados com
+                estilos nomeados registrados UMA vez (preserva todo o template).
+- 'xlsxwriter': caminho rápido; copia só as linhas de cabeçalho do template
+                (bloco lido pelo template_reader) para um arquivo novo e escreve as linhas em bloco.
+"""
+
+from copy import copy
+import xlsxwriter
+from openpyxl import load_workbook
+from openpyxl.styles import NamedStyle, PatternFill, Border, Side, Alignment
+from .template_reader import get_template_reader
+
+WRITER_MODES = ('openpyxl', 'xlsxwriter')
+
+# Cores da pintura (mesmas do relatório original)
+COLOR_CHANGED = "C6EFCE"   # Verde: NOVO / ALTERADO
+COLOR_SEPARATOR = "FFFF00" # Amarelo: linha divisória entre dias
+
+# Nomes dos estilos registrados no workbook (modo openpyxl)
+STYLE_NORMAL = 'grade_normal'
+STYLE_CHANGED = 'grade_alterado'
+STYLE_SEPARATOR = 'grade_separador'
+
+def _iter_output_rows(df_diff, cols_order):
+    """
+    Gera ('sep', None, None) antes de cada troca de data e ('row', valores, alterado)
+    para cada registro, na ordem em que devem ser escritos.
+    """
+    datas = df_diff['Data'].tolist()
+    changed = df_diff['Status'].isin(['NOVO', 'ALTERADO']).tolist()
+    columns = [df_diff[c].tolist() if c in df_diff.columns else [""] * len(df_diff) for c in cols_order]
+
+    last_date = None
+    for i, data in enumerate(datas):
+        if last_date and data != last_date:
+            yield 'sep', None, None
+        last_date = data
+        yield 'row', [col[i] for col in columns], changed[i]
+
+# ======================================================================
+# == MODO openpyxl (template completo)                                ==
+# ======================================================================
+
+def _register_named_styles(wb):
+    """Registra (uma vez por workbook) os estilos usados na pintura."""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    align = Alignment(horizontal='left', vertical='center')
+    # NamedStyle traz a própria fonte (Calibri 11); as células novas do relatório
+    # original ficavam com a fonte padrão do template (a 1ª da tabela de fontes)
+    font = copy(wb._fonts[0])
+
+    styles = [
+        NamedStyle(name=STYLE_NORMAL, font=font, border=border, alignment=align),
+        NamedStyle(name=STYLE_CHANGED, font=font, border=border, alignment=align,
+                   fill=PatternFill("solid", fgColor=COLOR_CHANGED)),
+        NamedStyle(name=STYLE_SEPARATOR, font=font, border=border,
+                   fill=PatternFill("solid", fgColor=COLOR_SEPARATOR)),
+    ]
+    for style in styles:
+        # Saídas anteriores usadas como template já trazem os estilos
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+
+def write_comparison_openpyxl(template_path, output_path, df_diff, cols_order, start_row):
+    """Reescreve as linhas de dados do template (a partir de `start_row`) e salva em `output_path`."""
+    wb = load_workbook(template_path)
+    ws = wb.active
+    _register_named_styles(wb)
+
+    if ws.max_row >= start_row:
+        ws.delete_rows(start_row, amount=ws.max_row - start_row + 1)
+
+    n_cols = len(cols_order)
+    curr_row = start_row
+    for kind, values, is_changed in _iter_output_rows(df_diff, cols_order):
+        if kind == 'sep':
+            # Linha Amarela (uma coluna além dos dados, como no layout original)
+            for c in range(2, n_cols + 3):
+                ws.cell(curr_row, c).style = STYLE_SEPARATOR
+            ws.row_dimensions[curr_row].height = 15
+        else:
+            style = STYLE_CHANGED if is_changed else STYLE_NORMAL
+            for i, value in enumerate(values):
+                cell = ws.cell(curr_row, i + 2, value)
+                cell.style = style
+        curr_row += 1
+
+    wb.save(output_path)
+
+# ======================================================================
+# == MODO xlsxwriter (caminho rápido: só o cabeçalho do template)     ==
+# ======================================================================
+
+def write_comparison_xlsxwriter(template_path, output_path, df_diff, cols_order, start_row, header=None):
+    """
+    Cria um arquivo novo com o cabeçalho do template (linhas 1..start_row-1) e
+    escreve os registros em bloco. Outras abas do template não são copiadas.
+    `header` é o bloco devolvido por template_reader.read (lido se não vier).
+    """
+    if header is None:
+        _, header = get_template_reader().read(template_path, header_block_rows=start_row - 1)
+
+    wb = xlsxwriter.Workbook(output_path, {
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'default_date_format': 'yyyy-mm-dd h:mm:ss',
+    })
+    try:
+        ws = wb.add_worksheet(header['sheet_title'])
+
+        for col, width in header['column_widths'].items():
+            ws.set_column(col, col, width)
+        for row, height in header['row_heights'].items():
+            ws.set_row(row, height)
+
+        # Cabeçalho: formatos reaproveitados por combinação de estilo
+        formats = {}
+        def _fmt(style):
+            if not style:
+                return None
+            key = tuple(sorted(style.items()))
+            if key not in formats:
+                formats[key] = wb.add_format(dict(style))
+            return formats[key]
+
+        merged_starts = {(r1, c1): (r2, c2) for r1, c1, r2, c2 in header['merges']}
+        merged_cells = {(r, c) for r1, c1, r2, c2 in header['merges']
+                        for r in range(r1, r2 + 1) for c in range(c1, c2 + 1)}
+        for r, row in enumerate(header['rows']):
+            for c, (value, style) in enumerate(row):
+                if (r, c) in merged_starts:
+                    r2, c2 = merged_starts[(r, c)]
+                    ws.merge_range(r, c, r2, c2, value, _fmt(style))
+                elif (r, c) in merged_cells:
+                    continue
+                elif value is not None:
+                    ws.write(r, c, value, _fmt(style))
+                elif style:
+                    ws.write_blank(r, c, None, _fmt(style))
+
+        # Dados: 3 formatos criados uma única vez
+        base = {'border': 1, 'align': 'left', 'valign': 'vcenter'}
+        fmt_normal = wb.add_format(base)
+        fmt_changed = wb.add_format(dict(base, bg_color='#' + COLOR_CHANGED, pattern=1))
+        fmt_separator = wb.add_format({'border': 1, 'bg_color': '#' + COLOR_SEPARATOR, 'pattern': 1})
+
+        n_cols = len(cols_order)
+        row = start_row - 1 # xlsxwriter é 0-based; coluna B = 1
+        for kind, values, is_changed in _iter_output_rows(df_diff, cols_order):
+            if kind == 'sep':
+                ws.set_row(row, 15)
+                for c in range(1, n_cols + 2):
+                    ws.write_blank(row, c, None, fmt_separator)
+            else:
+                ws.write_row(row, 1, values, fmt_changed if is_changed else fmt_normal)
+            row += 1
+    finally:
+        wb.close()
+
+def write_comparison_report(template_path, output_path, df_diff, cols_order, start_row,
+                            writer='openpyxl', header=None):
+    """Despacha para o escritor escolhido (ver WRITER_MODES)."""
+    if writer == 'xlsxwriter':
+        write_comparison_xlsxwriter(template_path, output_path, df_diff, cols_order, start_row, header)
+    elif writer == 'openpyxl':
+        write_comparison_openpyxl(template_path, output_path, df_diff, cols_order, start_row)
+    else:
+        raise ValueError(f"Modo de escrita desconhecido: '{writer}'. Use um de {WRITER_MODES}.")
@@ -1,30 +1,39 @@
 # app/tasks/epg_database_manager.py
+# Banco de programas do EPG. O armazenamento principal é um SQLite local
+# (epg_database.sqlite) indexado por Title e Unique ID; o epg_database.csv
+# continua existindo para compatibilidade: edições feitas nele são importadas
+# automaticamente e os novos programas são acrescentados ao final dele (se ele
+# estiver preso, ex.: aberto no Excel, na próxima sincronização).
 import os
 import sys
 import shutil
+import json
+import sqlite3
+from contextlib import contextmanager
 import pandas as pd
-from PySide6.QtCore import QStandardPaths
+from .app_context import app_data_dir, LazySingleton
 
 class EPGDatabaseManager:
-    def __init__(self, filename="epg_database.csv"):
-        self.config_path_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    def __init__(self, filename="epg_database.csv", db_filename="epg_database.sqlite"):
+        self.config_path_dir = app_data_dir()
         self.filepath = os.path.join(self.config_path_dir, filename)
-        
+        self.db_path = os.path.join(self.config_path_dir, db_filename)
+
         self.columns = [
-            'Unique ID', 'Title', 'Type', 'Genre', 'TC IN', 'Duration', 
-            'SeriesId', 'EpisodeTitle', 'Short Description', 'Long Description', 
-            'SeasonNumber', 'EpisodeNo', 'Rating', 'Series Image', 
+            'Unique ID', 'Title', 'Type', 'Genre', 'TC IN', 'Duration',
+            'SeriesId', 'EpisodeTitle', 'Short Description', 'Long Description',
+            'SeasonNumber', 'EpisodeNo', 'Rating', 'Series Image',
             'Program Image', 'IsLive'
         ]
 
         os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
-        
+
         if not os.path.exists(self.filepath):
             if getattr(sys, 'frozen', False):
                 base_path = sys._MEIPASS if hasattr(sys, "_MEIPASS") else os.path.dirname(sys.executable)
             else:
                 base_path = os.path.abspath(".")
-            
+
             template_path = os.path.join(base_path, "resources", filename)
 
             if os.path.exists(template_path):
@@ -32,51 +41,261 @@ class EPGDatabaseManager:
             else:
                 pd.DataFrame(columns=self.columns).to_csv(self.filepath, index=False)
 
+        self._init_db()
+        self._sync_from_csv()
+
+    # ------------------------------------------------------------------
+    # SQLite
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _connect(self, immediate=False):
+        """
+        Conexão com commit automático ao final do bloco e fechamento garantido.
+        `immediate=True` pega a trava de escrita já no início (BEGIN IMMEDIATE):
+        consultas e gravações do bloco ficam atômicas entre processos.
+        """
+        # timeout: várias instâncias (ex.: lote por canal) podem escrever ao mesmo tempo
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                if immediate:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._create_programs_table(conn, self.columns)
+
+    def _create_programs_table(self, conn, columns):
+        # Colunas sem tipo declarado: o SQLite guarda números e textos como vieram do CSV.
+        # title_key = Title sem espaços nas pontas (chave de existência).
+        cols_sql = ", ".join(f'"{c}"' for c in columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS programs ({cols_sql}, title_key TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_programs_title_key ON programs(title_key)")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_programs_unique_id ON programs("Unique ID")')
+
+    def _table_columns(self, conn):
+        """Colunas de dados da tabela (na ordem do CSV), sem a coluna interna title_key."""
+        info = conn.execute("PRAGMA table_info(programs)").fetchall()
+        return [row[1] for row in info if row[1] != 'title_key']
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ------------------------------------------------------------------
+    # Compatibilidade CSV
+    # ------------------------------------------------------------------
+    def _csv_signature(self):
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _sync_from_csv(self):
+        """
+        Reimporta o CSV se ele foi alterado fora do programa desde a última sincronização
+        e acrescenta a ele as linhas pendentes (CSV estava preso quando foram incluídas).
+        """
+        signature = self._csv_signature()
+        if signature is None:
+            return
+        with self._connect() as conn:
+            if self._get_meta(conn, 'csv_signature') == signature and not self._get_meta(conn, 'csv_pending'):
+                return
+
+        with self._connect(immediate=True) as conn:
+            # Confere de novo com a trava: outro processo pode ter sincronizado antes
+            changed = self._get_meta(conn, 'csv_signature') != self._csv_signature()
+            pending = json.loads(self._get_meta(conn, 'csv_pending') or "[]")
+            if changed:
+                self._replace_programs(conn, self._read_csv_frame(self.filepath))
+                self._set_meta(conn, 'csv_signature', self._csv_signature())
+            if pending:
+                self._set_meta(conn, 'csv_pending', None)
+                if changed:
+                    # O CSV editado vale; das pendentes, entram só os títulos que ele não tem
+                    pending = [row for row in pending if not self._title_exists(conn, row['Title'])]
+                    self._insert_rows(conn, pending)
+                if pending:
+                    self._append_to_csv(pending, conn)
+
+    def _read_csv_frame(self, path):
+        """CSV como DataFrame, mantendo colunas extras e garantindo as colunas padrão."""
+        try:
+            df = pd.read_csv(path)
+        except Exception:
+            df = pd.DataFrame(columns=self.columns)
+        columns = list(df.columns) + [c for c in self.columns if c not in df.columns]
+        return df.reindex(columns=columns)
+
+    def _replace_programs(self, conn, df):
+        """Recria a tabela programs com o conteúdo (e as colunas) de `df`."""
+        columns = list(df.columns)
+        title_keys = df['Title'].astype(str).str.strip()
+        values = df.astype(object).where(df.notna(), None)
+        conn.execute("DROP TABLE IF EXISTS programs")
+        self._create_programs_table(conn, columns)
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        conn.executemany(
+            f"INSERT INTO programs VALUES ({placeholders})",
+            (tuple(row) + (key,) for row, key in zip(values.itertuples(index=False, name=None), title_keys))
+        )
+
+    def import_csv(self, path=None):
+        """
+        Substitui o conteúdo do banco pelo CSV (padrão: epg_database.csv). Outro arquivo
+        também é gravado como epg_database.csv, para o CSV continuar igual ao banco.
+        """
+        path = path or self.filepath
+        df = self._read_csv_frame(path)
+        with self._connect(immediate=True) as conn:
+            self._replace_programs(conn, df)
+            if os.path.abspath(path) != os.path.abspath(self.filepath):
+                df.to_csv(self.filepath, index=False)
+            self._set_meta(conn, 'csv_signature', self._csv_signature())
+            self._set_meta(conn, 'csv_pending', None)
+        return len(df)
+
+    def export_csv(self, path=None):
+        """Grava o banco inteiro em CSV (padrão: epg_database.csv)."""
+        path = path or self.filepath
+        df = self.load_db()
+        df.to_csv(path, index=False)
+        if path == self.filepath:
+            with self._connect() as conn:
+                self._set_meta(conn, 'csv_signature', self._csv_signature())
+                self._set_meta(conn, 'csv_pending', None)
+        return True
+
+    def _append_to_csv(self, rows, conn):
+        """
+        Acrescenta as linhas (dicts coluna -> valor) ao final do CSV, O(novas linhas), sem
+        reescrever o arquivo. Chamar dentro da transação de escrita (`conn`), para que só
+        um processo acrescente por vez e a assinatura gravada corresponda ao CSV.
+        Se o CSV estiver preso (ex.: aberto no Excel), as linhas ficam em 'csv_pending' e
+        são acrescentadas na próxima sincronização (load_db/update_with_new_programs).
+        """
+        columns = self._table_columns(conn)
+        try:
+            needs_newline = False
+            if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > 0:
+                with open(self.filepath, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) not in (b'\n', b'\r')
+            with open(self.filepath, 'a', encoding='utf-8', newline='') as f:
+                if needs_newline:
+                    f.write('\n')
+                pd.DataFrame([[row.get(c, "") for c in columns] for row in rows],
+                             columns=columns).to_csv(f, header=False, index=False)
+        except Exception:
+            pending = json.loads(self._get_meta(conn, 'csv_pending') or "[]")
+            self._set_meta(conn, 'csv_pending', json.dumps(pending + list(rows), ensure_ascii=False))
+            return False
+        self._set_meta(conn, 'csv_signature', self._csv_signature())
+        return True
+
+    def _title_exists(self, conn, title):
+        return conn.execute("SELECT 1 FROM programs WHERE title_key = ? LIMIT 1",
+                            (str(title).strip(),)).fetchone() is not None
+
+    def _insert_rows(self, conn, rows):
+        """Insere linhas (dicts coluna -> valor) na tabela programs."""
+        if not rows:
+            return
+        columns = self._table_columns(conn)
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        conn.executemany(
+            f"INSERT INTO programs VALUES ({placeholders})",
+            # Campos vazios viram NULL (mesmo resultado de reler o CSV)
+            [tuple(row.get(c) if row.get(c, "") != "" else None for c in columns) + (str(row['Title']).strip(),)
+             for row in rows]
+        )
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
     def load_db(self):
         try:
-            return pd.read_csv(self.filepath)
+            self._sync_from_csv()
+            with self._connect() as conn:
+                cols_sql = ", ".join(f'"{c}"' for c in self._table_columns(conn))
+                return pd.read_sql_query(f"SELECT {cols_sql} FROM programs ORDER BY rowid", conn)
         except Exception:
             return pd.DataFrame(columns=self.columns)
 
     def save_db(self, df):
+        """Substitui o banco inteiro por `df` (e atualiza o CSV)."""
         try:
             for col in self.columns:
                 if col not in df.columns:
                     df[col] = ""
             df.to_csv(self.filepath, index=False)
+            self.import_csv()
             return True
         except Exception:
             return False
 
+    def exists(self, title=None, unique_id=None):
+        """Consulta indexada: já existe programa com esse título (ou Unique ID)?"""
+        with self._connect() as conn:
+            if title is not None:
+                row = conn.execute("SELECT 1 FROM programs WHERE title_key = ? LIMIT 1",
+                                   (str(title).strip(),)).fetchone()
+            else:
+                row = conn.execute('SELECT 1 FROM programs WHERE "Unique ID" = ? LIMIT 1',
+                                   (unique_id,)).fetchone()
+            return row is not None
+
     def update_with_new_programs(self, list_of_slugs, list_of_titles):
         """
         Verifica se o TÍTULO já existe no banco. Se não, adiciona.
+        Consulta, inserção e acréscimo ao CSV acontecem com a trava de escrita:
+        canais processados em paralelo (batch_cli) não duplicam o mesmo título.
         """
-        df_db = self.load_db()
-        
-        # Cria conjunto de títulos existentes para comparação rápida
-        # Normaliza para string e remove espaços
-        existing_titles = set(df_db['Title'].astype(str).str.strip().unique())
-        
-        new_rows = []
-        # Itera sobre o zip para ter slug e título alinhados
-        for slug, title in zip(list_of_slugs, list_of_titles):
-            title_clean = str(title).strip()
-            
-            if title_clean not in existing_titles:
-                new_row = {col: "" for col in self.columns}
-                new_row['Unique ID'] = slug
-                new_row['Title'] = title_clean # Salva o nome bonito
-                new_row['Type'] = "Media"
-                new_rows.append(new_row)
-                existing_titles.add(title_clean) # Evita adicionar 2x na mesma rodada
-        
-        if new_rows:
-            df_new = pd.DataFrame(new_rows)
-            df_final = pd.concat([df_db, df_new], ignore_index=True)
-            self.save_db(df_final)
-            return len(new_rows)
-        
-        return 0
-
-epg_manager = EPGDatabaseManager()
\ No newline at end of file
+        self._sync_from_csv()
+
+        with self._connect(immediate=True) as conn:
+            columns = self._table_columns(conn)
+            new_rows = []
+            seen = set()
+            # Itera sobre o zip para ter slug e título alinhados
+            for slug, title in zip(list_of_slugs, list_of_titles):
+                title_clean = str(title).strip()
+                if title_clean in seen:
+                    continue # Evita adicionar 2x na mesma rodada
+                seen.add(title_clean)
+
+                if not self._title_exists(conn, title_clean):
+                    new_row = {col: "" for col in columns}
+                    new_row['Unique ID'] = slug
+                    new_row['Title'] = title_clean # Salva o nome bonito
+                    new_row['Type'] = "Media"
+                    new_rows.append(new_row)
+
+            if not new_rows:
+                return 0
+
+            self._insert_rows(conn, new_rows)
+            self._append_to_csv(new_rows, conn)
+        return len(new_rows)
+
+# Criado no primeiro uso (abre o SQLite e sincroniza com o CSV)
+_epg_manager = LazySingleton(EPGDatabaseManager)
+
+def get_epg_manager():
+    return _epg_manager.get()
+
+def __getattr__(name):
+    # Compatibilidade com `from ... import epg_manager`: a instância nasce no acesso
+    if name == 'epg_manager':
+        return get_epg_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
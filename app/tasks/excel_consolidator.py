@@ -1,44 +1,519 @@
 # app/tasks/excel_consolidator.py
 
 import os
+import json
+import hashlib
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import xlsxwriter
+from .task_control import TaskCancelled, ensure_control
+from .xlsx_sheet_writer import StreamingSheetWriter, SheetChangedError, ExcelLimitExceeded, check_excel_limits
+
+# Linhas lidas por vez nos logs grandes (a memória fica limitada a um bloco)
+CHUNK_ROWS = 50_000
+
+# Logs acima deste tamanho são lidos em blocos, fora do pool de leitura
+LARGE_LOG_BYTES = 32 * 1024 * 1024
+
+# Logs lidos ao mesmo tempo (também limita quantos ficam em memória)
+MAX_READ_WORKERS = 4
+
+# Motor de leitura: pyarrow (multithread) quando instalado, senão o parser C do pandas
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+# Textos que o pd.read_csv trata como vazio por padrão (usados no leitor pyarrow)
+_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+              '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Valores que o pandas reconhece como booleanos ao inferir tipos
+_BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True,
+                'False': False, 'FALSE': False, 'false': False}
+
+# ======================================================================
+# == LEITURA (esquema compartilhado, pool de threads)                ==
+# ======================================================================
+
+def _read_columns(caminho):
+    """Só a linha de cabeçalho do log (barato: nenhum dado é lido)."""
+    return list(pd.read_csv(caminho, delimiter=';', encoding='utf-8', nrows=0).columns)
+
+def _union_columns(lista_de_arquivos, erros):
+    """
+    Colunas de todos os logs, na ordem em que aparecem (igual ao pd.concat).
+    Logs cujo cabeçalho não pode ser lido vão para `erros` e ficam de fora.
+    Retorna (colunas, arquivos_validos).
+    """
+    columns = []
+    seen = set()
+    validos = []
+    for caminho in lista_de_arquivos:
+        try:
+            cols = _read_columns(caminho)
+        except Exception as e:
+            erros.append((caminho, str(e)))
+            continue
+        validos.append(caminho)
+        for col in cols:
+            if col not in seen:
+                seen.add(col)
+                columns.append(col)
+    return columns, validos
+
+def _infer_column_kind(values):
+    """'numeric', 'bool' ou 'str' a partir dos valores (texto) de um bloco; None se vazio."""
+    values = values.dropna()
+    if values.empty:
+        return None
+    if pd.to_numeric(values, errors='coerce').notna().all():
+        return 'numeric'
+    if values.isin(_BOOL_VALUES.keys()).all():
+        return 'bool'
+    return 'str'
+
+def infer_log_schema(caminho, sample_rows=CHUNK_ROWS):
+    """
+    Esquema {coluna: 'numeric'|'bool'|'str'} inferido das primeiras
+    `sample_rows` linhas de um log. Colunas sem nenhum valor ficam de fora.
+    """
+    sample = pd.read_csv(caminho, delimiter=';', encoding='utf-8', dtype=str, nrows=sample_rows)
+    schema = {}
+    for col in sample.columns:
+        kind = _infer_column_kind(sample[col])
+        if kind is not None:
+            schema[col] = kind
+    return schema
+
+def load_schema_profile(caminho_perfil):
+    """Lê um esquema salvo por `save_schema_profile` (None se não existir)."""
+    if not caminho_perfil or not os.path.exists(caminho_perfil):
+        return None
+    with open(caminho_perfil, 'r', encoding='utf-8') as f:
+        return json.load(f).get('kinds', {})
+
+def save_schema_profile(schema, caminho_perfil):
+    with open(caminho_perfil, 'w', encoding='utf-8') as f:
+        json.dump({'kinds': schema}, f, ensure_ascii=False, indent=2)
+
+def _apply_schema(chunk, schema):
+    """
+    Converte as colunas (lidas como texto) conforme o esquema. Colunas que o
+    esquema ainda não conhece são inferidas no primeiro bloco em que têm
+    valores e fixadas (setdefault: seguro entre as threads de leitura).
+    Um valor que não se encaixa no tipo permanece como texto.
+    """
+    for col in chunk.columns:
+        kind = schema.get(col)
+        if kind is None:
+            kind = _infer_column_kind(chunk[col])
+            if kind is None:
+                continue
+            kind = schema.setdefault(col, kind)
+
+        if kind == 'numeric':
+            numbers = pd.to_numeric(chunk[col], errors='coerce')
+            if numbers.notna().sum() == chunk[col].notna().sum():
+                chunk[col] = numbers
+            else:
+                chunk[col] = numbers.astype(object).where(numbers.notna(), chunk[col])
+        elif kind == 'bool':
+            chunk[col] = chunk[col].map(lambda v: _BOOL_VALUES.get(v, v))
+    return chunk
+
+def _read_text_pyarrow(caminho):
+    """
+    Leitura com o leitor CSV do pyarrow, todas as colunas como texto.
+    (O engine='pyarrow' do pandas infere os tipos antes de aplicar dtype=str,
+    o que transformaria '30' em '30.0'.)
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    header = _read_columns(caminho)
+    if len(set(header)) != len(header):
+        raise ValueError("colunas repetidas") # O pandas renomeia (X, X.1); deixa com ele
+    table = pa_csv.read_csv(
+        caminho,
+        parse_options=pa_csv.ParseOptions(delimiter=';'),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in header},
+            null_values=_NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+def _read_log(caminho, columns, schema):
+    """Lê um log inteiro (como texto), aplica o esquema e alinha às colunas finais."""
+    df = None
+    if CSV_ENGINE == 'pyarrow':
+        try:
+            df = _read_text_pyarrow(caminho)
+        except Exception:
+            df = None # O pyarrow é mais estrito; o parser C decide se o arquivo é mesmo inválido
+    if df is None:
+        df = pd.read_csv(caminho, delimiter=';', encoding='utf-8', dtype=str)
+    return _apply_schema(df, schema).reindex(columns=columns)
+
+def _iter_log_chunks(caminho, columns, schema, chunksize=CHUNK_ROWS):
+    """Blocos do log já alinhados às colunas finais e convertidos pelo esquema."""
+    reader = pd.read_csv(caminho, delimiter=';', encoding='utf-8', dtype=str, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            chunk = _apply_schema(chunk, schema)
+            yield chunk.reindex(columns=columns)
+
+def _iter_logs(lista_de_arquivos, columns, schema, max_workers, chunksize):
+    """
+    Gera (caminho, blocos) NA ORDEM da lista. Os logs normais são lidos em
+    paralelo num pool de threads, com no máximo `max_workers` adiantados;
+    os grandes são lidos em blocos na hora de serem gravados.
+    `blocos` é um iterável de DataFrames ou a exceção da leitura.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pendentes = deque()
+        restantes = iter(lista_de_arquivos)
+
+        def _agenda_proximo():
+            for caminho in restantes:
+                try:
+                    grande = os.path.getsize(caminho) > LARGE_LOG_BYTES
+                except OSError:
+                    grande = False
+                future = None if grande else pool.submit(_read_log, caminho, columns, schema)
+                pendentes.append((caminho, future))
+                return
+
+        for _ in range(max_workers):
+            _agenda_proximo()
+
+        while pendentes:
+            caminho, future = pendentes.popleft()
+            _agenda_proximo()
+            if future is None:
+                yield caminho, _iter_log_chunks(caminho, columns, schema, chunksize)
+                continue
+            try:
+                yield caminho, [future.result()]
+            except Exception as e:
+                yield caminho, e
+
+def _chunk_rows(chunk):
+    """Linhas como listas Python; células vazias viram None (não são gravadas)."""
+    return chunk.astype(object).where(chunk.notna(), None).values.tolist()
+
+# ======================================================================
+# == ESCRITA INCREMENTAL                                              ==
+# ======================================================================
+
+class _NewWorkbookWriter:
+    """Arquivo novo: xlsxwriter em constant_memory (cada linha vai direto para o disco)."""
+    def __init__(self, caminho, nome_da_aba, columns):
+        self.wb = xlsxwriter.Workbook(caminho, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True,
+        })
+        check_excel_limits(1, len(columns))
+        self.ws = self.wb.add_worksheet(nome_da_aba)
+        # Mesmo estilo de cabeçalho do DataFrame.to_excel
+        header_format = self.wb.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        self.ws.write_row(0, 0, columns, header_format)
+        self.row = 1
+
+    def write_rows(self, rows):
+        # write_row só devolve -1 fora do limite; o to_excel levantava erro (nada é gravado)
+        check_excel_limits(self.row + len(rows), 0)
+        for values in rows:
+            self.ws.write_row(self.row, 0, values)
+            self.row += 1
+
+    def close(self):
+        self.wb.close()
+
+    def abort(self):
+        # Não deixa um arquivo pela metade no destino
+        try:
+            self.wb.close()
+        except Exception:
+            pass
+        if os.path.exists(self.wb.filename):
+            os.remove(self.wb.filename)
+
+class _RebuildNeeded(Exception):
+    """O modo incremental não pode continuar a aba: é preciso reconsolidar tudo."""
+
+class _ExistingWorkbookWriter(StreamingSheetWriter):
+    """
+    Arquivo existente: as outras abas precisam ser preservadas. Só a XML da aba
+    é gerada (em streaming); as demais partes do .xlsx são copiadas como estão
+    (ver xlsx_sheet_writer). A memória fica limitada a um bloco de linhas.
+    """
+    def __init__(self, caminho, nome_da_aba, columns, append_after_rows=None):
+        try:
+            super().__init__(caminho, nome_da_aba, columns, append_after_rows)
+        except SheetChangedError as e:
+            raise _RebuildNeeded(str(e)) from e
+
+# ======================================================================
+# == MANIFESTO (modo incremental)                                     ==
+# ======================================================================
+# Fica ao lado do workbook ("<arquivo>.xlsx.manifest.json") e registra, por
+# aba, as colunas, o esquema e cada log já consolidado (tamanho, mtime,
+# SHA-256 e linhas). Assim uma nova execução só lê os logs que faltam.
+
+def _manifest_path(caminho_arquivo_excel):
+    return caminho_arquivo_excel + ".manifest.json"
+
+def _load_manifest(caminho_arquivo_excel):
+    try:
+        with open(_manifest_path(caminho_arquivo_excel), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get('sheets'), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': 1, 'sheets': {}}
+
+def _save_manifest(caminho_arquivo_excel, manifest):
+    path = _manifest_path(caminho_arquivo_excel)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _file_key(caminho):
+    return os.path.normcase(os.path.abspath(caminho))
+
+def _file_sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _file_entry(caminho, linhas):
+    st = os.stat(caminho)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': _file_sha256(caminho), 'rows': linhas}
+
+def _is_unchanged(caminho, entry):
+    """Mesmo tamanho e mtime: não mudou. Se só o mtime mudou, o hash decide."""
+    if entry.get('partial'):
+        return False
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return False
+    if st.st_size != entry['size']:
+        return False
+    if st.st_mtime_ns == entry['mtime_ns']:
+        return True
+    if _file_sha256(caminho) == entry['sha256']:
+        entry['mtime_ns'] = st.st_mtime_ns
+        return True
+    return False
+
+def _plan_incremental(lista_de_arquivos, caminho_arquivo_excel, sheet_entry):
+    """
+    Retorna (novos, ja_consolidados) ou None quando é preciso reconsolidar
+    tudo (sem histórico da aba ou algum log já consolidado mudou).
+    """
+    if sheet_entry is None or not os.path.exists(caminho_arquivo_excel):
+        return None
+    novos, ja_consolidados = [], []
+    for caminho in lista_de_arquivos:
+        entry = sheet_entry['files'].get(_file_key(caminho))
+        if entry is None:
+            novos.append(caminho)
+        elif _is_unchanged(caminho, entry):
+            ja_consolidados.append(caminho)
+        else:
+            return None
+    return novos, ja_consolidados
+
+# ======================================================================
+# == API                                                              ==
+# ======================================================================
+
+def _resumo_erros(erros):
+    return "; ".join(f"{os.path.basename(caminho)}: {msg}" for caminho, msg in erros)
+
+def _ingest(arquivos, writer, columns, schema, erros, max_workers, chunksize,
+            control, concluidos, total_arquivos):
+    """
+    Lê e grava os logs na ordem. Retorna (total_linhas, {caminho: entrada do manifesto}).
+    Logs com erro vão para `erros`; os gravados pela metade ficam marcados como parciais.
+    O cancelamento (control.check) é verificado antes de cada log e de cada bloco.
+    """
+    total_linhas = 0
+    ingeridos = {}
+    for caminho, blocos in _iter_logs(arquivos, columns, schema, max(1, max_workers), chunksize):
+        control.check()
+        linhas_arquivo = 0
+        try:
+            if isinstance(blocos, Exception):
+                raise blocos
+            for chunk in blocos:
+                control.check()
+                writer.write_rows(_chunk_rows(chunk))
+                linhas_arquivo += len(chunk)
+                total_linhas += len(chunk)
+                control.report(concluidos, total_arquivos, f"{total_linhas} linhas gravadas")
+            ingeridos[_file_key(caminho)] = _file_entry(caminho, linhas_arquivo)
+        except (TaskCancelled, ExcelLimitExceeded):
+            raise # Interrompe o lote inteiro: nada é gravado
+        except Exception as e:
+            # Em logs grandes, os blocos anteriores ao erro já foram gravados
+            parcial = ""
+            if linhas_arquivo:
+                parcial = f" ({linhas_arquivo} linhas já gravadas)"
+                ingeridos[_file_key(caminho)] = {'partial': True, 'rows': linhas_arquivo}
+            erros.append((caminho, f"{e}{parcial}"))
+        concluidos += 1
+        control.report(concluidos, total_arquivos, f"{total_linhas} linhas gravadas")
+    return total_linhas, ingeridos
 
 # ATUALIZAÇÃO: Adicionado o parâmetro 'nome_da_aba'.
-def processar_logs_para_excel(lista_de_arquivos, caminho_arquivo_excel, nome_da_aba="Dados Consolidados"):
+def processar_logs_para_excel(lista_de_arquivos, caminho_arquivo_excel, nome_da_aba="Dados Consolidados",
+                              control=None, chunksize=CHUNK_ROWS, max_workers=MAX_READ_WORKERS,
+                              schema_profile=None, incremental=False):
     """
     Processa uma lista de arquivos de log e os consolida em uma aba específica de um arquivo Excel.
+    - Os logs são lidos em paralelo (até `max_workers` por vez) e gravados na ordem da lista;
+      logs grandes são lidos em blocos de `chunksize` linhas.
+    - O esquema de tipos vem de `schema_profile` (JSON salvo antes) ou é inferido do primeiro
+      log e reaproveitado nos demais; com `schema_profile` novo, o esquema inferido é salvo nele.
+    - Um log com problema não interrompe o lote: é listado no fim da mensagem.
+    - incremental=True: só os logs que ainda não estão no manifesto da aba são lidos e
+      acrescentados ao final dela. Se um log já consolidado mudou (ou a aba foi mexida),
+      a aba inteira é refeita com os arquivos selecionados.
+    `control` (TaskControl) recebe o progresso (arquivos concluídos, total, "N linhas gravadas"),
+    mede o tempo de cada fase e permite cancelar entre arquivos/blocos (nada é gravado).
     """
+    control = ensure_control(control)
     try:
         if not lista_de_arquivos:
             return "Erro: Nenhum arquivo de log foi selecionado."
-        
+
         # Validação simples para o nome da aba
         if not nome_da_aba or len(nome_da_aba) > 31: # Limite de caracteres do Excel
              return "Erro: Nome da aba inválido ou muito longo."
 
-        lista_de_dataframes = [pd.read_csv(f, delimiter=';', encoding='utf-8') for f in lista_de_arquivos]
-        
-        if not lista_de_dataframes:
-            return "Erro: Falha ao ler os dados dos arquivos selecionados."
-
-        df_final = pd.concat(lista_de_dataframes, ignore_index=True)
-        
-        mode = 'a' if os.path.exists(caminho_arquivo_excel) else 'w'
-        if_sheet_exists = 'replace' if mode == 'a' else None
-
-        with pd.ExcelWriter(
-            caminho_arquivo_excel,
-            engine='openpyxl',
-            mode=mode,
-            if_sheet_exists=if_sheet_exists
-        ) as writer:
-            # ATUALIZAÇÃO: Usa a variável 'nome_da_aba' ao salvar.
-            df_final.to_excel(writer, sheet_name=nome_da_aba, index=False)
-        
-        return f"Sucesso! {len(lista_de_arquivos)} arquivos processados e {len(df_final)} linhas foram salvas na aba '{nome_da_aba}'."
+        manifest = _load_manifest(caminho_arquivo_excel)
+        sheet_entry = manifest['sheets'].get(nome_da_aba)
+
+        if incremental:
+            plano = _plan_incremental(lista_de_arquivos, caminho_arquivo_excel, sheet_entry)
+            if plano is not None:
+                novos, ja_consolidados = plano
+                if not novos:
+                    _save_manifest(caminho_arquivo_excel, manifest) # mtimes revalidados pelo hash
+                    return (f"Nada a fazer: os {len(ja_consolidados)} arquivos já estavam consolidados "
+                            f"na aba '{nome_da_aba}'.")
+                try:
+                    return _append_logs(novos, ja_consolidados, caminho_arquivo_excel, nome_da_aba,
+                                        manifest, sheet_entry, control, chunksize, max_workers)
+                except _RebuildNeeded:
+                    pass # Segue para a consolidação completa
+
+        erros = []
+        with control.phase("Cabeçalhos e esquema"):
+            columns, validos = _union_columns(lista_de_arquivos, erros)
+            if not columns:
+                detalhe = f" {_resumo_erros(erros)}" if erros else ""
+                return f"Erro: Falha ao ler os dados dos arquivos selecionados.{detalhe}"
+
+            schema = load_schema_profile(schema_profile)
+            if schema is None:
+                try:
+                    schema = infer_log_schema(validos[0])
+                except Exception:
+                    schema = {} # O erro do arquivo aparece na leitura completa
+                if schema_profile:
+                    save_schema_profile(schema, schema_profile)
+
+        if os.path.exists(caminho_arquivo_excel):
+            writer = _ExistingWorkbookWriter(caminho_arquivo_excel, nome_da_aba, columns)
+        else:
+            writer = _NewWorkbookWriter(caminho_arquivo_excel, nome_da_aba, columns)
+
+        total_arquivos = len(lista_de_arquivos)
+        try:
+            with control.phase("Leitura e gravação"):
+                total_linhas, ingeridos = _ingest(validos, writer, columns, schema, erros, max_workers, chunksize,
+                                                  control, len(erros), total_arquivos)
+        except Exception:
+            writer.abort()
+            raise
 
+        processados = total_arquivos - len(erros)
+        if processados == 0:
+            writer.abort()
+            return f"Erro: Nenhum arquivo pôde ser lido. {_resumo_erros(erros)}"
+        with control.phase("Salvando o arquivo"):
+            writer.close()
+
+        # Sem o modo incremental, só atualiza um manifesto que já exista (não cria
+        # um .manifest.json ao lado de todo workbook consolidado)
+        if incremental or os.path.exists(_manifest_path(caminho_arquivo_excel)):
+            manifest['sheets'][nome_da_aba] = {
+                'columns': columns, 'schema': schema, 'rows': total_linhas, 'files': ingeridos,
+            }
+            _save_manifest(caminho_arquivo_excel, manifest)
+
+        mensagem = f"Sucesso! {processados} arquivos processados e {total_linhas} linhas foram salvas na aba '{nome_da_aba}'."
+        if erros:
+            mensagem += f" {len(erros)} arquivo(s) com erro: {_resumo_erros(erros)}"
+        return mensagem
+
+    except TaskCancelled as e:
+        return f"{e} Nenhuma alteração foi gravada."
+    except ExcelLimitExceeded as e:
+        return f"Erro: {e} Nenhuma alteração foi gravada."
     except Exception as e:
         # Tratamento de erro específico para permissão negada
         if isinstance(e, PermissionError):
             return f"Erro de Permissão: Feche o arquivo '{os.path.basename(caminho_arquivo_excel)}' antes de tentar salvá-lo."
-        return f"Ocorreu um erro inesperado: {e}"
\ No newline at end of file
+        return f"Ocorreu um erro inesperado: {e}"
+
+def _append_logs(novos, ja_consolidados, caminho_arquivo_excel, nome_da_aba, manifest, sheet_entry,
+                 control, chunksize, max_workers):
+    """Acrescenta só os logs novos ao final da aba (levanta _RebuildNeeded se não der)."""
+    erros = []
+    columns = sheet_entry['columns']
+    novas_colunas, validos = _union_columns(novos, erros)
+    if any(col not in columns for col in novas_colunas):
+        raise _RebuildNeeded("os logs novos trazem colunas que a aba não tem")
+    if not validos:
+        return f"Erro: Nenhum arquivo novo pôde ser lido. {_resumo_erros(erros)}"
+
+    schema = dict(sheet_entry.get('schema', {}))
+    writer = _ExistingWorkbookWriter(caminho_arquivo_excel, nome_da_aba, columns,
+                                     append_after_rows=sheet_entry['rows'])
+    total_arquivos = len(novos) + len(ja_consolidados)
+    try:
+        with control.phase("Leitura e gravação"):
+            total_linhas, ingeridos = _ingest(validos, writer, columns, schema, erros, max_workers, chunksize,
+                                              control, len(ja_consolidados) + len(erros), total_arquivos)
+    except Exception:
+        writer.abort()
+        raise
+
+    if not ingeridos:
+        writer.abort()
+        return f"Erro: Nenhum arquivo novo pôde ser lido. {_resumo_erros(erros)}"
+    with control.phase("Salvando o arquivo"):
+        writer.close()
+
+    sheet_entry['schema'] = schema
+    sheet_entry['rows'] += total_linhas
+    sheet_entry['files'].update(ingeridos)
+    _save_manifest(caminho_arquivo_excel, manifest)
+
+    processados = len(novos) - len(erros)
+    mensagem = (f"Sucesso! {processados} arquivos novos processados e {total_linhas} linhas acrescentadas "
+                f"na aba '{nome_da_aba}' ({len(ja_consolidados)} já consolidados foram ignorados).")
+    if erros:
+        mensagem += f" {len(erros)} arquivo(s) com erro: {_resumo_erros(erros)}"
+    return mensagem
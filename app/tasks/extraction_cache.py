@@ -0,0 +1,160 @@
+# app/tasks/extraction_cache.py
+# Cache em disco das linhas brutas extraídas dos PDFs de grade.
+# Chave: hash do conteúdo do arquivo + versão do extrator. Assim um PDF já lido
+# não precisa ser aberto novamente pelo fitz, mesmo que tenha sido renomeado.
+# O nº de páginas fica fora da chave: o hash do conteúdo já o determina (ele só é
+# guardado na entrada, para quem consome o cache não precisar abrir o PDF).
+
+import os
+import json
+import hashlib
+import threading
+from .app_context import root_data_dir, LazySingleton
+
+class ExtractionCache:
+    def __init__(self, dirname="extraction_cache", max_bytes=64 * 1024 * 1024):
+        self.config_path_dir = root_data_dir()
+        self.cache_dir = os.path.join(self.config_path_dir, dirname)
+        self.max_bytes = max_bytes # Limite total em disco (LRU)
+
+        # Memoriza o hash por (caminho, tamanho, mtime) para não reler o arquivo na mesma sessão
+        self._hash_memo = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # --- Chaves ---
+    def file_hash(self, pdf_path):
+        """SHA-256 do conteúdo do arquivo (memorizado por tamanho + mtime)."""
+        st = os.stat(pdf_path)
+        memo_key = (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns)
+        digest = self._hash_memo.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(pdf_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+            self._hash_memo[memo_key] = digest
+        return digest
+
+    def _entry_path(self, digest, version):
+        return os.path.join(self.cache_dir, f"{digest}_v{version}.json")
+
+    # --- Leitura / Escrita ---
+    def get(self, pdf_path, version):
+        """
+        Retorna (data, linhas, page_count) do cache ou None (miss).
+        Um acerto renova a posição do item na fila LRU.
+        """
+        try:
+            entry_path = self._entry_path(self.file_hash(pdf_path), version)
+        except OSError:
+            return None
+        if not os.path.exists(entry_path):
+            return None
+
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            rows = [tuple(r) for r in entry['rows']]
+            result = (entry['data'], rows, entry['page_count'])
+        except Exception:
+            # Entrada corrompida: descarta e trata como miss
+            self._remove(entry_path)
+            return None
+
+        try:
+            os.utime(entry_path) # Marca como usado recentemente
+        except OSError:
+            pass
+        return result
+
+    def put(self, pdf_path, version, date, rows, page_count):
+        """Grava as linhas extraídas de um PDF. Falhas de escrita são ignoradas."""
+        try:
+            digest = self.file_hash(pdf_path)
+            entry = {
+                'version': version,
+                'sha256': digest,
+                'page_count': page_count,
+                'source': os.path.basename(pdf_path),
+                'data': date,
+                'rows': [list(r) for r in rows],
+            }
+            entry_path = self._entry_path(digest, version)
+            tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+            self._evict()
+        except Exception:
+            pass
+
+    # --- Invalidação / Evicção ---
+    def invalidate(self, pdf_path=None):
+        """
+        Remove do cache as entradas de um PDF (todas as versões do extrator)
+        ou, sem argumento, limpa o cache inteiro. Retorna quantas foram removidas.
+        """
+        if pdf_path is None:
+            names = self._entry_names()
+        else:
+            try:
+                digest = self.file_hash(pdf_path)
+            except OSError:
+                return 0
+            names = [n for n in self._entry_names() if n.startswith(f"{digest}_v")]
+
+        removed = 0
+        for name in names:
+            if self._remove(os.path.join(self.cache_dir, name)):
+                removed += 1
+        return removed
+
+    def _evict(self):
+        """Remove as entradas menos usadas até caber em `max_bytes`."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in self._entry_names():
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+                total += st.st_size
+
+            entries.sort() # Mais antigo (menos recente) primeiro
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+
+    def _entry_names(self):
+        try:
+            return [n for n in os.listdir(self.cache_dir) if n.endswith('.json')]
+        except OSError:
+            return []
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+# Criado no primeiro uso (cria a pasta do cache)
+_extraction_cache = LazySingleton(ExtractionCache)
+
+def get_extraction_cache():
+    return _extraction_cache.get()
+
+def __getattr__(name):
+    # Compatibilidade com `from ... import extraction_cache`: a instância nasce no acesso
+    if name == 'extraction_cache':
+        return get_extraction_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
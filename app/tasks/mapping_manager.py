@@ -1,18 +1,382 @@
 # app/tasks/mapping_manager.py
 # Gerenciador de mapeamento, com suporte a executável (PyInstaller) e Config customizada.
 
+import io
 import os
 import sys
+import time
+import socket
 import shutil
+import tempfile
+import threading
+import uuid
+from collections import Counter
 import pandas as pd
-from PySide6.QtCore import QStandardPaths
 import configparser
+from .app_context import root_data_dir, LazySingleton
+from .text_normalization import normalize_text
+
+# Gravação no arquivo compartilhado: trava (arquivo .lock criado com O_EXCL)
+LOCK_TIMEOUT_SECONDS = 15  # Espera máxima pela trava de outro usuário
+LOCK_STALE_SECONDS = 60    # Trava mais velha que isso é de um processo que morreu
+LOCK_RETRY_SECONDS = 0.2
+REPLACE_RETRIES = 10       # os.replace pode falhar se alguém estiver lendo o arquivo (Windows/rede)
+
+# Diário de alterações ('<mapeamento>.journal'): o modo aprendizado só acrescenta
+# linhas nele; ao passar deste nº de entradas, ele é consolidado no CSV
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_ENTRIES = 500
+
+class MappingIndex:
+    """
+    DE-PARA compilado UMA vez a partir do CSV:
+    - `mapping`: chaves (Nome_do_PDF) já sem espaços nas pontas -> Nome_Padronizado.
+    - `normalized_keys` / `normalized_values`: conjuntos normalizados para busca O(1).
+    - `by_value`: índice reverso Nome_Padronizado -> lista de Nome_do_PDF.
+    """
+    def __init__(self, mapping_dict):
+        # BLINDAGEM DO MAPEAMENTO: Remove espaços das chaves do dicionário
+        self.mapping = {str(k).strip(): v for k, v in mapping_dict.items()}
+
+        self.normalized_keys = {normalize_text(k) for k in mapping_dict.keys() if pd.notna(k)}
+        self.normalized_values = {normalize_text(v) for v in mapping_dict.values() if pd.notna(v)}
+
+        self.by_value = {}
+        for key, value in self.mapping.items():
+            self.by_value.setdefault(value, []).append(key)
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def apply(self, series):
+        """Aplica o DE-PARA via hash (Series.map); nomes sem mapeamento ficam como estão."""
+        mapped = series.map(self.mapping)
+        return mapped.where(mapped.notna(), series)
+
+    def has_key(self, raw_name):
+        """True se o nome bruto (normalizado) já tem entrada no mapeamento."""
+        return normalize_text(raw_name) in self.normalized_keys
+
+    def has_value(self, standard_name):
+        """True se o nome padronizado (normalizado) aparece como destino do mapeamento."""
+        return normalize_text(standard_name) in self.normalized_values
+
+    def raw_names_for(self, standard_name):
+        """Nomes do PDF que apontam para `standard_name`."""
+        return list(self.by_value.get(standard_name, []))
+
+# ======================================================================
+# == GRAVAÇÃO SEGURA (trava + arquivo temporário + mescla otimista)   ==
+# ======================================================================
+
+class MappingLockTimeout(Exception):
+    """A trava do arquivo de mapeamento não foi liberada a tempo."""
+
+class MappingFileLock:
+    """
+    Trava consultiva entre processos/máquinas: o arquivo '<mapeamento>.lock' é
+    criado com O_CREAT|O_EXCL (atômico também em compartilhamento de rede) e
+    guarda um identificador único do dono. Travas mais velhas que LOCK_STALE_SECONDS
+    são consideradas abandonadas; só o dono (mesmo identificador) remove a trava.
+    """
+    def __init__(self, target_path, timeout=LOCK_TIMEOUT_SECONDS, stale_after=LOCK_STALE_SECONDS):
+        self.lock_path = target_path + ".lock"
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._token = None
+        self._acquired = False
+
+    def _owner(self, path=None):
+        try:
+            with open(path or self.lock_path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _snapshot(self, path=None):
+        """(conteúdo, mtime) da trava, ou None se ela não existe mais."""
+        path = path or self.lock_path
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        owner = self._owner(path)
+        return None if owner is None else (owner, mtime)
+
+    def _create(self, content):
+        """Cria a trava com `content`; False se ela já existe."""
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return True
+
+    def _break_stale(self, observed):
+        """
+        Remove a trava abandonada `observed`. Quem quebra cria antes '<mapeamento>.lock.break'
+        (O_EXCL): dois processos que viram a mesma trava velha não apagam a trava nova um
+        do outro. A trava ainda é renomeada para um nome único e conferida antes de ser
+        apagada; se não era mais ela, volta para o lugar. False se outro está quebrando.
+        """
+        break_path = self.lock_path + ".break"
+        try:
+            os.close(os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(break_path) > self.stale_after:
+                    os.remove(break_path) # Processo morreu no meio da quebra
+            except OSError:
+                pass
+            return False
+        try:
+            if self._snapshot() != observed:
+                return True # Já foi trocada por outro processo
+            stale_path = f"{self.lock_path}.{uuid.uuid4().hex}.stale"
+            try:
+                os.replace(self.lock_path, stale_path)
+            except OSError:
+                return True
+            taken = self._snapshot(stale_path)
+            if taken is not None and taken != observed:
+                self._create(taken[0])
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+            return True
+        finally:
+            try:
+                os.remove(break_path)
+            except OSError:
+                pass
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        self._token = (f"{socket.gethostname()} pid={os.getpid()} "
+                       f"{time.strftime('%Y-%m-%d %H:%M:%S')} id={uuid.uuid4().hex}")
+        while True:
+            if self._create(self._token):
+                self._acquired = True
+                return self
+            observed = self._snapshot()
+            if observed is None and not os.path.exists(self.lock_path):
+                continue # Liberada entre as chamadas: tenta de novo
+            if (observed is not None and time.time() - observed[1] / 1e9 > self.stale_after
+                    and self._break_stale(observed)): # Dono morreu no meio da gravação
+                continue
+            if time.monotonic() >= deadline:
+                raise MappingLockTimeout(observed[0].split(" id=")[0] if observed else "")
+            time.sleep(LOCK_RETRY_SECONDS)
+
+    def release(self):
+        if self._acquired:
+            self._acquired = False
+            # Se a gravação demorou além de LOCK_STALE_SECONDS, a trava pode já ser de outro
+            if self._owner() == self._token:
+                try:
+                    os.remove(self.lock_path)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+def _atomic_write_csv(dataframe, path):
+    """Grava num temporário da mesma pasta e troca de lugar com os.replace (nunca fica meio escrito)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            dataframe.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(tmp_path, path)
+                break
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(LOCK_RETRY_SECONDS)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _read_mapping_csv(path):
+    try:
+        return pd.read_csv(path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"])
+
+def _same_content(a, b):
+    """Mesmo conteúdo (ignorando índice e diferenças de dtype entre leituras)?"""
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    def as_text(df):
+        df = df.reset_index(drop=True)
+        return df.astype(object).where(df.notna(), "").astype(str)
+    return as_text(a).equals(as_text(b))
+
+def _key_map(df):
+    """Nome_do_PDF (sem espaços nas pontas) -> Nome_Padronizado; a última linha vence."""
+    mapping = {}
+    for key, value in zip(df["Nome_do_PDF"].tolist(), df["Nome_Padronizado"].tolist()):
+        if pd.isna(key) or not str(key).strip():
+            continue
+        mapping[str(key).strip()] = None if pd.isna(value) else value
+    return mapping
+
+def _blank_key_rows(df):
+    """Linhas sem Nome_do_PDF (fora do _key_map): posição -> (Nome_do_PDF, Nome_Padronizado) como texto."""
+    rows = {}
+    for i, (key, value) in enumerate(zip(df["Nome_do_PDF"].tolist(), df["Nome_Padronizado"].tolist())):
+        if pd.isna(key) or not str(key).strip():
+            rows[i] = ("" if pd.isna(key) else str(key), "" if pd.isna(value) else str(value))
+    return rows
+
+def merge_mapping_delta(base_df, edited_df, current_df):
+    """
+    Mescla otimista: aplica sobre `current_df` (arquivo como está agora) só o que
+    mudou de `base_df` (o que o usuário carregou) para `edited_df` (o que ele salvou),
+    por Nome_do_PDF. Alterações de outros usuários em outras linhas são preservadas;
+    na mesma linha, vale a de quem salva por último. Linhas sem Nome_do_PDF não têm
+    chave: as incluídas são acrescentadas e as removidas saem (por conteúdo), como
+    no salvamento sem mescla. Retorna (df, nº de alterações).
+    """
+    base, edited = _key_map(base_df), _key_map(edited_df)
+    removed = [k for k in base if k not in edited]
+    changed = {k: v for k, v in edited.items() if k not in base or base[k] != v}
+
+    edited_blank = _blank_key_rows(edited_df)
+    base_counts, edited_counts = Counter(_blank_key_rows(base_df).values()), Counter(edited_blank.values())
+    added_blank, removed_blank = edited_counts - base_counts, base_counts - edited_counts
+
+    merged = current_df.copy()
+    keys = merged["Nome_do_PDF"].map(lambda k: str(k).strip() if pd.notna(k) else k)
+    keep = ~keys.isin(removed)
+    if removed_blank:
+        pending = removed_blank.copy()
+        for i, row in _blank_key_rows(merged).items():
+            if pending[row] > 0:
+                pending[row] -= 1
+                keep.iloc[i] = False
+    if not keep.all():
+        merged, keys = merged[keep], keys[keep]
+
+    existing = set(keys.dropna())
+    to_update = keys.isin(list(changed))
+    if to_update.any():
+        merged.loc[to_update, "Nome_Padronizado"] = keys[to_update].map(changed)
+    new_keys = [k for k in changed if k not in existing]
+    if new_keys:
+        rows = pd.DataFrame({"Nome_do_PDF": new_keys, "Nome_Padronizado": [changed[k] for k in new_keys]})
+        merged = pd.concat([merged, rows], ignore_index=True)
+    if added_blank:
+        pending = added_blank.copy()
+        positions = []
+        for i, row in edited_blank.items():
+            if pending[row] > 0:
+                pending[row] -= 1
+                positions.append(i)
+        rows = edited_df.iloc[positions][["Nome_do_PDF", "Nome_Padronizado"]]
+        merged = pd.concat([merged, rows], ignore_index=True)
+    n_blank = sum(added_blank.values()) + sum(removed_blank.values())
+    return merged.reset_index(drop=True), len(removed) + len(changed) + n_blank
+
+# ======================================================================
+# == DIÁRIO (inclusões/edições acrescentadas ao lado do CSV)          ==
+# ======================================================================
+
+def journal_path(mapping_path):
+    return mapping_path + JOURNAL_SUFFIX
+
+def _journal_entries(df):
+    """Só linhas com Nome_do_PDF e Nome_Padronizado preenchidos; a última de cada nome vence."""
+    df = df[["Nome_do_PDF", "Nome_Padronizado"]].dropna()
+    df = df[(df["Nome_do_PDF"].astype(str).str.strip() != "") & (df["Nome_Padronizado"].astype(str).str.strip() != "")]
+    return df.drop_duplicates(subset=["Nome_do_PDF"], keep="last")
+
+def _read_journal(path):
+    """Entradas do diário. Uma última linha incompleta (gravação interrompida) é ignorada."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b""
+    data = data[:data.rfind(b'\n') + 1]
+    if not data.strip():
+        return pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"])
+    return _journal_entries(pd.read_csv(io.BytesIO(data), encoding='utf-8'))
+
+def _apply_journal(df, entries):
+    """Reaplica as entradas do diário sobre o CSV (inclui ou troca o Nome_Padronizado)."""
+    if entries.empty:
+        return df
+    if df is None:
+        df = pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"])
+    elif "Nome_do_PDF" not in df.columns or "Nome_Padronizado" not in df.columns:
+        return df # CSV mal formatado: o erro aparece na leitura do dicionário
+    empty = pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"])
+    return merge_mapping_delta(empty, entries, df)[0]
+
+def _read_mapping_with_journal(path):
+    return _apply_journal(_read_mapping_csv(path), _read_journal(journal_path(path)))
+
+def _append_journal(entries, path):
+    """Acrescenta as entradas ao diário (chamar com a trava do mapeamento)."""
+    needs_header = True
+    try:
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # Gravação anterior interrompida: descarta a linha pela metade
+                    f.seek(0)
+                    data = f.read()
+                    size = data.rfind(b'\n') + 1
+                    f.truncate(size)
+            needs_header = size == 0
+    except FileNotFoundError:
+        pass
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        entries.to_csv(f, header=needs_header, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _journal_size(path):
+    """Nº de entradas no diário (linhas completas, sem o cabeçalho)."""
+    try:
+        with open(path, 'rb') as f:
+            return max(f.read().count(b'\n') - 1, 0)
+    except FileNotFoundError:
+        return 0
+
+def _remove_journal(path):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.remove(path)
+            return
+        except FileNotFoundError:
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_SECONDS)
 
 class MappingManager:
     def __init__(self, filename="mapeamento_programas.csv", config_filename="config.ini"):
         # Localização do arquivo de configuração (sempre no AppData do usuário)
         # Isso garante permissão de escrita sem precisar de Admin
-        self.config_path_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+        self.config_path_dir = root_data_dir()
         self.config_filepath = os.path.join(self.config_path_dir, config_filename)
         
         # --- Lógica de Configuração ---
@@ -47,6 +411,13 @@ class MappingManager:
                 # Se não achar o template, cria um CSV vazio com cabeçalho
                 pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"]).to_csv(self.filepath, index=False)
 
+        # Cache em memória do arquivo de mapeamento (CSV + diário), validado pela
+        # assinatura (caminho, mtime, tamanho dos dois). Edições feitas por outros
+        # usuários no arquivo compartilhado mudam a assinatura e forçam uma nova leitura.
+        self._cache = {}
+        self._cache_signature = None
+        self._cache_lock = threading.RLock()
+
     def get_mapping_filepath(self):
         """Retorna o caminho ATUAL do arquivo de mapeamento."""
         return self.filepath
@@ -61,26 +432,104 @@ class MappingManager:
         with open(self.config_filepath, 'w') as configfile:
             self.config.write(configfile)
         
-        # Atualiza o caminho em tempo de execução
+        # Atualiza o caminho em tempo de execução (o cache é refeito na próxima leitura)
         self.filepath = new_path
+        self.invalidate_cache()
         return True
 
+    def _file_signature(self, filepath):
+        """Assinatura usada para saber se o arquivo (ou seu diário) mudou desde a última leitura."""
+        st = os.stat(filepath)
+        try:
+            jst = os.stat(journal_path(filepath))
+            journal = (jst.st_mtime_ns, jst.st_size)
+        except FileNotFoundError:
+            journal = None
+        return (os.path.abspath(filepath), st.st_mtime_ns, st.st_size, journal)
+
+    def invalidate_cache(self):
+        """Descarta o cache em memória (a próxima leitura vai ao disco)."""
+        with self._cache_lock:
+            self._cache = {}
+            self._cache_signature = None
+
+    def _cached(self, name, builder):
+        """
+        Retorna o item `name` do cache, construindo-o com `builder(df)` se preciso.
+        O CSV (com o diário reaplicado) só é relido quando a assinatura muda. `df`
+        é None quando o arquivo está vazio. Levanta as exceções de leitura (tratadas por quem chama).
+        """
+        filepath = self.get_mapping_filepath()
+        with self._cache_lock:
+            signature = self._file_signature(filepath)
+            if signature != self._cache_signature:
+                try:
+                    df = pd.read_csv(filepath)
+                except pd.errors.EmptyDataError:
+                    df = None
+                df = _apply_journal(df, _read_journal(journal_path(filepath)))
+                self._cache = {'df': df}
+                self._cache_signature = signature
+
+            if name not in self._cache:
+                self._cache[name] = builder(self._cache['df'])
+            return self._cache[name]
+
+    def _build_mapping_dict(self, df):
+        """Retorna (dict, erro) a partir do DataFrame cru do CSV."""
+        if df is None:
+            return {}, None
+        if "Nome_do_PDF" not in df.columns or "Nome_Padronizado" not in df.columns:
+            return None, "Erro: Arquivo de mapeamento mal formatado."
+        df = df.dropna(subset=["Nome_do_PDF", "Nome_Padronizado"])
+        return pd.Series(df.Nome_Padronizado.values, index=df.Nome_do_PDF).to_dict(), None
+
     def load_mapping_as_dict(self):
         filepath_to_load = self.get_mapping_filepath()
         try:
-            df = pd.read_csv(filepath_to_load)
-            if "Nome_do_PDF" not in df.columns or "Nome_Padronizado" not in df.columns:
-                 return None, "Erro: Arquivo de mapeamento mal formatado."
-            df.dropna(subset=["Nome_do_PDF", "Nome_Padronizado"], inplace=True)
-            mapping_dict = pd.Series(df.Nome_Padronizado.values, index=df.Nome_do_PDF).to_dict()
-            return mapping_dict, None
+            mapping_dict, error = self._cached('dict', self._build_mapping_dict)
+            if error:
+                return None, error
+            return dict(mapping_dict), None # Cópia: o cache não pode ser alterado por fora
         except FileNotFoundError:
              return None, f"Erro Crítico: O arquivo de mapeamento não foi encontrado em '{filepath_to_load}'."
-        except pd.errors.EmptyDataError:
-             return {}, None
         except Exception as e:
             return None, f"Erro ao ler o arquivo de mapeamento: {e}"
 
+    def get_mapping_index(self):
+        """
+        Retorna (MappingIndex, erro). O índice é montado uma vez e reaproveitado
+        enquanto o mtime/tamanho do arquivo de mapeamento não mudarem.
+        """
+        filepath_to_load = self.get_mapping_filepath()
+
+        def _build_index(df):
+            mapping_dict, error = self._build_mapping_dict(df)
+            return (None, error) if error else (MappingIndex(mapping_dict), None)
+
+        try:
+            return self._cached('index', _build_index)
+        except FileNotFoundError:
+             return None, f"Erro Crítico: O arquivo de mapeamento não foi encontrado em '{filepath_to_load}'."
+        except Exception as e:
+            return None, f"Erro ao ler o arquivo de mapeamento: {e}"
+
+    def get_search_index(self):
+        """
+        Retorna (MappingSearchIndex, erro): busca por trecho e sugestões de Nome
+        Padronizado (ver mapping_search). Montado uma vez por versão do arquivo;
+        quem chama não deve acrescentar pares nele.
+        """
+        from .mapping_search import MappingSearchIndex
+        filepath_to_load = self.get_mapping_filepath()
+
+        try:
+            return self._cached('search', lambda df: (MappingSearchIndex.from_dataframe(df), None))
+        except FileNotFoundError:
+             return None, f"Erro Crítico: O arquivo de mapeamento não foi encontrado em '{filepath_to_load}'."
+        except Exception as e:
+            return None, f"Erro ao montar o índice de busca do mapeamento: {e}"
+
     def load_mapping_as_df(self):
         """
         Carrega o arquivo de mapeamento DO USUÁRIO e o retorna como um DataFrame do Pandas.
@@ -88,7 +537,12 @@ class MappingManager:
         filepath_to_load = self.get_mapping_filepath()
         
         try:
-            df = pd.read_csv(filepath_to_load)
+            df = self._cached('df', lambda df: df)
+            if df is None:
+                # Se o arquivo estiver vazio, retorna um DataFrame com as colunas corretas
+                return pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"]), None
+
+            df = df.copy() # Cópia: quem chama pode editar à vontade
             # Garante que as colunas existam, mesmo que o DF esteja vazio
             if "Nome_do_PDF" not in df.columns: df["Nome_do_PDF"] = ""
             if "Nome_Padronizado" not in df.columns: df["Nome_Padronizado"] = ""
@@ -96,18 +550,94 @@ class MappingManager:
             return df, None # Retorna o DataFrame e Nenhum erro
         except FileNotFoundError:
              return None, f"Erro Crítico: O arquivo de mapeamento não foi encontrado em '{filepath_to_load}'."
-        except pd.errors.EmptyDataError:
-             # Se o arquivo estiver vazio, retorna um DataFrame com as colunas corretas
-             return pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"]), None
         except Exception as e:
             return None, f"Erro ao ler o arquivo de mapeamento como DataFrame: {e}"
 
-    def save_mapping_from_df(self, dataframe):
+    def save_mapping_from_df(self, dataframe, base_df=None):
+        """
+        Salva o mapeamento com trava + arquivo temporário (ver MappingFileLock).
+        `base_df`: a versão do arquivo que o usuário carregou antes de editar. Se o
+        arquivo mudou desde então (outro operador salvou), só as alterações feitas
+        a partir de `base_df` são aplicadas sobre a versão atual, sem perder as dele.
+        Sem `base_df`, o arquivo é substituído por `dataframe`. O diário é
+        consolidado: depois de salvar, o CSV tem tudo e o diário é apagado.
+        """
+        try:
+            with MappingFileLock(self.filepath):
+                message = "Mapeamento salvo com sucesso."
+                to_save = dataframe
+                if base_df is not None:
+                    current_df = _read_mapping_with_journal(self.filepath)
+                    if not _same_content(current_df, base_df):
+                        to_save, n_changes = merge_mapping_delta(base_df, dataframe, current_df)
+                        message = (f"Mapeamento salvo com sucesso. O arquivo tinha sido alterado por outra pessoa: "
+                                   f"suas {n_changes} alterações foram aplicadas sobre a versão mais recente.")
+                _atomic_write_csv(to_save, self.filepath)
+                _remove_journal(journal_path(self.filepath))
+            self.invalidate_cache()
+            return True, message
+        except MappingLockTimeout as e:
+            return False, self._lock_timeout_message(e)
+        except Exception as e:
+            return False, f"Erro ao salvar o mapeamento: {e}"
+
+    def append_mapping_entries(self, dataframe):
+        """
+        Inclui/atualiza pares Nome_do_PDF -> Nome_Padronizado sem reescrever o CSV:
+        as linhas vão para o diário ('<mapeamento>.journal'), O(alterações).
+        Linhas sem Nome_Padronizado são ignoradas. Quando o diário passa de
+        JOURNAL_COMPACT_ENTRIES entradas, ele é consolidado no CSV.
+        """
         try:
-            # CORREÇÃO: Usava self.user_filepath que não existia. Corrigido para self.filepath
-            dataframe.to_csv(self.filepath, index=False)
-            return True, "Mapeamento salvo com sucesso."
+            entries = _journal_entries(dataframe)
+            if entries.empty:
+                return True, "Nenhuma entrada nova para salvar."
+            journal = journal_path(self.filepath)
+            with MappingFileLock(self.filepath):
+                _append_journal(entries, journal)
+                if _journal_size(journal) >= JOURNAL_COMPACT_ENTRIES:
+                    self._compact_locked()
+            self.invalidate_cache()
+            return True, f"{len(entries)} entradas salvas no mapeamento."
+        except MappingLockTimeout as e:
+            return False, self._lock_timeout_message(e)
         except Exception as e:
             return False, f"Erro ao salvar o mapeamento: {e}"
 
-mapping_manager = MappingManager()
\ No newline at end of file
+    def compact_journal(self):
+        """Consolida o diário no CSV (ex.: antes de mover o arquivo). Retorna (ok, mensagem)."""
+        if not os.path.exists(journal_path(self.filepath)):
+            return True, "Não há alterações pendentes no diário."
+        try:
+            with MappingFileLock(self.filepath):
+                self._compact_locked()
+            self.invalidate_cache()
+            return True, "Diário consolidado no arquivo de mapeamento."
+        except MappingLockTimeout as e:
+            return False, self._lock_timeout_message(e)
+        except Exception as e:
+            return False, f"Erro ao consolidar o diário do mapeamento: {e}"
+
+    def _compact_locked(self):
+        # CSV primeiro, diário depois: se cair no meio, reaplicar o diário não muda nada
+        journal = journal_path(self.filepath)
+        entries = _read_journal(journal)
+        if not entries.empty:
+            _atomic_write_csv(_apply_journal(_read_mapping_csv(self.filepath), entries), self.filepath)
+        _remove_journal(journal)
+
+    def _lock_timeout_message(self, error):
+        owner = f" ({error})" if str(error) else ""
+        return f"O arquivo de mapeamento está sendo salvo por outra pessoa{owner}. Tente novamente em instantes."
+
+# Criado no primeiro uso (lê config.ini e pode copiar o template do mapeamento)
+_mapping_manager = LazySingleton(MappingManager)
+
+def get_mapping_manager():
+    return _mapping_manager.get()
+
+def __getattr__(name):
+    # Compatibilidade com `from ... import mapping_manager`: a instância nasce no acesso
+    if name == 'mapping_manager':
+        return get_mapping_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
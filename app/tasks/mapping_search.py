@@ -0,0 +1,135 @@
+# app/tasks/mapping_search.py
+"""
+Índice em memória para busca no DE-PARA (sem Qt), por trigramas dos nomes
+normalizados (sem acentos, espaços extras e lower):
+- search(consulta): textos (Nome_do_PDF ou Nome_Padronizado) que CONTÊM a consulta;
+- suggest(nome_bruto): Nomes Padronizados mais parecidos, pela similaridade de
+  trigramas (Dice) com o próprio nome padronizado ou com os Nomes do PDF que já
+  apontam para ele.
+As consultas tocam só as listas dos trigramas da consulta: poucos milissegundos
+mesmo com dezenas de milhares de linhas.
+"""
+
+from collections import defaultdict
+from functools import reduce
+import numpy as np
+import pandas as pd
+from .text_normalization import normalize_text
+
+# Similaridade mínima (0..1) para um nome entrar nas sugestões
+MIN_SUGGESTION_SCORE = 0.35
+
+def _trigrams(normalized):
+    """Trigramas com borda ('  ab', ' ab', ...): prefixos pesam como no pg_trgm."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _is_text(value):
+    return value is not None and not (not isinstance(value, str) and pd.isna(value)) and str(value).strip() != ""
+
+class MappingSearchIndex:
+    def __init__(self, pairs=()):
+        self._ids = {}                      # texto original -> id
+        self._texts = []                    # id -> texto original
+        self._norms = []                    # id -> texto normalizado
+        self._gram_counts = []              # id -> nº de trigramas
+        self._postings = defaultdict(list)  # trigrama -> ids (crescentes)
+        self._standards_for = {}            # id -> {Nome_Padronizado} que esse texto sugere
+        # Versões numpy montadas sob demanda (descartadas quando o índice cresce)
+        self._arrays = {}
+        self._gram_counts_array = None
+        for raw_name, standard_name in pairs:
+            self.add(raw_name, standard_name)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Índice de um DataFrame do mapeamento (colunas Nome_do_PDF / Nome_Padronizado)."""
+        if df is None or df.empty:
+            return cls()
+        raw = df['Nome_do_PDF'].tolist() if 'Nome_do_PDF' in df.columns else [None] * len(df)
+        std = df['Nome_Padronizado'].tolist() if 'Nome_Padronizado' in df.columns else [None] * len(df)
+        return cls(zip(raw, std))
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _add_text(self, text):
+        tid = self._ids.get(text)
+        if tid is None:
+            tid = len(self._texts)
+            norm = normalize_text(text)
+            grams = _trigrams(norm)
+            self._ids[text] = tid
+            self._texts.append(text)
+            self._norms.append(norm)
+            self._gram_counts.append(len(grams))
+            postings = self._postings
+            arrays = self._arrays
+            for gram in grams:
+                postings[gram].append(tid)
+                arrays.pop(gram, None)
+            self._gram_counts_array = None
+        return tid
+
+    def _array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            array = self._arrays[gram] = np.asarray(self._postings[gram], dtype=np.int32)
+        return array
+
+    def add(self, raw_name=None, standard_name=None):
+        """Registra um par do DE-PARA (qualquer um dos lados pode faltar)."""
+        has_standard = _is_text(standard_name)
+        if has_standard:
+            sid = self._add_text(standard_name)
+            self._standards_for.setdefault(sid, set()).add(standard_name)
+        if _is_text(raw_name):
+            rid = self._add_text(raw_name)
+            if has_standard:
+                self._standards_for.setdefault(rid, set()).add(standard_name)
+
+    def search(self, query):
+        """
+        Conjunto dos textos originais cuja forma normalizada contém `query`.
+        Retorna None para consulta vazia (sem filtro).
+        """
+        q = normalize_text(query)
+        if not q:
+            return None
+        if len(q) < 3:
+            # Curta demais para trigramas: varre os textos distintos
+            return {t for t, norm in zip(self._texts, self._norms) if q in norm}
+        grams = {q[i:i + 3] for i in range(len(q) - 2)}
+        if any(g not in self._postings for g in grams):
+            return set()
+        arrays = sorted((self._array(g) for g in grams), key=len)
+        candidates = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), arrays)
+        return {self._texts[i] for i in candidates.tolist() if q in self._norms[i]}
+
+    def suggest(self, raw_name, limit=5, min_score=MIN_SUGGESTION_SCORE):
+        """Lista [(Nome_Padronizado, score)] do mais ao menos parecido com `raw_name`."""
+        q = normalize_text(raw_name)
+        if not q or not self._texts:
+            return []
+        grams = _trigrams(q)
+        arrays = [self._array(g) for g in grams if g in self._postings]
+        if not arrays:
+            return []
+
+        # Dice de todos os textos de uma vez: trigramas em comum via bincount
+        if self._gram_counts_array is None:
+            self._gram_counts_array = np.asarray(self._gram_counts, dtype=np.float64)
+        shared = np.bincount(np.concatenate(arrays), minlength=len(self._texts))
+        scores = 2.0 * shared / (len(grams) + self._gram_counts_array)
+
+        candidates = np.flatnonzero(scores >= min_score)
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        best = {}
+        for tid in candidates.tolist():
+            for standard in self._standards_for.get(tid, ()):
+                if standard not in best:
+                    best[standard] = float(scores[tid])
+            if len(best) >= limit:
+                break
+        return sorted(best.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
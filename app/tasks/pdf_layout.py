@@ -0,0 +1,101 @@
+# app/tasks/pdf_layout.py
+"""
+Motor de layout para as grades em PDF.
+Recebe as palavras de `page.get_text("words")` (x0, y0, x1, y1, texto, ...)
+e reconstrói as linhas da tabela Horário | Programa:
+1. Ordena as palavras UMA vez pelo centro vertical e junta em linhas por
+   tolerância numa varredura linear (sem "baldes" fixos de 10pt).
+2. Detecta o divisor entre a coluna de horário e a de programa pela
+   distribuição X do próprio documento (sem constante fixa).
+"""
+
+import re
+from statistics import median
+
+# Divisor usado quando o documento não tem horários reconhecíveis
+DEFAULT_COLUMN_DIVIDER_X = 70.0
+
+_TIME_TOKEN = re.compile(r'^\d{1,2}:\d{2}')
+
+def group_words_into_lines(words, tolerance=None):
+    """
+    Agrupa as palavras de UMA página em linhas, de cima para baixo.
+    Uma palavra entra na linha atual se o seu centro vertical estiver a no
+    máximo `tolerance` pontos do centro médio da linha (padrão: metade da
+    altura mediana das palavras). Cada linha volta ordenada pelo eixo X.
+    """
+    if not words:
+        return []
+
+    if tolerance is None:
+        heights = [w[3] - w[1] for w in words if w[3] > w[1]]
+        tolerance = median(heights) / 2 if heights else 3.0
+
+    ordered = sorted(words, key=lambda w: (w[1] + w[3]) / 2)
+
+    lines = []
+    current = []
+    center_sum = 0.0
+    for word in ordered:
+        center = (word[1] + word[3]) / 2
+        if current and center - center_sum / len(current) > tolerance:
+            lines.append(sorted(current, key=lambda w: w[0]))
+            current = []
+            center_sum = 0.0
+        current.append(word)
+        center_sum += center
+    if current:
+        lines.append(sorted(current, key=lambda w: w[0]))
+    return lines
+
+def detect_time_column_divider(lines, default=DEFAULT_COLUMN_DIVIDER_X):
+    """
+    Calcula o X que separa a coluna de horário da coluna de programa.
+    Usa as linhas que começam com um horário (HH:MM): o divisor fica entre a
+    borda direita mais distante dos horários e a borda esquerda mais próxima
+    dos nomes de programa. Sem horários no documento, devolve `default`.
+    """
+    time_right = []
+    program_left = []
+    for line in lines:
+        if not line or not _TIME_TOKEN.match(line[0][4]):
+            continue
+        time_right.append(line[0][2])
+        if len(line) > 1:
+            program_left.append(line[1][0])
+
+    if not time_right:
+        return default
+    if not program_left:
+        return max(time_right) + 1.0
+
+    right, left = max(time_right), min(program_left)
+    if right < left:
+        return (right + left) / 2
+    # Colunas se sobrepõem em alguma linha: usa as medianas (robusto a outliers)
+    return (median(time_right) + median(program_left)) / 2
+
+def extract_schedule_rows(pages_words):
+    """
+    Recebe a lista de palavras de CADA página do documento e devolve as
+    linhas da grade como tuplas (Horario, Programa_Bruto), na ordem de leitura.
+    O divisor de colunas é detectado uma vez para o documento inteiro.
+    """
+    page_lines = [group_words_into_lines(words) for words in pages_words]
+    divider = detect_time_column_divider([line for lines in page_lines for line in lines])
+
+    rows = []
+    for lines in page_lines:
+        for line in lines:
+            horario = ""
+            programa_parts = []
+            for word in line:
+                if word[0] < divider:
+                    horario = word[4]
+                else:
+                    programa_parts.append(word[4])
+
+            # Só adiciona se tiver horário válido
+            if horario and horario[:1].isdigit():
+                rows.append((horario, " ".join(programa_parts)))
+    return rows
@@ -0,0 +1,67 @@
+# app/tasks/schedule_diff.py
+"""
+Motor de comparação (diff) entre a grade nova e a grade anterior.
+Faz tudo por junção/colunas (sem iterrows) e não depende de Qt/openpyxl,
+então serve tanto ao relatório Excel do schedule_processor quanto ao tools.py.
+"""
+
+import pandas as pd
+
+STATUS_NOVO = 'NOVO'
+STATUS_ALTERADO = 'ALTERADO'
+STATUS_SEM_MUDANCA = 'SEM MUDANÇA'
+STATUS_CATEGORIES = [STATUS_NOVO, STATUS_ALTERADO, STATUS_SEM_MUDANCA]
+
+def diff_schedules(df_novo, df_antigo, programa_novo='Programa_Padronizado',
+                   programa_antigo='Programa_Padronizado', chave='chave', metadata_columns=None):
+    """
+    Compara as grades pela coluna `chave` (ver schedule_keys.build_weekday_keys).
+
+    - Programa da grade nova: texto sem espaços nas pontas e sem espaços duplos.
+    - Programa anterior: última ocorrência de cada chave na grade antiga.
+    - Status: NOVO (sem programa anterior), ALTERADO (diferente) ou SEM MUDANÇA.
+    - Metadados: as `metadata_columns` da grade antiga (padrão: todas as colunas
+      que não são Data/Horario/Programa/chave/Status) são trazidas pelo nome do
+      programa novo (última ocorrência); ausentes viram "".
+
+    Retorna um DataFrame na ordem de `df_novo` com as colunas
+    Data, Horario, Programa, Programa_Anterior, chave, Status (categórico) + metadados.
+    """
+    if metadata_columns is None:
+        principais = {'Data', 'Horario', programa_antigo, 'Programa_Padronizado', chave, 'Status', 'Programa_Bruto'}
+        metadata_columns = [c for c in df_antigo.columns if c not in principais]
+
+    programa = (df_novo[programa_novo].astype(str)
+                .str.strip()
+                .str.replace('  ', ' ', regex=False)
+                .reset_index(drop=True))
+
+    # Programa anterior por chave (última ocorrência)
+    mapa_antigo = df_antigo.drop_duplicates(subset=[chave], keep='last').set_index(chave)[programa_antigo]
+    anterior = df_novo[chave].map(mapa_antigo).reset_index(drop=True)
+
+    sem_anterior = anterior.isna() | (anterior == '') | (anterior.astype(str) == 'nan')
+    alterado = ~sem_anterior & (programa != anterior)
+    status = pd.Series(STATUS_SEM_MUDANCA, index=programa.index)
+    status[alterado] = STATUS_ALTERADO
+    status[sem_anterior] = STATUS_NOVO
+
+    result = pd.DataFrame({
+        'Data': df_novo['Data'].to_numpy(),
+        'Horario': df_novo['Horario'].to_numpy(),
+        'Programa': programa,
+        'Programa_Anterior': anterior.astype(object).where(~sem_anterior, ''),
+        'chave': df_novo[chave].to_numpy(),
+        'Status': pd.Categorical(status, categories=STATUS_CATEGORIES),
+    })
+
+    # Metadados (Sinopses, etc.): left-join pelo nome do programa novo
+    if metadata_columns:
+        meta = (df_antigo.drop_duplicates(subset=[programa_antigo], keep='last')
+                .set_index(programa_antigo)[metadata_columns]
+                .astype(object))
+        joined = meta.reindex(programa.to_numpy()).reset_index(drop=True)
+        joined = joined.where(joined.notna(), "")
+        result = pd.concat([result, joined], axis=1)
+
+    return result
@@ -0,0 +1,82 @@
+# app/tasks/schedule_keys.py
+"""
+Geração vetorizada da chave de comparação de grades ("{dia}_{HH:MM}").
+Trabalha coluna a coluna (sem apply por linha) e não depende de Qt/fitz,
+então pode ser usado tanto pelo schedule_processor quanto pelo tools.py.
+"""
+
+import pandas as pd
+
+# Strings que o pandas converte silenciosamente em NaT (a chave vira "nan_HH:MM")
+_NAT_STRINGS = {"", "NaT", "nat", "NAT", "nan", "NaN", "NAN"}
+
+def normalize_time_series(horarios, na_value=None, zero_pad=False):
+    """
+    Normaliza uma coluna de horários para 'HH:MM' de uma só vez.
+    Aceita strings ('07:05', '07:05:00', '2025-11-03 07:05:00'), datetime.time
+    e Timestamp. Sem HH:MM reconhecível, mantém os 5 primeiros caracteres.
+    - na_value: valor usado para células vazias (None = trata como texto 'nan').
+    - zero_pad: completa a hora com zero à esquerda ('7:05' -> '07:05').
+    """
+    s = horarios if isinstance(horarios, pd.Series) else pd.Series(horarios)
+
+    if pd.api.types.is_datetime64_any_dtype(s):
+        out = s.dt.strftime('%H:%M').fillna('NaT')
+    else:
+        txt = s.astype(str).str.strip()
+        parts = txt.str.extract(r'(\d{1,2}):(\d{2})')
+        hours = parts[0].str.zfill(2) if zero_pad else parts[0]
+        out = (hours + ':' + parts[1]).fillna(txt.str[:5])
+
+    if na_value is not None:
+        out = out.mask(s.isna(), na_value)
+    return out
+
+def parse_schedule_dates(datas):
+    """
+    Converte uma coluna de datas para datetime64 (NaT quando inválida).
+    Strings são lidas primeiro como DD/MM/AAAA e, se falhar, em formato livre.
+    """
+    s = datas if isinstance(datas, pd.Series) else pd.Series(datas)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+
+    parsed = pd.to_datetime(s, format='%d/%m/%Y', errors='coerce')
+    retry = parsed.isna() & s.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(s[retry], format='mixed', errors='coerce')
+    return parsed
+
+def build_weekday_keys(df, day_index_map=None, data_col='Data', horario_col='Horario'):
+    """
+    Gera a Series de chaves "{dia}_{HH:MM}" para todas as linhas de `df`.
+    - Sem `day_index_map`: dia = weekday real da data (0=seg, ..., 6=dom).
+    - Com `day_index_map`: dia = índice sequencial da data (ausente -> 0).
+    Datas ilegíveis geram "ERR_{Data}_{Horario}", como na versão por linha.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+
+    datas = df[data_col]
+    horarios = df[horario_col]
+    time_str = normalize_time_series(horarios)
+
+    if day_index_map is not None:
+        day = datas.astype(str).map(day_index_map).fillna(0).astype(int).astype(str)
+        return day + '_' + time_str
+
+    parsed = parse_schedule_dates(datas)
+    day = parsed.dt.weekday.astype('Int64').astype(str).replace('<NA>', 'nan')
+    keys = day + '_' + time_str
+
+    # Só as linhas sem data válida são inspecionadas uma a uma (normalmente nenhuma):
+    # NaN/NaT e textos como 'nan' viram "nan_HH:MM"; o resto (None, texto inválido) é erro.
+    nat = parsed.isna()
+    if nat.any() and not pd.api.types.is_datetime64_any_dtype(datas):
+        bad = datas[nat]
+        is_str = bad.map(lambda v: isinstance(v, str))
+        silent_nat = (is_str & bad.isin(_NAT_STRINGS)) | (~is_str & bad.map(lambda v: v is not None))
+        invalid = bad.index[~silent_nat]
+        if len(invalid):
+            keys[invalid] = 'ERR_' + datas[invalid].astype(str) + '_' + horarios[invalid].astype(str)
+    return keys
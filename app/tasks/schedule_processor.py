@@ -7,109 +7,232 @@ Módulo responsável por toda a lógica de processamento de grades:
 4. Geração de Relatórios Comparativos (Excel Template).
 """
 
+import os
 import re
-import unicodedata
-import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from .mapping_manager import mapping_manager
+from pandas.api.types import union_categoricals
+from .mapping_manager import get_mapping_manager
+from .extraction_cache import get_extraction_cache
+from .schedule_keys import build_weekday_keys, normalize_time_series
+from .pdf_layout import extract_schedule_rows
+from .schedule_diff import diff_schedules
+from .task_control import TaskCancelled, ensure_control
+from .text_normalization import clean_series, slugify_series
+
+# Versão do extrator: incremente sempre que a lógica de leitura dos PDFs mudar,
+# para que as entradas antigas do cache de extração deixem de ser usadas.
+EXTRACTOR_VERSION = 2
+
+# Colunas brutas produzidas pela extração
+SCHEDULE_COLUMNS = ['Data', 'Horario', 'Programa_Bruto']
+
+# Slots de 5 minutos por dia na grade visual do EPG
+EPG_SLOTS_PER_DAY = 288
+
+# Primeira linha de dados no template da Grade Comparada (acima dela: cabeçalho)
+COMPARISON_START_ROW = 4
+
+# Limite de processos simultâneos na extração paralela de PDFs
+MAX_EXTRACTION_WORKERS = 8
+
+# Saídas do pipeline completo e o sufixo de cada arquivo derivado do nome escolhido
+PIPELINE_OUTPUTS = {'simple': '_simples', 'comparison': '_comparada', 'epg': '_epg'}
 
 # ======================================================================
 # == 1. FUNÇÕES AUXILIARES (Internas)                                 ==
 # ======================================================================
 
-def _slugify(text):
-    """Converte texto para formato URL amigável (ex: 'Mãe Maria' -> 'mae-maria')."""
-    if not text: return ""
-    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('utf-8')
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9]+', '-', text).strip('-')
-    return text
-
-def _extract_date_from_pdf(pdf_path):
-    """Procura a primeira data no formato DD/MM/AAAA dentro do PDF."""
+def _extract_pdf_single_pass(pdf_path):
+    """
+    Abre o PDF UMA única vez e devolve (data, linhas, nº de páginas), onde
+    linhas é uma lista de tuplas (Horario, Programa_Bruto) de TODAS as páginas.
+    Função de nível de módulo para poder ser enviada aos processos do pool.
+    """
+    import fitz  # PyMuPDF: carregado só quando um PDF precisa ser lido
+    doc = fitz.open(pdf_path)
     try:
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            text = page.get_text()
-            match = re.search(r'\d{2}/\d{2}/\d{4}', text)
-            if match: return match.group(0)
-        return ""
-    except Exception:
-        return ""
-
-def _get_weekday_key(row):
+        # Data: primeira ocorrência DD/MM/AAAA em qualquer página
+        date = ""
+        try:
+            for page in doc:
+                match = re.search(r'\d{2}/\d{2}/\d{4}', page.get_text())
+                if match:
+                    date = match.group(0)
+                    break
+        except Exception:
+            date = ""
+
+        page_count = doc.page_count
+        pages_words = [page.get_text("words") for page in doc]
+    finally:
+        doc.close()
+
+    # Linhas por tolerância em Y + divisor Horário/Programa detectado no documento
+    rows = extract_schedule_rows(pages_words)
+    return date, rows, page_count
+
+def _iter_extracted_pdfs(pdf_paths, parallel=False, max_workers=None, use_cache=True, control=None):
     """
-    Gera chave baseada em Dia da Semana Real (0=seg, 1=ter, ..., 6=dom) + HH:MM.
-    Usa datetime.weekday() para garantir consistência independente da ordem das datas.
-    Aceita 'Data' como string (DD/MM/YYYY) ou objeto datetime.
+    Gera (data, linhas) para cada PDF, SEMPRE na mesma ordem de `pdf_paths`.
+    PDFs já presentes no cache de extração não são abertos. Com `parallel=True`
+    os demais são lidos em um pool de processos limitado a `max_workers`
+    (padrão: min(nº de PDFs, nº de CPUs, MAX_EXTRACTION_WORKERS)).
+    `control` (TaskControl) recebe o progresso e pode cancelar entre um PDF e outro.
     """
+    control = ensure_control(control)
+    pdf_paths = list(pdf_paths)
+
+    cached = {}
+    extraction_cache = get_extraction_cache() if use_cache else None
+    if use_cache:
+        for i, pdf_path in enumerate(pdf_paths):
+            hit = extraction_cache.get(pdf_path, EXTRACTOR_VERSION)
+            if hit is not None:
+                cached[i] = hit
+    misses = [p for i, p in enumerate(pdf_paths) if i not in cached]
+
+    with _map_extraction(misses, parallel, max_workers) as extracted:
+        for i, pdf_path in enumerate(pdf_paths):
+            control.check()
+            if i in cached:
+                date, rows, _ = cached[i]
+            else:
+                date, rows, page_count = next(extracted)
+                if use_cache:
+                    extraction_cache.put(pdf_path, EXTRACTOR_VERSION, date, rows, page_count)
+            control.report(i + 1, len(pdf_paths), os.path.basename(pdf_path))
+            yield date, rows
+
+@contextmanager
+def _map_extraction(pdf_paths, parallel, max_workers):
+    """Iterador ordenado de `_extract_pdf_single_pass` (sequencial ou em pool)."""
+    if not parallel or len(pdf_paths) < 2:
+        yield map(_extract_pdf_single_pass, pdf_paths)
+        return
+
+    if max_workers is None:
+        max_workers = min(len(pdf_paths), os.cpu_count() or 1, MAX_EXTRACTION_WORKERS)
+    max_workers = max(1, min(max_workers, len(pdf_paths)))
+
     try:
-        # Normaliza horário para HH:MM
-        horario_raw = row.get('Horario', "")
-        if hasattr(horario_raw, 'hour') and hasattr(horario_raw, 'minute'):
-            time_str = f"{int(horario_raw.hour):02}:{int(horario_raw.minute):02}"
-        else:
-            s = str(horario_raw).strip()
-            m = re.search(r'(\d{1,2}:\d{2})', s)
-            time_str = m.group(1) if m else s[:5]
-        
-        # Converte data para datetime e extrai weekday (0=seg, ..., 6=dom)
-        data_raw = row.get('Data', '')
-        if isinstance(data_raw, str):
-            try:
-                data_obj = pd.to_datetime(data_raw, format='%d/%m/%Y')
-            except:
-                data_obj = pd.to_datetime(data_raw)
-        else:
-            data_obj = pd.to_datetime(data_raw)
-        
-        weekday = data_obj.weekday()  # 0=seg, 1=ter, ..., 6=dom
-        return f"{weekday}_{time_str}"
-    except Exception:
-        return f"ERR_{row.get('Data')}_{row.get('Horario')}"
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    except (OSError, NotImplementedError):
+        # Ambiente sem suporte a multiprocessing: segue em modo sequencial
+        yield map(_extract_pdf_single_pass, pdf_paths)
+        return
+
+    try:
+        # executor.map preserva a ordem de entrada (resultado determinístico)
+        yield executor.map(_extract_pdf_single_pass, pdf_paths)
+    finally:
+        # Em caso de cancelamento/erro, os PDFs que ainda não começaram são descartados
+        executor.shutdown(wait=True, cancel_futures=True)
 
-def _extract_raw_data_from_pdfs(pdf_paths):
+def iter_schedule_batches(pdf_paths, parallel=False, max_workers=None, use_cache=True, control=None):
+    """
+    Gera UM lote colunar tipado por documento, na ordem de `pdf_paths`:
+    DataFrame com 'Data' e 'Programa_Bruto' categóricos e 'Horario' texto.
+    Permite processar grandes volumes de PDFs sem manter uma lista de dicts
+    por linha em memória. Documentos sem linhas válidas não geram lote.
+    """
+    for date, rows in _iter_extracted_pdfs(pdf_paths, parallel, max_workers, use_cache, control):
+        if not rows:
+            continue
+        horarios, programas = zip(*rows)
+        yield pd.DataFrame({
+            'Data': pd.Categorical([date] * len(rows)),
+            'Horario': pd.Series(horarios, dtype=object),
+            'Programa_Bruto': pd.Categorical(programas),
+        })
+
+def build_schedule_frame(batches):
+    """
+    Concatena os lotes de `iter_schedule_batches` em um único DataFrame,
+    unindo as categorias de 'Data'/'Programa_Bruto' (continuam categóricas).
+    """
+    datas, horarios, programas = [], [], []
+    for batch in batches:
+        datas.append(batch['Data'].array)
+        horarios.append(batch['Horario'].to_numpy(dtype=object))
+        programas.append(batch['Programa_Bruto'].array)
+
+    if not datas:
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+    return pd.DataFrame({
+        'Data': union_categoricals(datas),
+        'Horario': np.concatenate(horarios),
+        'Programa_Bruto': union_categoricals(programas),
+    })
+
+def _extract_raw_data_from_pdfs(pdf_paths, parallel=False, max_workers=None, use_cache=True, control=None):
     """Lê as coordenadas X/Y do PDF para separar Horário de Programa."""
-    all_schedule_data = []
-    COLUMN_DIVIDER_X = 70.0 # Divisor visual entre coluna de hora e nome
-
-    for pdf_path in pdf_paths:
-        date = _extract_date_from_pdf(pdf_path)
-        doc = fitz.open(pdf_path)
-        page = doc[0] # Assume que a grade está na primeira página
-        words = page.get_text("words")
-        
-        # Agrupa palavras por linha (eixo Y)
-        lines = {}
-        for word in words:
-            y0 = word[1]
-            line_key = int(y0 // 10) # Agrupamento aproximado
-            if line_key not in lines: lines[line_key] = []
-            lines[line_key].append(word)
-        
-        # Processa cada linha
-        for line_key in sorted(lines.keys()):
-            line_words = sorted(lines[line_key], key=lambda w: w[0])
-            horario = ""
-            programa_parts = []
-            
-            for word in line_words:
-                if word[0] < COLUMN_DIVIDER_X:
-                    horario = word[4]
-                else:
-                    programa_parts.append(word[4])
-            
-            # Só adiciona se tiver horário válido
-            if horario and horario[:1].isdigit():
-                all_schedule_data.append({
-                    'Data': date,
-                    'Horario': horario,
-                    'Programa_Bruto': " ".join(programa_parts)
-                })
-                
-    return pd.DataFrame(all_schedule_data)
+    return build_schedule_frame(iter_schedule_batches(pdf_paths, parallel, max_workers, use_cache, control))
+
+def _build_epg_grid(df):
+    """
+    Monta a grade visual do EPG: linhas = slots de 5 min (00:00 a 23:55),
+    colunas = datas ('DD/MM/AAAA'), células = `titulo_slug`.
+    `inicio` é arredondado ao slot de 5 min mais próximo (23:58 vai para 00:00
+    do mesmo dia); se dois programas caem no mesmo slot, vale o último.
+    """
+    inicio = df['inicio']
+
+    # Coordenada do dia: posição da data entre as datas ordenadas
+    day_codes, datas = pd.factorize(inicio.dt.normalize(), sort=True)
+    colunas_datas = [d.strftime('%d/%m/%Y') for d in datas]
+
+    # Coordenada do slot: minutos do dia / 5, arredondado, módulo 288
+    minutes = inicio.dt.hour.to_numpy() * 60 + inicio.dt.minute.to_numpy()
+    slot_codes = np.round(minutes / 5).astype(np.int64) % EPG_SLOTS_PER_DAY
+
+    # Índice de horários (00:00 a 23:55) na data-base 1900-01-01
+    indice_horarios = pd.DatetimeIndex(pd.date_range("1900-01-01", periods=EPG_SLOTS_PER_DAY, freq="5min"), freq=None)
+
+    grid = np.full((EPG_SLOTS_PER_DAY, len(colunas_datas)), np.nan, dtype=object)
+    if len(df):
+        # Mantém só a ÚLTIMA ocorrência de cada célula (slot, dia)
+        flat = slot_codes * len(colunas_datas) + day_codes
+        _, last_from_end = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last_from_end
+        grid.flat[flat[keep]] = df['titulo_slug'].to_numpy(dtype=object)[keep]
+
+    grade_df = pd.DataFrame(grid, index=indice_horarios, columns=colunas_datas)
+    grade_df.index.name = 'BRT'
+    return grade_df
+
+def _plan_merge_ranges(values, first_row=1, first_col=1):
+    """
+    Calcula as faixas de mesclagem da aba Schedule por run-length, coluna a coluna.
+    Cada célula preenchida abre um bloco que vai até a linha anterior à próxima
+    célula preenchida da mesma coluna (ou até a última linha).
+    Retorna arrays (linha_inicial, linha_final, coluna, texto) já em
+    coordenadas do Excel (deslocadas por cabeçalho/índice), ordenados por coluna.
+    """
+    n_rows = values.shape[0]
+    filled = pd.notna(values) & (values != "")
+
+    # np.nonzero na transposta => ordenado por coluna e, dentro dela, por linha
+    cols, rows = np.nonzero(filled.T)
+    ends = np.full(len(rows), n_rows - 1)
+    if len(rows) > 1:
+        same_col = cols[1:] == cols[:-1]
+        ends[:-1] = np.where(same_col, rows[1:] - 1, n_rows - 1)
+
+    texts = values[rows, cols]
+    return rows + first_row, ends + first_row, cols + first_col, texts
+
+def _write_merge_ranges(ws, ranges, cell_format):
+    """Consome o plano de `_plan_merge_ranges`: mescla blocos longos e escreve os de 1 célula."""
+    for start, end, col, text in zip(*ranges):
+        start, end, col = int(start), int(end), int(col)
+        if end > start:
+            ws.merge_range(start, col, end, col, text, cell_format)
+        else:
+            ws.write(start, col, text, cell_format)
 
 def find_unmapped_programs(pdf_paths=None, df_extracted=None):
     """
@@ -118,7 +241,7 @@ def find_unmapped_programs(pdf_paths=None, df_extracted=None):
     Lida com DataFrames que contenham 'Programa_Bruto' OU 'Programa_Padronizado'.
     Retorna nomes originais (brutos quando disponíveis) para exibição no editor.
     """
-    mapping_dict, err = mapping_manager.load_mapping_as_dict()
+    mapping_index, err = get_mapping_manager().get_mapping_index()
     if err:
         return None, err
 
@@ -134,30 +257,19 @@ def find_unmapped_programs(pdf_paths=None, df_extracted=None):
         if df_raw is None or df_raw.empty:
             return [], None
 
-        # Normalização leve: remove acentos, espaços extras e lower
-        def _norm(s):
-            if s is None:
-                return ""
-            s = str(s).strip()
-            s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
-            s = re.sub(r'\s+', ' ', s)
-            return s.lower()
-
-        # Dois cenários:
+        # Dois cenários (comparação normalizada: sem acentos, espaços extras e lower):
         # A) Temos 'Programa_Bruto' => comparamos contra as chaves (Nome_do_PDF) do mapping
         if 'Programa_Bruto' in df_raw.columns:
-            mapped_keys_norm = { _norm(k) for k in mapping_dict.keys() if pd.notna(k) }
             unique_raw = pd.Series(df_raw['Programa_Bruto'].astype(str).unique())
-            unmapped = [raw for raw in unique_raw if _norm(raw) not in mapped_keys_norm]
+            unmapped = [raw for raw in unique_raw if not mapping_index.has_key(raw)]
             return unmapped, None
 
         # B) Temos apenas 'Programa_Padronizado' (output já com o replace aplicado)
         #    Nesse caso, assumimos que valores que NÃO aparecem em mapping.values() são não-mapeados.
         if 'Programa_Padronizado' in df_raw.columns:
-            mapped_values_norm = { _norm(v) for v in mapping_dict.values() if pd.notna(v) }
             unique_pad = pd.Series(df_raw['Programa_Padronizado'].astype(str).unique())
             # itens cujo padronizado não aparece entre valores mapeados => provavelmente não mapeados
-            unmapped = [p for p in unique_pad if _norm(p) not in mapped_values_norm]
+            unmapped = [p for p in unique_pad if not mapping_index.has_value(p)]
             return unmapped, None
 
         # Se nenhuma coluna esperada existir, devolve erro explicativo
@@ -169,107 +281,103 @@ def find_unmapped_programs(pdf_paths=None, df_extracted=None):
 # == 2. FUNÇÕES PRINCIPAIS (Tasks)                                    ==
 # ======================================================================
 
-def extract_and_clean_from_pdfs(pdf_paths):
-    """Extrai dados, ordena cronologicamente e aplica o De-Para (Blindado)."""
-    
-    # 1. Carrega o dicionário
-    raw_mapping, error = mapping_manager.load_mapping_as_dict()
-    if error: return None, error
+def extract_and_clean_from_pdfs(pdf_paths, parallel=False, control=None):
+    """
+    Extrai dados, ordena cronologicamente e aplica o De-Para (Blindado).
+    Com `parallel=True` os PDFs são lidos em um pool de processos.
+    `control` (TaskControl): progresso por PDF, cancelamento e tempo por fase.
+    """
+    control = ensure_control(control)
 
-    # BLINDAGEM DO MAPEAMENTO: Remove espaços das chaves do dicionário
+    # 1. Carrega o índice compilado do DE-PARA (chaves já sem espaços nas pontas)
     # Ex: " Programa X " vira "Programa X" no índice de busca
-    mapping_dict = {k.strip(): v for k, v in raw_mapping.items()}
+    mapping_index, error = get_mapping_manager().get_mapping_index()
+    if error: return None, error
 
     try:
-        df_extracted = _extract_raw_data_from_pdfs(pdf_paths)
+        with control.phase("Leitura dos PDFs"):
+            df_extracted = _extract_raw_data_from_pdfs(pdf_paths, parallel=parallel, control=control)
         if df_extracted.empty: return None, "Erro: PDFs vazios ou ilegíveis."
 
-        # 2. Ordenação Cronológica (Mantida igual)
-        df_extracted['temp_data'] = pd.to_datetime(df_extracted['Data'], format='%d/%m/%Y', errors='coerce')
-        df_extracted['temp_hora_dt'] = pd.to_datetime(df_extracted['Horario'], format='%H:%M', errors='coerce')
-        mask_na = df_extracted['temp_hora_dt'].isna()
-        if mask_na.any():
-            df_extracted.loc[mask_na, 'temp_hora_dt'] = pd.to_datetime(df_extracted.loc[mask_na, 'Horario'], format='%H:%M:%S', errors='coerce')
-
-        df_extracted['temp_hora'] = df_extracted['temp_hora_dt'].dt.time
-        df_extracted.sort_values(by=['temp_data', 'temp_hora'], inplace=True)
+        with control.phase("Limpeza e ordenação"):
+            df_extracted = _sort_and_clean_extracted(df_extracted)
 
-        df_extracted['Horario'] = df_extracted['temp_hora'].apply(lambda t: f"{t.hour:02}:{t.minute:02}" if pd.notna(t) else "")
-        df_extracted.drop(columns=['temp_hora_dt', 'temp_hora', 'temp_data'], inplace=True, errors='ignore')
+        with control.phase("Mapeamento"):
+            # 4. Aplica Mapeamento (Agora com dados limpos vs chaves limpas)
+            df_extracted['Programa_Padronizado'] = mapping_index.apply(df_extracted['Programa_Bruto'])
 
-        # 3. BLINDAGEM DA EXTRAÇÃO: Limpeza rigorosa do nome bruto
-        # Remove espaços do início/fim e converte para string
-        df_extracted['Programa_Bruto'] = df_extracted['Programa_Bruto'].astype(str).str.strip()
-        
-        # Remove espaços duplos no meio do nome (ex: "Jornal  Hoje" -> "Jornal Hoje")
-        df_extracted['Programa_Bruto'] = df_extracted['Programa_Bruto'].str.replace(r'\s+', ' ', regex=True)
+            # Gera chave (vetorizado)
+            df_extracted['chave'] = build_weekday_keys(df_extracted)
 
-        # 4. Aplica Mapeamento (Agora com dados limpos vs chaves limpas)
-        df_extracted['Programa_Padronizado'] = df_extracted['Programa_Bruto'].replace(mapping_dict)
-        
-        # Gera chave
-        df_extracted['chave'] = df_extracted.apply(lambda row: _get_weekday_key(row), axis=1)
-        
         return df_extracted[['Data', 'Horario', 'Programa_Bruto', 'Programa_Padronizado', 'chave']], None
+    except TaskCancelled as e:
+        return None, str(e)
     except Exception as e:
         import traceback
         return None, f"Erro na extração: {e} | {traceback.format_exc()}"
 
-def generate_epg_from_simple_schedule(simple_schedule_df, epg_output_path):
+def _sort_and_clean_extracted(df_extracted):
+    """Ordenação cronológica + limpeza do nome bruto (etapas 2 e 3 da extração)."""
+    # A extração devolve 'Data' categórica; a grade limpa trabalha com texto
+    df_extracted['Data'] = df_extracted['Data'].astype(str)
+
+    # 2. Ordenação Cronológica (Mantida igual)
+    df_extracted['temp_data'] = pd.to_datetime(df_extracted['Data'], format='%d/%m/%Y', errors='coerce')
+    df_extracted['temp_hora_dt'] = pd.to_datetime(df_extracted['Horario'], format='%H:%M', errors='coerce')
+    mask_na = df_extracted['temp_hora_dt'].isna()
+    if mask_na.any():
+        df_extracted.loc[mask_na, 'temp_hora_dt'] = pd.to_datetime(df_extracted.loc[mask_na, 'Horario'], format='%H:%M:%S', errors='coerce')
+
+    df_extracted.sort_values(by=['temp_data', 'temp_hora_dt'], inplace=True)
+
+    df_extracted['Horario'] = df_extracted['temp_hora_dt'].dt.strftime('%H:%M').fillna("")
+    df_extracted.drop(columns=['temp_hora_dt', 'temp_data'], inplace=True, errors='ignore')
+
+    # 3. BLINDAGEM DA EXTRAÇÃO: Limpeza rigorosa do nome bruto
+    # Remove espaços do início/fim e espaços duplos no meio (ex: "Jornal  Hoje" -> "Jornal Hoje")
+    df_extracted['Programa_Bruto'] = clean_series(df_extracted['Programa_Bruto'])
+    return df_extracted
+
+def generate_epg_from_simple_schedule(simple_schedule_df, epg_output_path, control=None):
     """
     Gera o Excel Visual (EPG) com células mescladas e aba de Database.
     INTEGRAÇÃO: Atualiza o epg_database.csv com novos títulos encontrados.
+    `control` (TaskControl): cancelamento entre as fases e tempo de cada uma.
     """
+    control = ensure_control(control)
     try:
         # Importação sob demanda para evitar ciclos
-        from .epg_database_manager import epg_manager
-        
-        df = simple_schedule_df.copy()
+        from .epg_database_manager import get_epg_manager
+        epg_manager = get_epg_manager()
         
-        # 1. Preparação de Datas e Horários
-        df['inicio'] = pd.to_datetime(df['Data'] + ' ' + df['Horario'], format='%d/%m/%Y %H:%M')
-        df['titulo_slug'] = df['Programa_Padronizado'].apply(_slugify)
-        df = df.sort_values(by='inicio').reset_index(drop=True)
+        with control.phase("Preparação"):
+            df = simple_schedule_df.copy()
+
+            # 1. Preparação de Datas e Horários
+            df['inicio'] = pd.to_datetime(df['Data'] + ' ' + df['Horario'], format='%d/%m/%Y %H:%M')
+            df['titulo_slug'] = slugify_series(df['Programa_Padronizado'])
+            df = df.sort_values(by='inicio').reset_index(drop=True)
         
         # === ATUALIZAÇÃO DO BANCO DE DADOS ===
-        # Extrai lista de títulos e slugs para verificar se são novos
-        # Usamos drop_duplicates para processar cada programa apenas uma vez
-        unique_progs = df[['titulo_slug', 'Programa_Padronizado']].drop_duplicates()
-        slugs_list = unique_progs['titulo_slug'].tolist()
-        titles_list = unique_progs['Programa_Padronizado'].tolist()
-        
-        added_count = epg_manager.update_with_new_programs(slugs_list, titles_list)
+        with control.phase("Banco de dados EPG"):
+            # Extrai lista de títulos e slugs para verificar se são novos
+            # Usamos drop_duplicates para processar cada programa apenas uma vez
+            unique_progs = df[['titulo_slug', 'Programa_Padronizado']].drop_duplicates()
+            slugs_list = unique_progs['titulo_slug'].tolist()
+            titles_list = unique_progs['Programa_Padronizado'].tolist()
+
+            added_count = epg_manager.update_with_new_programs(slugs_list, titles_list)
         # =====================================
 
-        datas = sorted(df['inicio'].dt.date.unique())
-        colunas_datas = [d.strftime('%d/%m/%Y') for d in datas]
-        
-        # Cria índice de horários (00:00 a 23:55)
-        times_str = pd.date_range("00:00", "23:55", freq="5min").time.astype(str)
-        indice_horarios = pd.to_datetime(times_str, format='%H:%M:%S')
-        
-        grade_df = pd.DataFrame(index=indice_horarios, columns=colunas_datas)
-        grade_df.index.name = 'BRT'
-
-        # Preenche a Grade Visual
-        for _, row in df.iterrows():
-            data_str = row['inicio'].strftime('%d/%m/%Y')
-            h, m = row['inicio'].hour, row['inicio'].minute
-            m_round = 5 * round(m / 5)
-            if m_round == 60: h += 1; m_round = 0; 
-            if h == 24: h = 0
-            
-            time_str = f"{h:02}:{m_round:02}:00"
-            idx_inicio = pd.to_datetime(time_str, format='%H:%M:%S')
-            
-            if data_str in grade_df.columns and idx_inicio in grade_df.index:
-                grade_df.loc[idx_inicio, data_str] = row['titulo_slug']
+        with control.phase("Grade visual"):
+            # Preenche a Grade Visual (vetorizado)
+            grade_df = _build_epg_grid(df)
 
-        # Carrega o banco atualizado para salvar na aba 2
-        df_epg_db = epg_manager.load_db()
+            # Carrega o banco atualizado para salvar na aba 2
+            df_epg_db = epg_manager.load_db()
 
         # Escrita com XlsxWriter (2 Abas)
-        with pd.ExcelWriter(epg_output_path, engine='xlsxwriter') as writer:
+        with control.phase("Escrita do Excel"), pd.ExcelWriter(epg_output_path, engine='xlsxwriter') as writer:
             
             # --- ABA 1: SCHEDULE ---
             grade_df.index = grade_df.index.strftime('%H:%M')
@@ -282,31 +390,10 @@ def generate_epg_from_simple_schedule(simple_schedule_df, epg_output_path):
             ws.set_column('A:A', 10)
             ws.set_column('B:Z', 25)
 
-            # Algoritmo de Mesclagem
-            for col_num, _ in enumerate(grade_df.columns):
-                excel_col = col_num + 1
-                start_row = -1
-                last_txt = None
-                
-                for row_num in range(len(grade_df)):
-                    excel_row = row_num + 1
-                    val = grade_df.iloc[row_num, col_num]
-                    
-                    if pd.notna(val) and val != "":
-                        if start_row != -1:
-                            end_row = excel_row - 1
-                            if end_row > start_row:
-                                ws.merge_range(start_row, excel_col, end_row, excel_col, last_txt, merge_fmt)
-                            else:
-                                ws.write(start_row, excel_col, last_txt, merge_fmt)
-                        start_row = excel_row
-                        last_txt = val
-                    
-                    if row_num == len(grade_df) - 1 and start_row != -1:
-                        if excel_row > start_row:
-                            ws.merge_range(start_row, excel_col, excel_row, excel_col, last_txt, merge_fmt)
-                        else:
-                            ws.write(start_row, excel_col, last_txt, merge_fmt)
+            # Algoritmo de Mesclagem: faixas calculadas de uma vez (run-length)
+            # Obs.: sem 'constant_memory' porque merge_range preenche as linhas
+            # seguintes com células em branco, o que esse modo não permite.
+            _write_merge_ranges(ws, _plan_merge_ranges(grade_df.to_numpy(dtype=object)), merge_fmt)
             
             # --- ABA 2: EPG (DATABASE) ---
             df_epg_db.to_excel(writer, sheet_name='EPG', index=False)
@@ -319,137 +406,129 @@ def generate_epg_from_simple_schedule(simple_schedule_df, epg_output_path):
         msg_extra = f" (+{added_count} novos programas cadastrados)" if added_count > 0 else ""
         return f"Sucesso! EPG salvo em '{epg_output_path}'{msg_extra}"
 
+    except TaskCancelled as e:
+        return str(e)
     except Exception as e:
         import traceback
         return f"Erro EPG: {e} | {traceback.format_exc()}"
 
-def generate_comparison_report(clean_schedule_df, excel_anterior_path, output_path):
+def generate_comparison_report(clean_schedule_df, excel_anterior_path, output_path, writer='openpyxl', control=None):
     """
     Gera relatório comparativo usando a planilha anterior como Template.
     BLINDAGEM: Normaliza strings (remove espaços) antes de comparar.
+    writer: 'openpyxl' preserva o template inteiro; 'xlsxwriter' é mais rápido e
+    copia só o cabeçalho (linhas acima de COMPARISON_START_ROW).
+    `control` (TaskControl): cancelamento entre as fases e tempo de cada uma.
     """
+    control = ensure_control(control)
     try:
+        # openpyxl/xlsxwriter só entram quando a comparação é usada
+        from .template_reader import get_template_reader
+        from .comparison_writer import write_comparison_report
+
         df_novo = clean_schedule_df.copy()
 
-        # 1. Leitura Inteligente do Template
-        try:
-            df_antigo = pd.read_excel(excel_anterior_path, header=0)
-            if 'Data' not in df_antigo.columns: raise ValueError()
-        except:
-            df_antigo = pd.read_excel(excel_anterior_path, header=2)
-
-        # Limpeza de colunas do Template
-        df_antigo = df_antigo.loc[:, ~df_antigo.columns.str.contains('^Unnamed')]
-        df_antigo.columns = df_antigo.columns.str.strip()
-        
-        if 'Programa' in df_antigo.columns:
-            df_antigo.rename(columns={'Programa': 'Programa_Padronizado'}, inplace=True)
-
-        # === BLINDAGEM DO TEMPLATE (Limpeza de Strings) ===
-        # Garante que os nomes no Excel antigo não tenham espaços invisíveis
-        if 'Programa_Padronizado' in df_antigo.columns:
-            df_antigo['Programa_Padronizado'] = df_antigo['Programa_Padronizado'].astype(str).str.strip()
-            df_antigo['Programa_Padronizado'] = df_antigo['Programa_Padronizado'].str.replace(r'\s+', ' ', regex=True)
-        # ==================================================
-
-        # Normaliza Data/Hora
-        df_antigo['Data'] = df_antigo['Data'].astype(str)
-        
-        def _normalize_time(val):
-            if pd.isna(val): return "00:00"
-            if hasattr(val, 'hour'): return f"{int(val.hour):02}:{int(val.minute):02}"
-            s = str(val).strip()
-            m = re.search(r'(\d{1,2}:\d{2})', s)
-            return m.group(1) if m else s[:5]
-        
-        df_antigo['Horario'] = df_antigo['Horario'].apply(_normalize_time)
-        
-        # Gera chaves
-        df_novo['chave'] = df_novo.apply(lambda row: _get_weekday_key(row), axis=1)
-        df_antigo['chave'] = df_antigo.apply(lambda row: _get_weekday_key(row), axis=1)
-
-        # Cria mapas de referência
-        # Pega a última ocorrência para evitar duplicatas de chave
-        df_antigo_unique = df_antigo.drop_duplicates(subset=['chave'], keep='last')
-        mapa_antigo = df_antigo_unique.set_index('chave')['Programa_Padronizado'].to_dict()
-        
-        # Mapa de Metadados (Sinopses, etc.)
-        df_meta_unique = df_antigo.drop_duplicates(subset=['Programa_Padronizado'], keep='last')
-        db_metadados = df_meta_unique.set_index('Programa_Padronizado').to_dict('index')
-
-        colunas_principais = {'Data', 'Horario', 'Programa_Padronizado', 'chave', 'Status', 'Programa_Bruto'}
-        colunas_extras = [c for c in df_antigo.columns if c not in colunas_principais]
-
-        # 2. Comparação
-        registros = []
-        for _, row in df_novo.iterrows():
-            chave = row['chave']
-            # Garante limpeza também no nome novo (vindo da extração)
-            prog_novo = str(row['Programa_Padronizado']).strip().replace('  ', ' ')
-            
-            prog_antigo = mapa_antigo.get(chave)
-            
-            # Lógica de Status
-            if not prog_antigo or str(prog_antigo) == 'nan':
-                status = 'NOVO'
-            elif prog_novo != prog_antigo:
-                status = 'ALTERADO'
-            else:
-                status = 'SEM MUDANÇA'
-            
-            item = {
-                'Data': row['Data'], 'Horario': row['Horario'], 'Programa': prog_novo, 'Status': status
-            }
-            
-            # Recupera Metadados (usando o nome limpo como chave)
-            meta_row = db_metadados.get(prog_novo, {})
-            for col in colunas_extras:
-                val = meta_row.get(col, "")
-                item[col] = val if pd.notna(val) else ""
-            
-            registros.append(item)
+        # 1. Leitura Inteligente do Template (uma passada, cabeçalho detectado e em cache)
+        with control.phase("Leitura do template"):
+            df_antigo, template_header = get_template_reader().read(excel_anterior_path,
+                                                                    header_block_rows=COMPARISON_START_ROW - 1)
 
-        # 3. Escrita no Excel (Lógica Visual - Mantida igual)
-        wb = load_workbook(excel_anterior_path)
-        ws = wb.active
-        
-        fill_green = PatternFill("solid", fgColor="C6EFCE")
-        fill_yellow = PatternFill("solid", fgColor="FFFF00")
-        border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        align = Alignment(horizontal='left', vertical='center')
-
-        start_row = 4
-        ws.delete_rows(start_row, amount=(ws.max_row + 100))
-
-        curr_row = start_row
-        last_date = None
-        cols_order = ['Data', 'Horario', 'Programa'] + colunas_extras
-
-        for reg in registros:
-            # Linha Amarela
-            if last_date and reg['Data'] != last_date:
-                for c in range(2, len(cols_order) + 3):
-                    cell = ws.cell(curr_row, c)
-                    cell.fill = fill_yellow
-                    cell.border = border
-                ws.row_dimensions[curr_row].height = 15
-                curr_row += 1
-            
-            last_date = reg['Data']
-            is_changed = reg['Status'] in ['NOVO', 'ALTERADO']
-
-            for i, col in enumerate(cols_order):
-                cell = ws.cell(curr_row, i + 2)
-                cell.value = reg.get(col, "")
-                cell.border = border
-                cell.alignment = align
-                if is_changed: cell.fill = fill_green
-            
-            curr_row += 1
+        with control.phase("Comparação"):
+            if 'Programa' in df_antigo.columns:
+                df_antigo.rename(columns={'Programa': 'Programa_Padronizado'}, inplace=True)
+
+            # === BLINDAGEM DO TEMPLATE (Limpeza de Strings) ===
+            # Garante que os nomes no Excel antigo não tenham espaços invisíveis
+            if 'Programa_Padronizado' in df_antigo.columns:
+                df_antigo['Programa_Padronizado'] = clean_series(df_antigo['Programa_Padronizado'])
+            # ==================================================
+
+            # Normaliza Data/Hora
+            df_antigo['Data'] = df_antigo['Data'].astype(str)
+
+            df_antigo['Horario'] = normalize_time_series(df_antigo['Horario'], na_value="00:00")
 
-        wb.save(output_path)
+            # Gera chaves
+            df_novo['chave'] = build_weekday_keys(df_novo)
+            df_antigo['chave'] = build_weekday_keys(df_antigo)
+
+            colunas_principais = {'Data', 'Horario', 'Programa_Padronizado', 'chave', 'Status', 'Programa_Bruto'}
+            colunas_extras = [c for c in df_antigo.columns if c not in colunas_principais]
+
+            # 2. Comparação (junção por chave + metadados pelo nome limpo do programa)
+            df_diff = diff_schedules(df_novo, df_antigo, metadata_columns=colunas_extras)
+
+        # 3. Escrita no Excel (estilos registrados uma vez; ver comparison_writer)
+        with control.phase("Escrita do Excel"):
+            cols_order = ['Data', 'Horario', 'Programa'] + colunas_extras
+            write_comparison_report(excel_anterior_path, output_path, df_diff, cols_order,
+                                    start_row=COMPARISON_START_ROW, writer=writer, header=template_header)
         return f"Sucesso! Salvo em '{output_path}'"
 
+    except TaskCancelled as e:
+        return str(e)
     except Exception as e:
         import traceback
-        return f"Erro Comparação: {e} | {traceback.format_exc()}"
\ No newline at end of file
+        return f"Erro Comparação: {e} | {traceback.format_exc()}"
+
+def save_simple_schedule(clean_schedule_df, output_path, control=None):
+    """Grava a Planilha Simples (aba 'Grade Limpa'). Retorna a mensagem de status."""
+    control = ensure_control(control)
+    try:
+        with control.phase("Escrita do Excel"):
+            clean_schedule_df.to_excel(output_path, index=False, sheet_name="Grade Limpa")
+        return f"Sucesso! Salvo em '{os.path.basename(output_path)}'"
+    except TaskCancelled as e:
+        return str(e)
+    except Exception as e:
+        return f"Erro: {e}"
+
+# ======================================================================
+# == PIPELINE COMPLETO (uma extração -> três saídas)                  ==
+# ======================================================================
+
+def pipeline_output_paths(base_path, include_comparison=True):
+    """
+    Deriva os caminhos das saídas a partir de um único nome escolhido pelo usuário:
+    'Grade.xlsx' -> 'Grade_simples.xlsx', 'Grade_comparada.xlsx', 'Grade_epg.xlsx'.
+    """
+    root, ext = os.path.splitext(base_path)
+    ext = ext or '.xlsx'
+    return {kind: f"{root}{suffix}{ext}" for kind, suffix in PIPELINE_OUTPUTS.items()
+            if kind != 'comparison' or include_comparison}
+
+def generate_all_outputs(clean_schedule_df, output_paths, excel_anterior_path=None, writer='openpyxl', control=None):
+    """
+    Gera as saídas pedidas em `output_paths` ({'simple'|'comparison'|'epg': caminho})
+    a partir do MESMO DataFrame já extraído e mapeado, com os escritores em paralelo.
+    Nenhum escritor altera o DataFrame (cada um trabalha na própria cópia).
+    A comparação exige `excel_anterior_path`. Retorna a mensagem de status consolidada.
+    """
+    control = ensure_control(control)
+    jobs = {
+        'simple': ("Simples", lambda c: save_simple_schedule(clean_schedule_df, output_paths['simple'], control=c)),
+        'comparison': ("Comparada", lambda c: generate_comparison_report(
+            clean_schedule_df, excel_anterior_path, output_paths['comparison'], writer=writer, control=c)),
+        'epg': ("EPG", lambda c: generate_epg_from_simple_schedule(clean_schedule_df, output_paths['epg'], control=c)),
+    }
+    selected = [kind for kind in PIPELINE_OUTPUTS if kind in output_paths]
+    if 'comparison' in selected and not excel_anterior_path:
+        return "Erro: a Grade Comparada exige a grade anterior (template)."
+
+    try:
+        control.check()
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(selected) or 1) as executor:
+            futures = {kind: executor.submit(jobs[kind][1], control.child(jobs[kind][0])) for kind in selected}
+            for i, kind in enumerate(selected):
+                results[kind] = futures[kind].result()
+                control.report(i + 1, len(selected), f"{jobs[kind][0]} concluída")
+        control.check()
+    except TaskCancelled as e:
+        return str(e)
+
+    failed = [f"{jobs[k][0]}: {msg}" for k, msg in results.items() if not msg.startswith("Sucesso")]
+    if failed:
+        return " | ".join(failed)
+    nomes = ", ".join(os.path.basename(output_paths[k]) for k in selected)
+    return f"Sucesso! {len(selected)} arquivos gerados: {nomes}"
@@ -0,0 +1,82 @@
+# app/tasks/task_control.py
+"""
+Controle cooperativo das tarefas longas (sem Qt):
+- CancelToken: pedido de cancelamento feito por outra thread (ex.: botão da UI);
+- TaskControl: repassa progresso (atual, total, mensagem), verifica o
+  cancelamento entre arquivos/fases e mede o tempo de cada fase.
+As tarefas recebem `control=None`; sem controle, nada é reportado e o
+cancelamento nunca acontece.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+CANCEL_MESSAGE = "Operação cancelada pelo usuário."
+
+class TaskCancelled(Exception):
+    """Levantada por TaskControl.check() quando o cancelamento foi pedido."""
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+class TaskControl:
+    def __init__(self, progress_callback=None, cancel_token=None):
+        self.progress_callback = progress_callback # fn(atual, total, mensagem)
+        self.cancel_token = cancel_token or CancelToken()
+        self.timings = [] # [(fase, segundos)] na ordem em que terminaram
+        self._lock = threading.Lock()
+        self._parent = None
+        self._prefix = ""
+
+    def child(self, prefixo):
+        """
+        Controle para uma subtarefa (ex.: um dos escritores em paralelo): mesmo
+        cancelamento e progresso; as fases entram no pai como 'prefixo/fase'.
+        """
+        sub = TaskControl(self.progress_callback, self.cancel_token)
+        sub._parent = self
+        sub._prefix = prefixo
+        return sub
+
+    def _record(self, nome, segundos):
+        if self._parent is not None:
+            self._parent._record(f"{self._prefix}/{nome}", segundos)
+        with self._lock:
+            self.timings.append((nome, segundos))
+
+    def check(self):
+        """Ponto de cancelamento: chame entre arquivos e entre fases."""
+        if self.cancel_token.cancelled:
+            raise TaskCancelled(CANCEL_MESSAGE)
+
+    def report(self, atual, total, mensagem=""):
+        if self.progress_callback:
+            self.progress_callback(int(atual), int(total), str(mensagem))
+
+    @contextmanager
+    def phase(self, nome):
+        """Bloco de uma fase: verifica o cancelamento na entrada e registra o tempo gasto."""
+        self.check()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(nome, time.perf_counter() - inicio)
+
+    def format_timings(self):
+        """Ex.: 'Leitura dos PDFs: 1.20s | Mapeamento: 0.05s'."""
+        with self._lock:
+            return " | ".join(f"{nome}: {segundos:.2f}s" for nome, segundos in self.timings)
+
+def ensure_control(control):
+    """Tarefas chamadas sem controle usam um inerte (sem progresso, nunca cancela)."""
+    return control if control is not None else TaskControl()
@@ -0,0 +1,241 @@
+# app/tasks/template_reader.py
+"""
+Leitura única do template da Grade Comparada (a grade anterior em Excel).
+Abre o arquivo UMA vez em modo somente-leitura e devolve:
+- o DataFrame da tabela, com a linha de cabeçalho detectada procurando
+  'Data'/'Horario' (sem as tentativas header=0 / header=2);
+- o bloco de cabeçalho (linhas de título com estilo, larguras, alturas e
+  mesclagens) que o escritor rápido da comparação reaproveita.
+O resultado fica em memória indexado pelo hash do conteúdo do arquivo.
+Não depende de Qt, então serve também ao tools.py.
+"""
+
+import os
+import re
+import hashlib
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from .app_context import LazySingleton
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils import range_boundaries
+from pandas.io.parsers import TextParser
+
+# Quantas linhas do topo são examinadas à procura do cabeçalho
+HEADER_SCAN_ROWS = 20
+
+# Linhas de título copiadas no bloco de cabeçalho (acima da 1ª linha de dados do relatório)
+DEFAULT_HEADER_BLOCK_ROWS = 3
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+_BORDER_INDEX = {
+    'thin': 1, 'medium': 2, 'dashed': 3, 'dotted': 4, 'thick': 5, 'double': 6,
+    'hair': 7, 'mediumDashed': 8, 'dashDot': 9, 'mediumDashDot': 10,
+    'dashDotDot': 11, 'mediumDashDotDot': 12, 'slantDashDot': 13,
+}
+
+class TemplateReader:
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._cache = OrderedDict() # (hash, linhas do bloco) -> (df, header)
+        self._hash_memo = {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path):
+        """SHA-256 do conteúdo do arquivo (memorizado por tamanho + mtime)."""
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = self._hash_memo.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+            self._hash_memo[memo_key] = digest
+        return digest
+
+    def read(self, path, header_block_rows=DEFAULT_HEADER_BLOCK_ROWS):
+        """
+        Retorna (df, header). `df` é sempre uma cópia (o chamador pode alterá-la).
+        `header` é um dict com 'sheet_title', 'header_row' (1-based), 'detected',
+        'rows' (valor, estilo) das primeiras `header_block_rows` linhas,
+        'column_widths', 'row_heights' e 'merges' (0-based).
+        """
+        key = (self.file_hash(path), header_block_rows)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        if entry is None:
+            entry = _parse_template(path, header_block_rows)
+            with self._lock:
+                self._cache[key] = entry
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        df, header = entry
+        return df.copy(), header
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+def _parse_template(path, header_block_rows):
+    # A tabela vem da 1ª aba, como no pd.read_excel padrão
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions() # Dimensões gravadas no arquivo podem estar erradas
+
+        data = []
+        top_cells = []
+        last_row_with_data = -1
+        for row_number, row in enumerate(ws.rows):
+            if row_number < max(HEADER_SCAN_ROWS, header_block_rows):
+                top_cells.append(row)
+            converted = [_convert_cell(cell) for cell in row]
+            while converted and converted[-1] == "":
+                converted.pop()
+            if converted:
+                last_row_with_data = row_number
+            data.append(converted)
+        data = data[:last_row_with_data + 1]
+
+        header_idx, detected = _detect_header_row(data[:HEADER_SCAN_ROWS])
+        header = {
+            'sheet_title': ws.title,
+            'header_row': header_idx + 1,
+            'detected': detected,
+            'rows': [[(cell.value, _cell_style(cell)) for cell in row]
+                     for row in top_cells[:header_block_rows]],
+        }
+        header.update(_read_sheet_layout(getattr(wb, '_archive', None), getattr(ws, '_worksheet_path', None),
+                                         header_block_rows))
+    finally:
+        wb.close()
+
+    return _to_dataframe(data, header_idx), header
+
+def _convert_cell(cell):
+    """Mesma conversão do leitor openpyxl do pandas (vazio -> "", inteiros sem .0)."""
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+def _detect_header_row(rows):
+    """Índice (0-based) da 1ª linha com 'Data' e 'Horario'; senão a 1ª com 'Data'; senão 0."""
+    only_data = None
+    for i, row in enumerate(rows):
+        names = {v.strip() for v in row if isinstance(v, str)}
+        if 'Data' in names and 'Horario' in names:
+            return i, True
+        if only_data is None and 'Data' in names:
+            only_data = i
+    if only_data is not None:
+        return only_data, True
+    return 0, False
+
+def _to_dataframe(data, header_idx):
+    """Monta o DataFrame com o mesmo parser do pd.read_excel e limpa as colunas."""
+    if not data:
+        return pd.DataFrame()
+    width = max(len(r) for r in data)
+    data = [r + [""] * (width - len(r)) for r in data]
+    df = TextParser(data, header=header_idx, skip_blank_lines=False).read()
+
+    # Colunas sem nome ('Unnamed: n') saem; nomes sem espaços nas pontas
+    df.columns = df.columns.astype(str)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df.columns = df.columns.str.strip()
+    return df
+
+# ======================================================================
+# == BLOCO DE CABEÇALHO (estilos e layout das linhas de título)       ==
+# ======================================================================
+
+def _cell_style(cell):
+    """Extrai os atributos de estilo que o xlsxwriter consegue reproduzir."""
+    if not hasattr(cell, 'font'):
+        return None # Célula vazia (EmptyCell)
+    style = {}
+    font = cell.font
+    if font is not None:
+        if font.b: style['bold'] = True
+        if font.i: style['italic'] = True
+        if font.u: style['underline'] = True
+        if font.sz: style['font_size'] = float(font.sz)
+        if font.name: style['font_name'] = font.name
+        color = _rgb(font.color)
+        if color: style['font_color'] = color
+    fill = cell.fill
+    if fill is not None and fill.fill_type == 'solid':
+        color = _rgb(fill.fgColor)
+        if color: style['bg_color'] = color
+    align = cell.alignment
+    if align is not None:
+        if align.horizontal: style['align'] = align.horizontal
+        if align.vertical: style['valign'] = 'vcenter' if align.vertical == 'center' else align.vertical
+        if align.wrap_text: style['text_wrap'] = True
+    border = cell.border
+    if border is not None:
+        for side in ('left', 'right', 'top', 'bottom'):
+            side_style = getattr(border, side).style
+            if side_style in _BORDER_INDEX:
+                style[side] = _BORDER_INDEX[side_style]
+    if cell.number_format and cell.number_format != 'General':
+        style['num_format'] = cell.number_format
+    return style
+
+def _rgb(color):
+    """'AARRGGBB' -> '#RRGGBB' (cores de tema/índice são ignoradas)."""
+    rgb = getattr(color, 'rgb', None) if color is not None else None
+    if isinstance(rgb, str) and re.fullmatch(r'[0-9A-Fa-f]{8}', rgb) and rgb != '00000000':
+        return '#' + rgb[2:]
+    return None
+
+def _read_sheet_layout(archive, worksheet_path, header_rows):
+    """Larguras de coluna, alturas e mesclagens do cabeçalho, direto do XML da aba."""
+    layout = {'column_widths': {}, 'row_heights': {}, 'merges': []}
+    if archive is None or not worksheet_path:
+        return layout
+    try:
+        with archive.open(worksheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                tag = elem.tag.replace(_MAIN_NS, '')
+                if tag == 'col' and elem.get('width'):
+                    for col in range(int(elem.get('min')), int(elem.get('max')) + 1):
+                        layout['column_widths'][col - 1] = float(elem.get('width'))
+                elif tag == 'row':
+                    r = int(elem.get('r', 0))
+                    if r <= header_rows and elem.get('ht'):
+                        layout['row_heights'][r - 1] = float(elem.get('ht'))
+                    elem.clear() # Não acumula as linhas de dados em memória
+                elif tag == 'mergeCell':
+                    c1, r1, c2, r2 = range_boundaries(elem.get('ref'))
+                    if r2 <= header_rows:
+                        layout['merges'].append((r1 - 1, c1 - 1, r2 - 1, c2 - 1))
+    except Exception:
+        pass # Layout é acessório: sem ele o cabeçalho sai com larguras padrão
+    return layout
+
+_template_reader = LazySingleton(TemplateReader)
+
+def get_template_reader():
+    return _template_reader.get()
+
+def __getattr__(name):
+    # Compatibilidade com `from ... import template_reader`: a instância nasce no acesso
+    if name == 'template_reader':
+        return get_template_reader()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -0,0 +1,84 @@
+# app/tasks/text_normalization.py
+"""
+Normalização de texto usada em todo o projeto (sem Qt), em uma versão escalar
+com cache LRU (os títulos de programa se repetem muito) e outra para Series:
+- clean_text: tira espaços das pontas e junta espaços repetidos ("Jornal  Hoje" -> "Jornal Hoje");
+- normalize_text: clean_text + sem acentos + lower (comparação de nomes do DE-PARA);
+- slugify: ID amigável para URL ('Mãe Maria' -> 'mae-maria'), usado como ID no epg_database.csv.
+As versões *_series calculam cada valor distinto UMA vez e espalham o resultado
+pela coluna, com o mesmo resultado da versão escalar aplicada linha a linha.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Entradas distintas guardadas por função (títulos de uma grade cabem com folga)
+CACHE_SIZE = 65536
+
+_WHITESPACE = re.compile(r'\s+')
+_NON_SLUG = re.compile(r'[^a-z0-9]+')
+
+def _strip_accents(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _clean(text):
+    return _WHITESPACE.sub(' ', text.strip())
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(text):
+    text = _strip_accents(text.strip())
+    return _WHITESPACE.sub(' ', text).lower()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _slugify(text):
+    text = _strip_accents(text).lower()
+    return _NON_SLUG.sub('-', text).strip('-')
+
+def clean_text(value):
+    """Texto sem espaços nas pontas e com espaços internos simples (como astype(str): NaN -> 'nan')."""
+    return _clean(str(value))
+
+def normalize_text(value):
+    """Forma de comparação: sem acentos, espaços extras e lower. None/NaN -> ""."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return _normalize(str(value))
+
+def slugify(value):
+    """Converte texto para formato URL amigável (ex: 'Mãe Maria' -> 'mae-maria'). Vazio -> ""."""
+    if not value: return ""
+    return _slugify(str(value))
+
+def _map_distinct(values, func):
+    """Aplica `func` a cada valor distinto de `values` e devolve a Series (object) resultante."""
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    elif pd.api.types.infer_dtype(s, skipna=True) in ('string', 'empty'):
+        codes, uniques = pd.factorize(s)
+    else:
+        # Tipos misturados: 1, 1.0 e True se confundem no hash, então vai valor a valor
+        return pd.Series([func(v) for v in s.tolist()], index=s.index, dtype=object)
+
+    mapped = np.array([func(u) for u in uniques] + [None], dtype=object)
+    out = pd.Series(mapped[codes], index=s.index, dtype=object)
+    missing = codes == -1
+    if missing.any():
+        out[missing] = [func(v) for v in s[missing].tolist()]
+    return out
+
+def clean_series(values):
+    """clean_text para uma coluna inteira."""
+    return _map_distinct(values, clean_text)
+
+def normalize_series(values):
+    """normalize_text para uma coluna inteira."""
+    return _map_distinct(values, normalize_text)
+
+def slugify_series(values):
+    """slugify para uma coluna inteira."""
+    return _map_distinct(values, slugify)
@@ -0,0 +1,364 @@
+# app/tasks/xlsx_sheet_writer.py
+"""
+Grava UMA aba dentro de um .xlsx existente com memória limitada (sem openpyxl).
+O .xlsx é um zip: todas as partes são copiadas como estão para um arquivo novo,
+menos a XML da aba, que é gerada linha a linha (strings inline, sem sharedStrings).
+As outras abas saem byte a byte iguais; o original só é substituído no close().
+Modos:
+- aba nova (não existe): entra no fim do workbook;
+- aba existente: é recriada no mesmo lugar (conteúdo, desenhos e tabelas dela saem);
+- continuar a aba (append_after_rows): as linhas novas entram depois das existentes.
+"""
+
+import os
+import re
+import math
+import zipfile
+import tempfile
+import posixpath
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+# Limites de uma aba do Excel
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLS = 16_384
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_WORKSHEET = NS_REL + "/worksheet"
+REL_OFFICE_DOCUMENT = NS_REL + "/officeDocument"
+REL_CALC_CHAIN = NS_REL + "/calcChain"
+CT_WORKSHEET = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+
+# Leitura das partes copiadas / da aba continuada
+COPY_BLOCK = 1024 * 1024
+
+_SHEET_DATA_END = re.compile(rb'</(?:\w+:)?sheetData>')
+_SHEET_DATA_START = re.compile(rb'<(?:\w+:)?sheetData[\s>/]')
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\b[^>]*/>')
+# Caracteres que o XML não aceita: vão no formato _xHHHH_ do Office
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+class ExcelLimitExceeded(Exception):
+    """A aba passaria do limite de linhas/colunas do Excel."""
+
+class SheetChangedError(Exception):
+    """A aba a continuar não existe mais ou não tem o nº de linhas esperado."""
+
+def check_excel_limits(n_rows, n_cols):
+    """Levanta ExcelLimitExceeded se `n_rows` linhas (com o cabeçalho) ou `n_cols` colunas não cabem na aba."""
+    if n_cols > EXCEL_MAX_COLS:
+        raise ExcelLimitExceeded(f"{n_cols} colunas passam do limite de {EXCEL_MAX_COLS:,} colunas do Excel."
+                                 .replace(",", "."))
+    if n_rows > EXCEL_MAX_ROWS:
+        raise ExcelLimitExceeded(f"A aba passaria do limite de {EXCEL_MAX_ROWS:,} linhas do Excel."
+                                 .replace(",", "."))
+
+def _column_letter(index):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'..."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _text(value):
+    value = _ILLEGAL_XML.sub(lambda m: f"_x{ord(m.group()):04X}_", value)
+    return escape(value)
+
+def _cell_xml(ref, value, style_attr=""):
+    """XML de uma célula (None não gera célula)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float):
+            if math.isnan(value):
+                return ""
+            if math.isinf(value):
+                return f'<c r="{ref}"{style_attr} t="e"><v>#NUM!</v></c>'
+            return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{_text(str(value))}</t></is></c>'
+
+def _resolve(base_dir, target):
+    """Caminho da parte no zip a partir do Target de um relacionamento."""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+def _rels_path(part):
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+def _insert_before(xml, closing_tag, fragment):
+    """Insere `fragment` antes da tag de fechamento (aceita prefixo de namespace)."""
+    match = None
+    for match in re.finditer(rf'</(?:\w+:)?{closing_tag}>', xml):
+        pass
+    if match is None:
+        raise ValueError(f"estrutura inesperada no workbook: </{closing_tag}> não encontrado")
+    return xml[:match.start()] + fragment + xml[match.start():]
+
+def _append_to_collection(xml, tag, fragment):
+    """Acrescenta um item a <fonts>/<borders>/<cellXfs> e atualiza o count. Retorna (xml, índice)."""
+    match = re.search(rf'<{tag}\b([^>]*?)(/?)>', xml)
+    if match is None:
+        raise ValueError(f"<{tag}> não encontrado")
+    item_tag = {'fonts': 'font', 'borders': 'border', 'cellXfs': 'xf'}[tag]
+    if match.group(2): # <fonts/> vazio
+        index = 0
+        body = f'<{tag}{match.group(1)}>{fragment}</{tag}>'
+        xml = xml[:match.start()] + body + xml[match.end():]
+    else:
+        end = re.search(rf'</{tag}>', xml[match.end():])
+        inner = xml[match.end():match.end() + end.start()]
+        existing = inner.find(fragment)
+        if existing >= 0: # Já registrado numa execução anterior
+            return xml, len(re.findall(rf'<{item_tag}[\s>/]', inner[:existing]))
+        index = len(re.findall(rf'<{item_tag}[\s>/]', inner))
+        xml = _insert_before(xml[:match.end() + end.end()], tag, fragment) + xml[match.end() + end.end():]
+    count = re.compile(rf'(<{tag}\b[^>]*?\bcount=")\d+(")')
+    if count.search(xml):
+        xml = count.sub(lambda m: f"{m.group(1)}{index + 1}{m.group(2)}", xml, count=1)
+    return xml, index
+
+def _add_header_style(styles_xml):
+    """
+    Registra no styles.xml o estilo do cabeçalho (negrito, borda fina, centralizado
+    no topo, como o DataFrame.to_excel). Retorna (styles_xml, índice do xf).
+    """
+    styles_xml, font_id = _append_to_collection(styles_xml, 'fonts', '<font><b val="1"/></font>')
+    styles_xml, border_id = _append_to_collection(
+        styles_xml, 'borders',
+        '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>')
+    styles_xml, xf_id = _append_to_collection(
+        styles_xml, 'cellXfs',
+        f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="{border_id}" xfId="0" applyFont="1" '
+        f'applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>')
+    return styles_xml, xf_id
+
+class StreamingSheetWriter:
+    """
+    Uso: writer = StreamingSheetWriter(caminho, aba, colunas); writer.write_rows(blocos...);
+    writer.close() (substitui o arquivo) ou writer.abort() (o original fica intacto).
+    Com `append_after_rows`, a aba precisa existir com exatamente esse nº de linhas
+    de dados (mais o cabeçalho); senão levanta SheetChangedError.
+    """
+    def __init__(self, caminho, nome_da_aba, columns, append_after_rows=None):
+        self.caminho = caminho
+        self._refs = [_column_letter(i) for i in range(len(columns))]
+        self._zin = zipfile.ZipFile(caminho)
+        self._zout = None
+        self._sheet = None
+        self._tail = b""
+        fd, self._tmp_path = tempfile.mkstemp(prefix=os.path.basename(caminho) + ".", suffix=".tmp",
+                                              dir=os.path.dirname(os.path.abspath(caminho)))
+        os.close(fd)
+        try:
+            self._open(nome_da_aba, columns, append_after_rows)
+        except BaseException:
+            self.abort()
+            raise
+
+    # --- Estrutura do workbook ---
+    def _read_text(self, part):
+        return self._zin.read(part).decode('utf-8')
+
+    def _workbook_part(self):
+        root = ET.fromstring(self._zin.read('_rels/.rels'))
+        for rel in root.iter(f'{{{NS_PKG_REL}}}Relationship'):
+            if rel.get('Type') == REL_OFFICE_DOCUMENT:
+                return _resolve('', rel.get('Target'))
+        return 'xl/workbook.xml'
+
+    def _open(self, nome_da_aba, columns, append_after_rows):
+        names = self._zin.namelist()
+        workbook_part = self._workbook_part()
+        workbook_dir = posixpath.dirname(workbook_part)
+        workbook_rels_part = _rels_path(workbook_part)
+        workbook_xml = self._read_text(workbook_part)
+        rels_xml = self._read_text(workbook_rels_part)
+
+        rels = {rel.get('Id'): rel for rel in ET.fromstring(rels_xml).iter(f'{{{NS_PKG_REL}}}Relationship')}
+        sheets = ET.fromstring(workbook_xml).iter(f'{{{NS_MAIN}}}sheet')
+        sheet_ids = []
+        sheet_part = None
+        for sheet in sheets:
+            sheet_ids.append(int(sheet.get('sheetId', 0)))
+            if sheet.get('name') == nome_da_aba:
+                sheet_part = _resolve(workbook_dir, rels[sheet.get(f'{{{NS_REL}}}id')].get('Target'))
+
+        replaced = {}  # parte -> novo conteúdo (bytes) ou None para remover
+        if append_after_rows is not None:
+            if sheet_part is None:
+                raise SheetChangedError(f"aba '{nome_da_aba}' não existe mais")
+            if self._count_rows(sheet_part) != append_after_rows + 1:
+                raise SheetChangedError("a aba foi alterada fora do consolidador")
+            self.row = append_after_rows + 1
+        else:
+            if sheet_part is None:
+                # Aba nova, no fim: parte, relacionamento e tipo de conteúdo novos
+                n = 1
+                while f"{workbook_dir}/worksheets/sheet{n}.xml" in names:
+                    n += 1
+                sheet_part = f"{workbook_dir}/worksheets/sheet{n}.xml"
+                rid = 1
+                while f"rId{rid}" in rels:
+                    rid += 1
+                prefix = re.search(rf'xmlns:(\w+)="{re.escape(NS_REL)}"', workbook_xml)
+                if prefix:
+                    workbook_xml = _insert_before(workbook_xml, 'sheets',
+                        f'<sheet name={quoteattr(nome_da_aba)} sheetId="{max(sheet_ids, default=0) + 1}" '
+                        f'{prefix.group(1)}:id="rId{rid}"/>')
+                else:
+                    workbook_xml = _insert_before(workbook_xml, 'sheets',
+                        f'<sheet xmlns:r="{NS_REL}" name={quoteattr(nome_da_aba)} '
+                        f'sheetId="{max(sheet_ids, default=0) + 1}" r:id="rId{rid}"/>')
+                rels_xml = _insert_before(rels_xml, 'Relationships',
+                    f'<Relationship Id="rId{rid}" Type="{REL_WORKSHEET}" '
+                    f'Target="{posixpath.relpath(sheet_part, workbook_dir)}"/>')
+                types_xml = _insert_before(self._read_text('[Content_Types].xml'), 'Types',
+                    f'<Override PartName="/{sheet_part}" ContentType="{CT_WORKSHEET}"/>')
+                replaced['[Content_Types].xml'] = types_xml.encode('utf-8')
+            else:
+                # Aba recriada no mesmo lugar: os anexos dela (desenhos, tabelas) saem e a
+                # cadeia de cálculo, que pode apontar para células dela, é refeita pelo Excel
+                replaced[_rels_path(sheet_part)] = None
+                for rid, rel in rels.items():
+                    if rel.get('Type') == REL_CALC_CHAIN:
+                        replaced[_resolve(workbook_dir, rel.get('Target'))] = None
+                        rels_xml = re.sub(rf'<(?:\w+:)?Relationship\b[^>]*\bId="{rid}"[^>]*/>', '', rels_xml)
+                        types_xml = re.sub(r'<Override\b[^>]*calcChain[^>]*/>', '',
+                                           self._read_text('[Content_Types].xml'))
+                        replaced['[Content_Types].xml'] = types_xml.encode('utf-8')
+            replaced[workbook_part] = workbook_xml.encode('utf-8')
+            replaced[workbook_rels_part] = rels_xml.encode('utf-8')
+
+            styles_part = next((_resolve(workbook_dir, rel.get('Target')) for rel in rels.values()
+                                if rel.get('Type') == NS_REL + "/styles"), None)
+            header_style = ""
+            if styles_part in names:
+                try:
+                    styles_xml, xf_id = _add_header_style(self._read_text(styles_part))
+                    replaced[styles_part] = styles_xml.encode('utf-8')
+                    header_style = f' s="{xf_id}"'
+                except ValueError:
+                    pass # styles.xml fora do padrão: cabeçalho sem formatação
+            self.row = 0
+        replaced.setdefault(sheet_part, None) # gerada por último, em streaming
+
+        # Cópia das demais partes, na ordem original ([Content_Types].xml primeiro)
+        self._zout = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_DEFLATED)
+        for info in self._zin.infolist():
+            if info.filename in replaced:
+                content = replaced[info.filename]
+                if content is not None and info.filename != sheet_part:
+                    self._zout.writestr(info.filename, content, zipfile.ZIP_DEFLATED)
+                continue
+            with self._zin.open(info) as src, self._zout.open(info.filename, 'w', force_zip64=True) as dst:
+                while block := src.read(COPY_BLOCK):
+                    dst.write(block)
+        for part, content in replaced.items():
+            if content is not None and part not in names:
+                self._zout.writestr(part, content, zipfile.ZIP_DEFLATED)
+
+        self._sheet = self._zout.open(sheet_part, 'w', force_zip64=True)
+        if append_after_rows is not None:
+            self._tail = self._copy_until_sheet_data_end(sheet_part)
+        else:
+            self._sheet.write(
+                f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}"><sheetData>'.encode('utf-8'))
+            self._tail = b'</sheetData></worksheet>'
+            check_excel_limits(1, len(columns))
+            self._write_row(columns, header_style)
+
+    def _count_rows(self, sheet_part):
+        """Última linha com alguma célula (como o max_row do openpyxl), lendo a aba em streaming."""
+        last = 0
+        with self._zin.open(sheet_part) as src:
+            parent = None
+            for event, elem in ET.iterparse(src, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{{{NS_MAIN}}}sheetData':
+                        parent = elem
+                    continue
+                if elem.tag == f'{{{NS_MAIN}}}row':
+                    if len(elem):
+                        last = max(last, int(elem.get('r', last + 1)))
+                    if parent is not None:
+                        parent.clear() # Só uma linha por vez na memória
+        return last
+
+    def _copy_until_sheet_data_end(self, sheet_part):
+        """Copia a aba até antes de </sheetData> (sem <dimension>, que ficaria errada); devolve o resto."""
+        src = self._zin.open(sheet_part)
+        try:
+            buffer = b""
+            head_done = False
+            while True:
+                block = src.read(COPY_BLOCK)
+                buffer += block
+                if not head_done:
+                    start = _SHEET_DATA_START.search(buffer)
+                    if start is None and block:
+                        continue
+                    cut = start.start() if start else len(buffer)
+                    buffer = _DIMENSION.sub(b'', buffer[:cut]) + buffer[cut:]
+                    head_done = True
+                end = _SHEET_DATA_END.search(buffer)
+                if end is not None:
+                    self._sheet.write(buffer[:end.start()])
+                    rest = [buffer[end.start():]]
+                    while block := src.read(COPY_BLOCK):
+                        rest.append(block)
+                    return b"".join(rest)
+                if not block:
+                    raise SheetChangedError("XML da aba sem </sheetData>")
+                # Guarda o final do bloco: a tag de fechamento pode estar dividida entre leituras
+                self._sheet.write(buffer[:-64])
+                buffer = buffer[-64:]
+        finally:
+            src.close()
+
+    # --- Escrita ---
+    def _write_row(self, values, style_attr=""):
+        self.row += 1
+        refs = self._refs
+        cells = "".join(_cell_xml(f"{refs[i]}{self.row}", v, style_attr) for i, v in enumerate(values))
+        self._sheet.write(f'<row r="{self.row}">{cells}</row>'.encode('utf-8'))
+
+    def write_rows(self, rows):
+        check_excel_limits(self.row + len(rows), len(self._refs))
+        refs = self._refs
+        parts = []
+        for values in rows:
+            self.row += 1
+            n = self.row
+            parts.append(f'<row r="{n}">')
+            parts.extend(_cell_xml(f"{refs[i]}{n}", v) for i, v in enumerate(values))
+            parts.append('</row>')
+        self._sheet.write("".join(parts).encode('utf-8'))
+
+    def close(self):
+        self._sheet.write(self._tail)
+        self._sheet.close()
+        self._zout.close()
+        self._zin.close()
+        os.replace(self._tmp_path, self.caminho)
+
+    def abort(self):
+        for handle in (self._sheet, self._zout, self._zin):
+            try:
+                if handle is not None:
+                    handle.close()
+            except Exception:
+                pass
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
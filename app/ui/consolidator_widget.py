@@ -3,10 +3,10 @@
 import os # <-- Adicionamos a importação de 'os' para juntar os caminhos
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QFileDialog,
-    QRadioButton, QButtonGroup, QGroupBox
+    QRadioButton, QButtonGroup, QGroupBox, QCheckBox
 )
 from PySide6.QtCore import Qt
-from app.tasks.excel_consolidator import processar_logs_para_excel
+from app.workers import ExcelConsolidatorWorker
 
 class ConsolidatorWidget(QWidget):
     def __init__(self):
@@ -58,25 +58,49 @@ class ConsolidatorWidget(QWidget):
         self.dynamic_input_layout.addWidget(self.dynamic_label)
         self.dynamic_input_layout.addWidget(self.dynamic_input_edit)
         output_layout.addLayout(self.dynamic_input_layout)
+
+        # Modo incremental: só lê os logs que ainda não estão na aba (ver manifesto do consolidador)
+        self.incremental_check = QCheckBox("Acrescentar apenas logs novos (ignora os já consolidados)")
+        self.incremental_check.setChecked(False)
+        output_layout.addWidget(self.incremental_check)
         output_group.setLayout(output_layout)
         self.layout.addWidget(output_group)
 
         # Conecta a mudança dos radio buttons a uma função que ATUALIZA TODA A UI
         self.radio_existing.toggled.connect(self._update_output_mode)
         
-        process_button = QPushButton("GERAR RELATÓRIO")
-        process_button.setStyleSheet("font-size: 14px; padding: 10px; margin-top: 10px;")
-        process_button.clicked.connect(self._iniciar_processamento)
-        self.layout.addWidget(process_button, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.process_button = QPushButton("GERAR RELATÓRIO")
+        self.process_button.setStyleSheet("font-size: 14px; padding: 10px; margin-top: 10px;")
+        self.process_button.clicked.connect(self._iniciar_processamento)
+
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.setStyleSheet("font-size: 14px; padding: 10px; margin-top: 10px;")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self._cancelar_processamento)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.process_button)
+        buttons_layout.addWidget(self.cancel_button)
+        buttons_layout.addStretch()
+        self.layout.addLayout(buttons_layout)
         
         self.status_label = QLabel("Pronto para iniciar.")
         self.status_label.setStyleSheet("margin-top: 15px;")
+        self.status_label.setWordWrap(True)
         self.layout.addWidget(self.status_label)
+
+        # Tempo gasto em cada fase da última execução
+        self.timings_label = QLabel("")
+        self.timings_label.setStyleSheet("color: #666; font-size: 11px;")
+        self.timings_label.setWordWrap(True)
+        self.layout.addWidget(self.timings_label)
         
         self._update_output_mode() # <-- Chama a função uma vez para configurar a UI inicial
 
     def _update_output_mode(self):
         """Atualiza a UI com base no modo de saída selecionado (novo vs. existente)."""
+        self.incremental_check.setEnabled(self.radio_existing.isChecked())
         if self.radio_existing.isChecked():
             self.select_output_button.setText("Selecionar Arquivo Existente...")
             self.dynamic_label.setText("Nome da Aba:")
@@ -134,8 +158,27 @@ class ConsolidatorWidget(QWidget):
             return
 
         self.status_label.setText("Processando... Por favor, aguarde.")
-        from PySide6.QtWidgets import QApplication
-        QApplication.processEvents()
+        self.timings_label.setText("")
+        self.process_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+
+        # A leitura roda em thread separada; o progresso chega por signal
+        incremental = self.radio_existing.isChecked() and self.incremental_check.isChecked()
+        self.worker = ExcelConsolidatorWorker(lista_arquivos, caminho_final_excel, nome_aba, incremental)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.timings.connect(lambda resumo: self.timings_label.setText(f"Tempos: {resumo}"))
+        self.worker.finished.connect(self._on_finished)
+        self.worker.start()
+
+    def _cancelar_processamento(self):
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelando... aguardando o arquivo atual terminar.")
+        self.worker.cancel()
+
+    def _on_progress(self, arquivos_concluidos, total_arquivos, mensagem):
+        self.status_label.setText(f"Processando... {arquivos_concluidos}/{total_arquivos} arquivos, {mensagem}.")
 
-        resultado = processar_logs_para_excel(lista_arquivos, caminho_final_excel, nome_aba)
+    def _on_finished(self, resultado):
+        self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
         self.status_label.setText(resultado)
\ No newline at end of file
@@ -1,17 +1,13 @@
 # app/ui/grade_creator_widget.py
 
-import pandas as pd
-import os
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QWidget, 
     QLabel, QLineEdit, QGroupBox, QMessageBox
 )
 from PySide6.QtCore import Qt
 
-# Imports
-from app.tasks.mapping_manager import mapping_manager
-from app.tasks.schedule_processor import find_unmapped_programs
-from app.workers import GradeExtractionWorker, GradeComparisonWorker, EpgGeneratorWorker
+# Imports (as tasks entram sob demanda, dentro dos métodos, para a janela abrir rápido)
+from app.workers import GradeExtractionWorker, GradeComparisonWorker, EpgGeneratorWorker, GradePipelineWorker
 # Importe sua classe MappingEditorWidget do local correto (se for arquivo separado)
 # from app.ui.mapping_editor_widget import MappingEditorWidget 
 
@@ -27,6 +23,7 @@ class GradeCreatorWidget(QWidget):
         # Variáveis de estado
         self.current_output_path = None
         self.current_anterior_path = None
+        self.current_output_paths = {}
         
         # Layout Principal
         self.layout = QVBoxLayout(self)
@@ -120,13 +117,39 @@ class GradeCreatorWidget(QWidget):
         group3.setLayout(layout3)
         self.layout.addWidget(group3)
 
+        # ============================================================
+        # BLOCO 4: TUDO DE UMA VEZ (uma extração, três arquivos)
+        # ============================================================
+        self.btn_all = QPushButton("Gerar Tudo (Simples + Comparada + EPG)")
+        self.btn_all.setStyleSheet("padding: 8px; font-weight: bold; margin-top: 10px;")
+        self.btn_all.setToolTip("Lê os PDFs uma única vez e grava as três saídas em paralelo.\n"
+                                "Sem grade anterior selecionada, a Comparada é pulada.")
+        self.btn_all.clicked.connect(self._run_all)
+        self.layout.addWidget(self.btn_all)
+
         # --- Status ---
         self.status_label = QLabel("Pronto.")
         self.status_label.setStyleSheet("margin-top: 15px; font-size: 12px; color: green; font-weight: bold;")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.status_label.setWordWrap(True)
         self.layout.addWidget(self.status_label)
+
+        # Tempo gasto em cada fase da última tarefa
+        self.timings_label = QLabel("")
+        self.timings_label.setStyleSheet("color: #666; font-size: 11px;")
+        self.timings_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.timings_label.setWordWrap(True)
+        self.layout.addWidget(self.timings_label)
+
+        self.btn_cancel = QPushButton("Cancelar")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self._cancel_task)
+        self.layout.addWidget(self.btn_cancel, alignment=Qt.AlignmentFlag.AlignCenter)
         self.layout.addStretch()
 
+        # Worker em execução (alvo do botão Cancelar)
+        self.active_worker = None
+
     # --- Funções Auxiliares de UI ---
     def _select_pdfs(self):
         paths, _ = QFileDialog.getOpenFileNames(self, "Selecione os PDFs", filter="Arquivos PDF (*.pdf)")
@@ -155,16 +178,18 @@ class GradeCreatorWidget(QWidget):
             return
 
         self._lock_ui("Verificando mapeamento...")
-        self.extraction_worker = GradeExtractionWorker(self.selected_pdf_files)
+        # Vários PDFs (um por dia) são lidos em paralelo
+        self.extraction_worker = GradeExtractionWorker(self.selected_pdf_files, parallel=True)
         self.extraction_worker.finished.connect(
             lambda df, error: self._handle_mapping_check(df, error, run_mode)
         )
-        self.extraction_worker.start()
+        self._start_worker(self.extraction_worker)
 
     def _handle_mapping_check(self, df_extracted, error, run_mode):
         if error:
             self._unlock_ui(); self.status_label.setText(error); return
 
+        from app.tasks.schedule_processor import find_unmapped_programs
         unmapped, map_error = find_unmapped_programs(df_extracted=df_extracted)
         
         if unmapped:
@@ -180,6 +205,7 @@ class GradeCreatorWidget(QWidget):
                 if run_mode == 'simple': self._run_simple_schedule()
                 elif run_mode == 'comparison': self._run_comparison()
                 elif run_mode == 'epg': self._run_epg()
+                elif run_mode == 'all': self._check_and_start_processing('all')
             else:
                 self.status_label.setText("Mapeamento cancelado.")
         else:
@@ -187,6 +213,7 @@ class GradeCreatorWidget(QWidget):
             if run_mode == 'simple': self._start_simple(df_extracted)
             elif run_mode == 'comparison': self._start_comparison(df_extracted)
             elif run_mode == 'epg': self._start_epg(df_extracted)
+            elif run_mode == 'all': self._start_all(df_extracted)
 
     # --- Runners ---
     def _run_simple_schedule(self):
@@ -197,12 +224,10 @@ class GradeCreatorWidget(QWidget):
 
     def _start_simple(self, df):
         self._lock_ui("Gerando Planilha Simples...")
-        try:
-            df.to_excel(self.current_output_path, index=False, sheet_name="Grade Limpa")
-            self.status_label.setText(f"Sucesso! Salvo em '{os.path.basename(self.current_output_path)}'")
-        except Exception as e:
-            self.status_label.setText(f"Erro: {e}")
+        from app.tasks.schedule_processor import save_simple_schedule
+        msg = save_simple_schedule(df, self.current_output_path)
         self._unlock_ui()
+        self.status_label.setText(msg)
 
     def _run_comparison(self):
         if "Nenhuma" in self.anterior_path_edit.text():
@@ -218,7 +243,7 @@ class GradeCreatorWidget(QWidget):
         self._lock_ui("Gerando Grade Comparada...")
         self.comp_worker = GradeComparisonWorker(df, self.anterior_path_edit.text(), self.current_output_path)
         self.comp_worker.finished.connect(self._finish_task)
-        self.comp_worker.start()
+        self._start_worker(self.comp_worker)
 
     def _run_epg(self):
         path, _ = QFileDialog.getSaveFileName(self, "Salvar EPG...", filter="Excel (*.xlsx)")
@@ -230,19 +255,57 @@ class GradeCreatorWidget(QWidget):
         self._lock_ui("Gerando EPG e Atualizando Banco de Dados...")
         self.epg_worker = EpgGeneratorWorker(df, self.current_output_path)
         self.epg_worker.finished.connect(self._finish_task)
-        self.epg_worker.start()
+        self._start_worker(self.epg_worker)
+
+    def _run_all(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Salvar Tudo (nome base)...", filter="Excel (*.xlsx)")
+        if path:
+            # Um nome escolhido -> Nome_simples / Nome_comparada / Nome_epg
+            from app.tasks.schedule_processor import pipeline_output_paths
+            has_template = "Nenhuma" not in self.anterior_path_edit.text()
+            self.current_output_paths = pipeline_output_paths(path, include_comparison=has_template)
+            self._check_and_start_processing('all')
+
+    def _start_all(self, df):
+        self._lock_ui("Gerando Simples, Comparada e EPG...")
+        anterior = self.anterior_path_edit.text() if 'comparison' in self.current_output_paths else None
+        self.pipeline_worker = GradePipelineWorker(df, self.current_output_paths, anterior)
+        self.pipeline_worker.finished.connect(self._finish_task)
+        self._start_worker(self.pipeline_worker)
 
     def _finish_task(self, msg):
         self._unlock_ui()
         self.status_label.setText(msg)
 
+    # --- Progresso / Cancelamento ---
+    def _start_worker(self, worker):
+        self.active_worker = worker
+        self.timings_label.setText("")
+        worker.progress.connect(self._on_progress)
+        worker.timings.connect(lambda resumo: self.timings_label.setText(f"Tempos: {resumo}"))
+        self.btn_cancel.setEnabled(True)
+        worker.start()
+
+    def _on_progress(self, atual, total, mensagem):
+        self.status_label.setText(f"Processando {atual}/{total}: {mensagem}")
+
+    def _cancel_task(self):
+        if self.active_worker is not None and self.active_worker.isRunning():
+            self.btn_cancel.setEnabled(False)
+            self.status_label.setText("Cancelando...")
+            self.active_worker.cancel()
+
     def _lock_ui(self, msg):
         self.status_label.setText(msg)
         self.btn_simple.setEnabled(False)
         self.btn_compare.setEnabled(False)
         self.btn_epg.setEnabled(False)
+        self.btn_all.setEnabled(False)
 
     def _unlock_ui(self):
+        self.active_worker = None
+        self.btn_cancel.setEnabled(False)
         self.btn_simple.setEnabled(True)
         self.btn_compare.setEnabled(True)
-        self.btn_epg.setEnabled(True)
\ No newline at end of file
+        self.btn_epg.setEnabled(True)
+        self.btn_all.setEnabled(True)
\ No newline at end of file
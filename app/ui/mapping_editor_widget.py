@@ -4,49 +4,240 @@
 import pandas as pd
 import os
 import shutil
+from bisect import bisect_left, bisect_right
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableView, QAbstractItemView,
-    QHeaderView, QMessageBox, QFileDialog
+    QHeaderView, QMessageBox, QFileDialog, QLineEdit, QApplication
 )
-from PySide6.QtCore import Qt, QAbstractTableModel
-from app.tasks.mapping_manager import mapping_manager
+from PySide6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex
+from app.tasks.mapping_manager import get_mapping_manager
+from app.tasks.mapping_search import MappingSearchIndex
+
+# Coluna extra do modo aprendizado (não é gravada no CSV)
+SUGGESTION_COLUMN = "Sugestão"
 
 # --- Modelo de Dados para a Tabela ---
-class PandasModel(QAbstractTableModel):
-    """Um modelo de tabela que exibe um DataFrame do Pandas."""
+class ColumnTableModel(QAbstractTableModel):
+    """
+    Modelo de tabela guardado como uma lista Python por coluna: leitura e edição
+    de célula são O(1) (sem iloc). Inserções/remoções avisam a view com
+    beginInsertRows/beginRemoveRows. to_dataframe() devolve o DataFrame editado.
+    """
     def __init__(self, data):
         super().__init__()
-        self._data = data
+        self._headers = [str(c) for c in data.columns]
+        self._columns = [data[c].tolist() for c in data.columns]
 
-    def rowCount(self, parent=None):
-        return self._data.shape[0]
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns[0]) if self._columns else 0
 
-    def columnCount(self, parent=None):
-        return self._data.shape[1]
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns)
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         if index.isValid():
             if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.EditRole:
-                return str(self._data.iloc[index.row(), index.column()])
+                return str(self._columns[index.column()][index.row()])
         return None
 
-    def setData(self, index, value, role):
-        if role == Qt.ItemDataRole.EditRole:
-            self._data.iloc[index.row(), index.column()] = value
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role == Qt.ItemDataRole.EditRole and index.isValid():
+            self._columns[index.column()][index.row()] = value
+            self.dataChanged.emit(index, index, [role])
             return True
         return False
 
-    def headerData(self, section, orientation, role):
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
         if role == Qt.ItemDataRole.DisplayRole:
             if orientation == Qt.Orientation.Horizontal:
-                return str(self._data.columns[section])
+                return self._headers[section]
             if orientation == Qt.Orientation.Vertical:
-                return str(self._data.index[section])
+                return str(section)
         return None
-    
+
     def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
         return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsEditable
 
+    def insertRows(self, row, count, parent=QModelIndex()):
+        """Insere `count` linhas vazias ("") a partir de `row`."""
+        if count <= 0 or parent.isValid():
+            return False
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+        for column in self._columns:
+            column[row:row] = [""] * count
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if count <= 0 or parent.isValid():
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        for column in self._columns:
+            del column[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def remove_rows(self, rows):
+        """
+        Remove as linhas indicadas (qualquer ordem, repetidas ignoradas) agrupando-as
+        em faixas contíguas: uma notificação por faixa, de baixo para cima.
+        """
+        ranges = []
+        for row in sorted(set(rows)):
+            if ranges and row == ranges[-1][1] + 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        for first, last in reversed(ranges):
+            self.removeRows(first, last - first + 1)
+        return len(ranges)
+
+    def column_index(self, name):
+        return self._headers.index(name)
+
+    def column_values(self, name):
+        """Lista (viva, não copie à toa) com os valores da coluna `name`."""
+        return self._columns[self.column_index(name)]
+
+    def to_dataframe(self):
+        return pd.DataFrame({h: list(col) for h, col in zip(self._headers, self._columns)}, columns=self._headers)
+
+class RowFilterProxyModel(QAbstractProxyModel):
+    """
+    Mostra só as linhas de origem devolvidas por `row_filter(modelo, linhas)` (None = todas),
+    que recebe as linhas a conferir e devolve, em ordem, as que passam.
+    A lista é calculada uma vez por filtro, sem um filterAcceptsRow por linha; linhas
+    inseridas/removidas na origem viram inserções/remoções na vista (sem reset),
+    e o filtro só roda sobre as linhas novas.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._row_filter = None
+        self._rows = None # linhas de origem visíveis, em ordem (None = todas)
+        self._positions = {}
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.dataChanged.connect(self._on_source_data_changed)
+        model.rowsAboutToBeInserted.connect(self._on_source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._on_source_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._on_source_rows_about_to_be_removed)
+        model.rowsRemoved.connect(self._on_source_rows_removed)
+        model.modelReset.connect(self.refresh)
+        self.refresh()
+
+    def set_filter(self, row_filter):
+        self._row_filter = row_filter
+        self.refresh()
+
+    def refresh(self, *args):
+        self.beginResetModel()
+        source = self.sourceModel()
+        if self._row_filter and source is not None:
+            self._rows = list(self._row_filter(source, range(source.rowCount())))
+        else:
+            self._rows = None
+        self._update_positions()
+        self.endResetModel()
+
+    def _update_positions(self):
+        self._positions = {row: i for i, row in enumerate(self._rows)} if self._rows is not None else {}
+
+    def _shift_rows(self, start, delta):
+        """Desloca de `delta` as linhas de origem visíveis a partir da posição `start` da vista."""
+        if start >= len(self._rows):
+            return
+        self._rows[start:] = [row + delta for row in self._rows[start:]]
+        self._update_positions()
+        # Cabeçalho vertical mostra o número da linha de origem
+        self.headerDataChanged.emit(Qt.Orientation.Vertical, start, len(self._rows) - 1)
+
+    # --- Inserção / remoção na origem ---
+    def _on_source_rows_about_to_be_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.endInsertRows()
+            return
+        position = bisect_left(self._rows, first)
+        self._shift_rows(position, last - first + 1)
+        accepted = list(self._row_filter(self.sourceModel(), range(first, last + 1)))
+        if accepted:
+            self.beginInsertRows(QModelIndex(), position, position + len(accepted) - 1)
+            self._rows[position:position] = accepted
+            self._update_positions()
+            self.endInsertRows()
+
+    def _on_source_rows_about_to_be_removed(self, parent, first, last):
+        if self._rows is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        # Linhas de origem em ordem: as removidas formam uma faixa contínua na vista
+        start, end = bisect_left(self._rows, first), bisect_right(self._rows, last)
+        if start < end:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            del self._rows[start:end]
+            self._update_positions()
+            self.endRemoveRows()
+
+    def _on_source_rows_removed(self, parent, first, last):
+        if self._rows is None:
+            self.endRemoveRows()
+            return
+        self._shift_rows(bisect_left(self._rows, first), -(last - first + 1))
+
+    def _on_source_data_changed(self, top_left, bottom_right, roles=()):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            proxy_row = row if self._rows is None else self._positions.get(row)
+            if proxy_row is not None:
+                self.dataChanged.emit(self.index(proxy_row, top_left.column()),
+                                      self.index(proxy_row, bottom_right.column()), roles)
+
+    def rowCount(self, parent=QModelIndex()):
+        source = self.sourceModel()
+        if parent.isValid() or source is None:
+            return 0
+        return len(self._rows) if self._rows is not None else source.rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        source = self.sourceModel()
+        if parent.isValid() or source is None:
+            return 0
+        return source.columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount() and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row() if self._rows is None else self._rows[proxy_index.row()]
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row() if self._rows is None else self._positions.get(source_index.row())
+        return QModelIndex() if row is None else self.index(row, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Vertical and self._rows is not None and 0 <= section < len(self._rows):
+            section = self._rows[section] # Número da linha no arquivo, não na vista filtrada
+        return self.sourceModel().headerData(section, orientation, role)
+
 class MappingEditorWidget(QDialog):
     def __init__(self, parent=None, new_unmapped_list=None):
         super().__init__(parent)
@@ -63,8 +254,20 @@ class MappingEditorWidget(QDialog):
             self.setWindowTitle("Gerenciador de Mapeamento DE-PARA")
             self.setup_editing_mode()
 
+        # Filtro ao vivo (índice de trigramas, ver app/tasks/mapping_search.py)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filtrar por Nome do PDF ou Nome Padronizado...")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self._apply_filter)
+        self.layout.addWidget(self.filter_edit)
+
+        self._filter_index = None # Montado no primeiro filtro, a partir da tabela
+        self.model.dataChanged.connect(self._on_model_data_changed)
+        self.proxy = RowFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+
         self.table_view = QTableView()
-        self.table_view.setModel(self.model)
+        self.table_view.setModel(self.proxy)
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.layout.addWidget(self.table_view)
@@ -77,6 +280,13 @@ class MappingEditorWidget(QDialog):
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.remove_button)
 
+        if new_unmapped_list:
+            self.apply_suggestions_button = QPushButton("Aplicar Sugestões")
+            self.apply_suggestions_button.setToolTip("Copia a Sugestão para o Nome Padronizado vazio\n"
+                                                     "das linhas selecionadas (ou de todas, sem seleção).")
+            self.apply_suggestions_button.clicked.connect(self.apply_suggestions)
+            button_layout.addWidget(self.apply_suggestions_button)
+
         self.change_path_button = QPushButton("Alterar Local do Arquivo...")
         # =======================================================
         # == MUDANÇA 1: Conexão do botão                     ==
@@ -101,40 +311,93 @@ class MappingEditorWidget(QDialog):
 
     def setup_editing_mode(self):
         """Carrega o CSV completo para edição."""
-        mapping_df, error = mapping_manager.load_mapping_as_df()
+        mapping_df, error = get_mapping_manager().load_mapping_as_df()
         if error:
             QMessageBox.critical(self, "Erro", error)
             mapping_df = pd.DataFrame(columns=["Nome_do_PDF", "Nome_Padronizado"])
-        self.model = PandasModel(mapping_df)
+            self.base_df = None
+        else:
+            # Versão carregada: no salvamento, se o arquivo tiver mudado, só o delta é aplicado
+            self.base_df = mapping_df.copy()
+        self.model = ColumnTableModel(mapping_df)
 
     def setup_learning_mode(self, new_unmapped_list):
-        """Cria um DF apenas com os novos programas para o usuário preencher."""
+        """
+        Cria um DF apenas com os novos programas para o usuário preencher, com a
+        Sugestão (Nome Padronizado existente mais parecido) ao lado de cada um.
+        """
+        index, _ = get_mapping_manager().get_search_index()
+        suggestions = []
+        for raw_name in new_unmapped_list:
+            best = index.suggest(raw_name, limit=1) if index is not None else []
+            suggestions.append(best[0][0] if best else "")
+
         data = {
             "Nome_do_PDF": new_unmapped_list,
-            "Nome_Padronizado": [""] * len(new_unmapped_list)
+            "Nome_Padronizado": [""] * len(new_unmapped_list),
+            SUGGESTION_COLUMN: suggestions,
         }
-        self.model = PandasModel(pd.DataFrame(data))
+        self.model = ColumnTableModel(pd.DataFrame(data))
+
+    def apply_suggestions(self):
+        """Preenche o Nome_Padronizado vazio com a Sugestão (linhas selecionadas ou todas)."""
+        selected = self.table_view.selectionModel().selectedRows()
+        if selected:
+            rows = [self.proxy.mapToSource(index).row() for index in selected]
+        else:
+            rows = range(self.model.rowCount())
+
+        standard_col = self.model.column_values("Nome_Padronizado")
+        suggestion_col = self.model.column_values(SUGGESTION_COLUMN)
+        target = self.model.column_index("Nome_Padronizado")
+        for row in rows:
+            if not str(standard_col[row]).strip() and suggestion_col[row]:
+                self.model.setData(self.model.index(row, target), suggestion_col[row])
+
+    # --- Filtro ---
+    def _apply_filter(self, text):
+        if not text.strip():
+            self.proxy.set_filter(None)
+            return
+        if self._filter_index is None:
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                self._filter_index = MappingSearchIndex(zip(self.model.column_values("Nome_do_PDF"),
+                                                            self.model.column_values("Nome_Padronizado")))
+            finally:
+                QApplication.restoreOverrideCursor()
+
+        matches = self._filter_index.search(text)
+        if matches is None:
+            self.proxy.set_filter(None)
+            return
+
+        def row_filter(model, rows):
+            raw_col = model.column_values("Nome_do_PDF")
+            standard_col = model.column_values("Nome_Padronizado")
+            return [row for row in rows if raw_col[row] in matches or standard_col[row] in matches]
+        self.proxy.set_filter(row_filter)
+
+    def _on_model_data_changed(self, top_left, bottom_right, roles=()):
+        # Textos editados entram no índice do filtro (não saem: a linha é conferida na hora)
+        if self._filter_index is None:
+            return
+        raw_col = self.model.column_values("Nome_do_PDF")
+        standard_col = self.model.column_values("Nome_Padronizado")
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self._filter_index.add(raw_col[row], standard_col[row])
 
     def save_and_close(self):
         """
         Salva as alterações no arquivo CSV e fecha a janela.
         """
-        new_data_df = self.model._data
+        new_data_df = self.model.to_dataframe().drop(columns=[SUGGESTION_COLUMN], errors='ignore')
 
         if self.new_unmapped_list:
-            old_data_df, error = mapping_manager.load_mapping_as_df()
-            if error:
-                QMessageBox.critical(self, "Erro Crítico", f"Não foi possível ler o arquivo de mapeamento existente para atualizá-lo.\n\n{error}")
-                return
-            combined_df = pd.concat([old_data_df, new_data_df], ignore_index=True)
-            combined_df.drop_duplicates(subset=['Nome_do_PDF'], keep='last', inplace=True)
-            combined_df.dropna(subset=['Nome_Padronizado'], inplace=True)
-            combined_df = combined_df[combined_df['Nome_Padronizado'].str.strip() != '']
-            df_to_save = combined_df
+            # Só as entradas novas vão para o diário do mapeamento (o CSV não é reescrito)
+            success, message = get_mapping_manager().append_mapping_entries(new_data_df)
         else:
-            df_to_save = new_data_df
-
-        success, message = mapping_manager.save_mapping_from_df(df_to_save)
+            success, message = get_mapping_manager().save_mapping_from_df(new_data_df, base_df=self.base_df)
         
         if success:
             if not self.new_unmapped_list:
@@ -145,10 +408,12 @@ class MappingEditorWidget(QDialog):
 
     def add_row(self):
         """Adiciona uma nova linha em branco no final da tabela."""
-        df = self.model._data
-        new_row = pd.DataFrame([["", ""]], columns=df.columns)
-        self.model._data = pd.concat([df, new_row], ignore_index=True)
-        self.model.layoutChanged.emit()
+        # A linha nova (vazia) não passaria no filtro: volta a mostrar tudo
+        if self.filter_edit.text():
+            self.filter_edit.clear()
+        row = self.model.rowCount()
+        self.model.insertRows(row, 1)
+        self.table_view.scrollToBottom()
 
     def remove_row(self):
         """Remove a(s) linha(s) selecionada(s)."""
@@ -157,11 +422,8 @@ class MappingEditorWidget(QDialog):
             QMessageBox.warning(self, "Aviso", "Por favor, selecione uma linha para remover.")
             return
         
-        for index in sorted(selected_indexes, reverse=True):
-            self.model._data = self.model._data.drop(index.row())
-        
-        self.model._data.reset_index(drop=True, inplace=True)
-        self.model.layoutChanged.emit()
+        # Faixas contíguas removidas de uma vez (sem refazer o layout inteiro)
+        self.model.remove_rows(self.proxy.mapToSource(index).row() for index in selected_indexes)
 
     # =======================================================
     # == MUDANÇA 2: Método _change_mapping_path SUBSTITUÍDO  ==
@@ -191,7 +453,7 @@ class MappingEditorWidget(QDialog):
 
     def _connect_to_existing_file(self):
         """Abre um diálogo para ABRIR um arquivo e atualiza a configuração."""
-        current_path = mapping_manager.get_mapping_filepath()
+        current_path = get_mapping_manager().get_mapping_filepath()
         
         new_path, _ = QFileDialog.getOpenFileName(
             self,
@@ -201,15 +463,14 @@ class MappingEditorWidget(QDialog):
         )
         
         if new_path:
-            mapping_manager.set_mapping_filepath(new_path)
+            get_mapping_manager().set_mapping_filepath(new_path)
             QMessageBox.information(self, "Conectado com Sucesso",
-                                  f"Configuração atualizada.\nO programa agora usará o arquivo:\n'{new_path}'.\n\n"
-                                  "Por favor, reinicie a aplicação para que a mudança tenha efeito completo.")
+                                  f"Configuração atualizada.\nO programa agora usará o arquivo:\n'{new_path}'.")
             self.accept()
 
     def _move_to_new_file(self):
         """Abre um diálogo para SALVAR um novo arquivo, move os dados e atualiza a configuração."""
-        current_path = mapping_manager.get_mapping_filepath()
+        current_path = get_mapping_manager().get_mapping_filepath()
         
         new_path, _ = QFileDialog.getSaveFileName(
             self,
@@ -224,13 +485,19 @@ class MappingEditorWidget(QDialog):
                 QMessageBox.warning(self, "Aviso", "O novo local é o mesmo que o atual. Nenhuma alteração foi feita.")
                 return
 
+            # O diário fica ao lado do CSV: consolida antes para não deixá-lo para trás
+            ok, compact_message = get_mapping_manager().compact_journal()
+            if not ok:
+                QMessageBox.warning(self, "Aviso", f"{compact_message}\nNenhuma alteração foi feita.")
+                return
+
             try:
                 shutil.move(current_path, new_path)
                 msg = f"Mapeamento movido com sucesso para:\n'{new_path}'."
-                mapping_manager.set_mapping_filepath(new_path)
+                get_mapping_manager().set_mapping_filepath(new_path)
             except Exception as e:
                 msg = f"Não foi possível mover o arquivo ({e}). Nenhuma alteração foi feita."
 
             QMessageBox.information(self, "Operação Concluída", 
-                                  f"{msg}\n\nPor favor, reinicie a aplicação para que a mudança tenha efeito completo.")
+                                  msg)
             self.accept()
\ No newline at end of file
@@ -1,59 +1,96 @@
 # app/workers.py
 from PySide6.QtCore import QThread, Signal
-import pandas as pd
 
-# Importando a Lógica de Negócio (Tasks)
 # Mantemos a organização: a inteligência fica em 'tasks', a execução paralela fica aqui.
-from app.tasks.excel_consolidator import processar_logs_para_excel
-from app.tasks.schedule_processor import (
-    extract_and_clean_from_pdfs,
-    generate_comparison_report,
-    generate_epg_from_simple_schedule
-)
+# As tasks (pandas, fitz, openpyxl...) são importadas dentro de execute(), já na
+# thread do worker: abrir a janela não paga o custo dessas bibliotecas.
+from app.tasks.task_control import CancelToken, TaskControl
+
+# ============================================================================
+# BASE: progresso, cancelamento e tempo por fase (comum a todos os workers)
+# ============================================================================
+class BaseTaskWorker(QThread):
+    """
+    Subclasses definem o signal `finished`, implementam `execute()` (retorna a
+    tupla de argumentos do `finished`) e `on_error(e)` (idem, para exceções).
+    As tasks recebem `self.control`, que repassa o progresso, verifica o
+    cancelamento e mede as fases; o resumo de tempos sai em `timings` antes do `finished`.
+    """
+    progress = Signal(int, int, str) # atual, total, mensagem
+    timings = Signal(str)            # "Fase A: 1.20s | Fase B: 0.30s"
+
+    def __init__(self):
+        super().__init__()
+        self.cancel_token = CancelToken()
+        self.control = TaskControl(progress_callback=self.progress.emit, cancel_token=self.cancel_token)
+
+    def cancel(self):
+        """Pede o cancelamento; a task para no próximo ponto de verificação."""
+        self.cancel_token.cancel()
+
+    def execute(self):
+        raise NotImplementedError
+
+    def on_error(self, e):
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            result = self.execute()
+        except Exception as e:
+            result = self.on_error(e)
+        if self.control.timings:
+            self.timings.emit(self.control.format_timings())
+        self.finished.emit(*result)
 
 # ============================================================================
 # WORKER 1: Consolidador de Logs (Para a primeira ferramenta)
 # ============================================================================
-class ExcelConsolidatorWorker(QThread):
+class ExcelConsolidatorWorker(BaseTaskWorker):
     finished = Signal(str) # Retorna a mensagem de sucesso ou erro
 
-    def __init__(self, arquivos, saida, aba):
+    def __init__(self, arquivos, saida, aba, incremental=False):
         super().__init__()
         self.arquivos = arquivos
         self.saida = saida
         self.aba = aba
+        self.incremental = incremental # Só acrescenta os logs que ainda não foram consolidados
 
-    def run(self):
-        try:
-            # Chama a função original que está em app/tasks/excel_consolidator.py
-            resultado = processar_logs_para_excel(self.arquivos, self.saida, self.aba)
-            self.finished.emit(resultado)
-        except Exception as e:
-            self.finished.emit(f"Erro Crítico no Worker: {str(e)}")
+    def execute(self):
+        # Chama a função original que está em app/tasks/excel_consolidator.py
+        from app.tasks.excel_consolidator import processar_logs_para_excel
+        resultado = processar_logs_para_excel(self.arquivos, self.saida, self.aba,
+                                              control=self.control, incremental=self.incremental)
+        return (resultado,)
+
+    def on_error(self, e):
+        return (f"Erro Crítico no Worker: {str(e)}",)
 
 # ============================================================================
 # WORKER 2: Extração de PDF (Usado por Comparador e EPG)
 # ============================================================================
-class GradeExtractionWorker(QThread):
+class GradeExtractionWorker(BaseTaskWorker):
     # Retorna dois valores: O DataFrame (se der certo) e a Mensagem de Erro (se der errado)
-    finished = Signal(object, str) 
+    finished = Signal(object, str)
 
-    def __init__(self, pdf_paths):
+    def __init__(self, pdf_paths, parallel=False):
         super().__init__()
         self.pdf_paths = pdf_paths
+        self.parallel = parallel # Lê os PDFs em um pool de processos
 
-    def run(self):
-        try:
-            # Chama a função de extração e ordenação em app/tasks/schedule_processor.py
-            df, erro = extract_and_clean_from_pdfs(self.pdf_paths)
-            self.finished.emit(df, erro)
-        except Exception as e:
-            self.finished.emit(None, f"Erro inesperado na thread de extração: {e}")
+    def execute(self):
+        # Chama a função de extração e ordenação em app/tasks/schedule_processor.py
+        from app.tasks.schedule_processor import extract_and_clean_from_pdfs
+        df, erro = extract_and_clean_from_pdfs(self.pdf_paths, parallel=self.parallel, control=self.control)
+        return (df, erro)
+
+    def on_error(self, e):
+        return (None, f"Erro inesperado na thread de extração: {e}")
 
 # ============================================================================
 # WORKER 3: Comparação de Grades (Pinta de Verde)
 # ============================================================================
-class GradeComparisonWorker(QThread):
+class GradeComparisonWorker(BaseTaskWorker):
     finished = Signal(str)
 
     def __init__(self, df_novo, path_anterior, path_saida):
@@ -62,18 +99,20 @@ class GradeComparisonWorker(QThread):
         self.path_anterior = path_anterior
         self.path_saida = path_saida
 
-    def run(self):
-        try:
-            # Chama a função de comparação estética em app/tasks/schedule_processor.py
-            resultado = generate_comparison_report(self.df_novo, self.path_anterior, self.path_saida)
-            self.finished.emit(resultado)
-        except Exception as e:
-            self.finished.emit(f"Erro na thread de comparação: {e}")
+    def execute(self):
+        # Chama a função de comparação estética em app/tasks/schedule_processor.py
+        from app.tasks.schedule_processor import generate_comparison_report
+        resultado = generate_comparison_report(self.df_novo, self.path_anterior, self.path_saida,
+                                               control=self.control)
+        return (resultado,)
+
+    def on_error(self, e):
+        return (f"Erro na thread de comparação: {e}",)
 
 # ============================================================================
 # WORKER 4: Gerador de EPG (Visual de TV)
 # ============================================================================
-class EpgGeneratorWorker(QThread):
+class EpgGeneratorWorker(BaseTaskWorker):
     finished = Signal(str)
 
     def __init__(self, df_grade, path_saida):
@@ -81,10 +120,33 @@ class EpgGeneratorWorker(QThread):
         self.df_grade = df_grade
         self.path_saida = path_saida
 
-    def run(self):
-        try:
-            # Chama a função de EPG em app/tasks/schedule_processor.py
-            resultado = generate_epg_from_simple_schedule(self.df_grade, self.path_saida)
-            self.finished.emit(resultado)
-        except Exception as e:
-            self.finished.emit(f"Erro na thread de EPG: {e}")
\ No newline at end of file
+    def execute(self):
+        # Chama a função de EPG em app/tasks/schedule_processor.py
+        from app.tasks.schedule_processor import generate_epg_from_simple_schedule
+        resultado = generate_epg_from_simple_schedule(self.df_grade, self.path_saida, control=self.control)
+        return (resultado,)
+
+    def on_error(self, e):
+        return (f"Erro na thread de EPG: {e}",)
+
+# ============================================================================
+# WORKER 5: Pipeline completo (Simples + Comparada + EPG de uma vez)
+# ============================================================================
+class GradePipelineWorker(BaseTaskWorker):
+    finished = Signal(str)
+
+    def __init__(self, df_grade, output_paths, path_anterior=None):
+        super().__init__()
+        self.df_grade = df_grade
+        self.output_paths = output_paths # {'simple'|'comparison'|'epg': caminho}
+        self.path_anterior = path_anterior
+
+    def execute(self):
+        # Os três escritores recebem o mesmo DataFrame, extraído uma única vez
+        from app.tasks.schedule_processor import generate_all_outputs
+        resultado = generate_all_outputs(self.df_grade, self.output_paths, self.path_anterior,
+                                         control=self.control)
+        return (resultado,)
+
+    def on_error(self, e):
+        return (f"Erro na thread do pipeline: {e}",)
@@ -0,0 +1,192 @@
+# Execução em lote (sem interface): extrai os PDFs de cada canal e gera
+# Planilha Simples, Grade Comparada e EPG, um canal por processo.
+# Não abre o loop de eventos do Qt nem importa widgets (só QtCore, via tasks).
+#
+# Uso:
+#   python batch_cli.py ENTRADA [ENTRADA ...] --saida DIR [opções]
+#
+# ENTRADA pode ser:
+#   - uma pasta com uma subpasta por canal (cada subpasta com os PDFs da semana);
+#   - uma pasta de um canal só (PDFs direto nela);
+#   - um glob entre aspas, ex. "grades/*/semana45_*.pdf" (canal = pasta do PDF).
+#
+# Grade anterior (template da Comparada), por canal, na ordem:
+#   --templates DIR com <canal>.xlsx; um único .xlsx dentro da pasta do canal;
+#   --template ARQUIVO (vale para todos). Sem template, a Comparada é pulada.
+import sys
+import os
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+def _pdfs_in(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                  if f.lower().endswith('.pdf') and os.path.isfile(os.path.join(folder, f)))
+
+def discover_channels(entradas):
+    """Retorna {canal: {'pdfs': [...], 'pasta': pasta}} a partir de pastas e/ou globs."""
+    canais = {}
+
+    def add(canal, pasta, pdfs):
+        entry = canais.setdefault(canal, {'pdfs': [], 'pasta': pasta})
+        entry['pdfs'].extend(p for p in pdfs if p not in entry['pdfs'])
+
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            pasta = os.path.abspath(entrada)
+            diretos = _pdfs_in(pasta)
+            if diretos:
+                add(os.path.basename(pasta), pasta, diretos)
+            for nome in sorted(os.listdir(pasta)):
+                sub = os.path.join(pasta, nome)
+                if os.path.isdir(sub):
+                    pdfs = _pdfs_in(sub)
+                    if pdfs:
+                        add(nome, sub, pdfs)
+        else:
+            for pdf in sorted(glob.glob(entrada, recursive=True)):
+                if pdf.lower().endswith('.pdf') and os.path.isfile(pdf):
+                    pasta = os.path.dirname(os.path.abspath(pdf))
+                    add(os.path.basename(pasta), pasta, [os.path.abspath(pdf)])
+
+    for entry in canais.values():
+        entry['pdfs'].sort()
+    return canais
+
+def find_template(canal, pasta, templates_dir=None, template_padrao=None):
+    """Grade anterior do canal (ver ordem no topo do arquivo) ou None."""
+    if templates_dir:
+        for ext in EXCEL_EXTENSIONS:
+            candidato = os.path.join(templates_dir, canal + ext)
+            if os.path.isfile(candidato):
+                return candidato
+    # Saídas de execuções anteriores (_simples/_comparada/_epg) não contam como template
+    from app.tasks.schedule_processor import PIPELINE_OUTPUTS
+    excels = [os.path.join(pasta, f) for f in sorted(os.listdir(pasta))
+              if f.lower().endswith(EXCEL_EXTENSIONS) and not f.startswith('~$')
+              and not os.path.splitext(f)[0].endswith(tuple(PIPELINE_OUTPUTS.values()))]
+    if len(excels) == 1:
+        return excels[0]
+    return template_padrao
+
+def run_channel(job):
+    """Processa um canal (roda no processo filho). Retorna um dict com o resultado."""
+    # Import aqui: cada processo carrega as tasks (e os singletons) por conta própria
+    from app.tasks.schedule_processor import (
+        extract_and_clean_from_pdfs, find_unmapped_programs, generate_all_outputs, pipeline_output_paths
+    )
+    from app.tasks.task_control import TaskControl
+
+    inicio = time.perf_counter()
+    resultado = {'canal': job['canal'], 'ok': False, 'nao_mapeados': []}
+    control = TaskControl()
+
+    df, erro = extract_and_clean_from_pdfs(job['pdfs'], parallel=job['pdfs_em_paralelo'], control=control)
+    if erro:
+        resultado['mensagem'] = erro
+        return resultado
+
+    unmapped, map_error = find_unmapped_programs(df_extracted=df)
+    if map_error:
+        resultado['mensagem'] = map_error
+        return resultado
+    resultado['nao_mapeados'] = [p for p in unmapped if str(p).strip()]
+    if resultado['nao_mapeados'] and job['exigir_mapeamento']:
+        resultado['mensagem'] = f"{len(resultado['nao_mapeados'])} programas sem DE-PARA; nada foi gerado."
+        return resultado
+
+    os.makedirs(job['saida'], exist_ok=True)
+    paths = pipeline_output_paths(os.path.join(job['saida'], job['canal'] + '.xlsx'),
+                                  include_comparison=bool(job['template']))
+    for kind in job['pular']:
+        paths.pop(kind, None)
+
+    mensagem = generate_all_outputs(df, paths, job['template'], writer=job['writer'], control=control)
+    resultado['ok'] = mensagem.startswith("Sucesso")
+    resultado['mensagem'] = mensagem
+    resultado['tempos'] = control.format_timings()
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+def _print_result(r):
+    status = "OK  " if r['ok'] else "ERRO"
+    print(f"[{status}] {r['canal']}: {r['mensagem']}")
+    if r.get('segundos') is not None:
+        print(f"       {r['segundos']:.1f}s | {r.get('tempos', '')}")
+    if r['nao_mapeados']:
+        amostra = ", ".join(r['nao_mapeados'][:10])
+        extra = "..." if len(r['nao_mapeados']) > 10 else ""
+        print(f"       Sem DE-PARA ({len(r['nao_mapeados'])}): {amostra}{extra}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera Simples, Comparada e EPG por canal, sem interface.")
+    parser.add_argument('entradas', nargs='+', help="Pastas (uma subpasta por canal) ou globs de PDFs.")
+    parser.add_argument('--saida', required=True, help="Pasta de saída (um subdiretório por canal).")
+    parser.add_argument('--templates', help="Pasta com a grade anterior de cada canal (<canal>.xlsx).")
+    parser.add_argument('--template', help="Grade anterior usada pelos canais sem template próprio.")
+    parser.add_argument('--processos', type=int, default=0,
+                        help="Canais processados ao mesmo tempo (padrão: nº de CPUs).")
+    parser.add_argument('--writer', choices=('openpyxl', 'xlsxwriter'), default='openpyxl',
+                        help="Escritor da Grade Comparada (xlsxwriter é mais rápido, copia só o cabeçalho).")
+    parser.add_argument('--sem-simples', action='store_true', help="Não gera a Planilha Simples.")
+    parser.add_argument('--sem-epg', action='store_true', help="Não gera o EPG (nem atualiza o banco).")
+    parser.add_argument('--exigir-mapeamento', action='store_true',
+                        help="Não gera nada para o canal que tiver programas sem DE-PARA.")
+    args = parser.parse_args(argv)
+
+    canais = discover_channels(args.entradas)
+    if not canais:
+        print("Nenhum PDF encontrado nas entradas informadas.")
+        return 1
+
+    processos = args.processos or os.cpu_count() or 1
+    processos = max(1, min(processos, len(canais)))
+    pular = [kind for kind, flag in (('simple', args.sem_simples), ('epg', args.sem_epg)) if flag]
+
+    jobs = []
+    for canal, entry in sorted(canais.items()):
+        template = find_template(canal, entry['pasta'], args.templates, args.template)
+        jobs.append({
+            'canal': canal,
+            'pdfs': entry['pdfs'],
+            'template': template,
+            'saida': os.path.join(os.path.abspath(args.saida), canal),
+            'writer': args.writer,
+            'pular': pular,
+            'exigir_mapeamento': args.exigir_mapeamento,
+            # Com vários canais em paralelo, cada canal lê seus PDFs em sequência
+            'pdfs_em_paralelo': processos == 1,
+        })
+        origem = os.path.basename(template) if template else "sem template (Comparada pulada)"
+        print(f"- {canal}: {len(entry['pdfs'])} PDFs, {origem}")
+    print(f"Processando {len(jobs)} canais em {processos} processo(s)...")
+
+    inicio = time.perf_counter()
+    resultados = []
+    if processos == 1:
+        for job in jobs:
+            resultados.append(run_channel(job))
+            _print_result(resultados[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futures = {executor.submit(run_channel, job): job['canal'] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    r = future.result()
+                except Exception as e:
+                    r = {'canal': futures[future], 'ok': False, 'mensagem': f"Erro inesperado: {e}", 'nao_mapeados': []}
+                resultados.append(r)
+                _print_result(r)
+
+    falhas = [r['canal'] for r in resultados if not r['ok']]
+    print(f"Concluído em {time.perf_counter() - inicio:.1f}s: {len(resultados) - len(falhas)} ok, {len(falhas)} com erro.")
+    return 1 if falhas else 0
+
+if __name__ == '__main__':
+    # Necessário para o pool de processos no executável (PyInstaller)
+    multiprocessing.freeze_support()
+    sys.exit(main())
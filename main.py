@@ -1,21 +1,42 @@
 # main.py
 import sys
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QCoreApplication # <-- Adicionar importação
-from app.ui.main_window import MainWindow
+import multiprocessing
+
+def run(profiler=None):
+    # Qt e a janela são importados aqui: com --profile-startup o gancho de medição
+    # já está instalado e enxerga todas as importações da abertura
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QCoreApplication, QTimer
+    from app.tasks.app_context import ORGANIZATION_NAME, APPLICATION_NAME
 
-def run():
     # =======================================================
     # == ADIÇÃO IMPORTANTE PARA APPDATA                    ==
     # =======================================================
-    QCoreApplication.setOrganizationName("SuaOrganizacao") # Pode ser seu nome ou da empresa
-    QCoreApplication.setApplicationName("AutomateTools")
+    QCoreApplication.setOrganizationName(ORGANIZATION_NAME) # Pode ser seu nome ou da empresa
+    QCoreApplication.setApplicationName(APPLICATION_NAME)
     # =======================================================
 
+    from app.ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
+    if profiler: profiler.mark("QApplication criada")
     window = MainWindow()
+    if profiler: profiler.mark("MainWindow criada")
     window.show()
+    if profiler:
+        # Primeiro ciclo do event loop: a janela já foi desenhada
+        QTimer.singleShot(0, profiler.finish)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    # Necessário para o pool de processos da extração no executável (PyInstaller)
+    multiprocessing.freeze_support()
+
+    profiler = None
+    from app import startup_profiler
+    if startup_profiler.requested(sys.argv):
+        if startup_profiler.PROFILE_FLAG in sys.argv:
+            sys.argv.remove(startup_profiler.PROFILE_FLAG)
+        profiler = startup_profiler.StartupProfiler()
+        profiler.install()
+    run(profiler)
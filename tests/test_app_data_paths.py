@@ -0,0 +1,83 @@
+# tests/test_app_data_paths.py
+"""
+Pastas AppData de cada manager, iguais às da versão em que eram criados na importação:
+mapeamento e cache de extração na pasta resolvida ANTES de o main.py definir
+organização/aplicação; banco EPG e relatório de inicialização na pasta resolvida DEPOIS.
+Cada cenário roda em um processo novo (os nomes do QCoreApplication são globais).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Como a versão anterior resolvia as pastas: sem nomes (managers criados na importação
+# do main_window) e depois dos nomes (banco EPG criado ao gerar o primeiro EPG)
+BASELINE = """
+    from PySide6.QtCore import QCoreApplication, QStandardPaths
+    location = QStandardPaths.StandardLocation.AppDataLocation
+    antes = QStandardPaths.writableLocation(location)
+    QCoreApplication.setOrganizationName("SuaOrganizacao")
+    QCoreApplication.setApplicationName("AutomateTools")
+    result = {"antes": antes, "depois": QStandardPaths.writableLocation(location)}
+"""
+
+# Ordem do main.py atual: nomes, QApplication e os managers criados sob demanda
+MANAGERS = """
+    from PySide6.QtCore import QCoreApplication
+    from PySide6.QtWidgets import QApplication
+    from app.tasks.app_context import ORGANIZATION_NAME, APPLICATION_NAME
+    QCoreApplication.setOrganizationName(ORGANIZATION_NAME)
+    QCoreApplication.setApplicationName(APPLICATION_NAME)
+    app = QApplication([])
+    from app.tasks.mapping_manager import get_mapping_manager
+    from app.tasks.extraction_cache import get_extraction_cache
+    from app.tasks.epg_database_manager import get_epg_manager
+    from app import startup_profiler
+    profiler = startup_profiler.StartupProfiler()
+    profiler.finish()
+    result = {
+        "mapeamento": os.path.dirname(get_mapping_manager().get_mapping_filepath()),
+        "config": os.path.dirname(get_mapping_manager().config_filepath),
+        "cache": os.path.dirname(get_extraction_cache().cache_dir),
+        "epg": os.path.dirname(get_epg_manager().filepath),
+        "epg_db": os.path.dirname(get_epg_manager().db_path),
+        "nomes": [QCoreApplication.organizationName(), QCoreApplication.applicationName()],
+    }
+"""
+
+# Sem nomes nem QApplication (batch_cli): mesmas pastas da janela
+BATCH = """
+    from app.tasks.app_context import root_data_dir, app_data_dir
+    result = {"raiz": root_data_dir(), "programa": app_data_dir()}
+"""
+
+def _run(tmp_path, body):
+    script = "import json, os, sys\n" + textwrap.dedent(body) + "print(json.dumps(result))\n"
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_DATA_HOME=str(tmp_path / "data"),
+               PYTHONPATH=REPO, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def test_managers_keep_baseline_folders(tmp_path):
+    base = _run(tmp_path, BASELINE)
+    assert base["antes"] != base["depois"]
+
+    paths = _run(tmp_path, MANAGERS)
+    assert os.path.normpath(paths["mapeamento"]) == os.path.normpath(base["antes"])
+    assert os.path.normpath(paths["config"]) == os.path.normpath(base["antes"])
+    assert os.path.normpath(paths["cache"]) == os.path.normpath(base["antes"])
+    assert os.path.normpath(paths["epg"]) == os.path.normpath(base["depois"])
+    assert os.path.normpath(paths["epg_db"]) == os.path.normpath(base["depois"])
+    assert os.path.exists(os.path.join(base["depois"], "startup_profile.txt"))
+    assert paths["nomes"] == ["SuaOrganizacao", "AutomateTools"]
+
+def test_batch_uses_same_folders_without_app_names(tmp_path):
+    base = _run(tmp_path, BASELINE)
+    paths = _run(tmp_path, BATCH)
+    assert os.path.normpath(paths["raiz"]) == os.path.normpath(base["antes"])
+    assert os.path.normpath(paths["programa"]) == os.path.normpath(base["depois"])
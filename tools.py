@@ -1,40 +1,21 @@
 # Ferramenta local: analisa duas planilhas (nova vs anterior) e gera relatório
 import sys
 import os
-import unicodedata
-import re
 import pandas as pd
 from datetime import datetime
-
-def norm(s):
-    if pd.isna(s): return ""
-    s = str(s).strip()
-    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
-    s = re.sub(r'\s+', ' ', s)
-    return s.lower()
+from app.tasks.schedule_keys import build_weekday_keys, normalize_time_series
+from app.tasks.schedule_diff import diff_schedules
+from app.tasks.template_reader import get_template_reader
+from app.tasks.text_normalization import normalize_text, normalize_series
 
 def try_read_excel(path):
-    # tenta header=0 e header=2 (mesma heurística do projeto)
-    tried = []
-    for header in (0, 2):
-        try:
-            df = pd.read_excel(path, header=header)
-            # limpa colunas unnamed e strip
-            df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-            df.columns = df.columns.str.strip()
-            # verifica se tem colunas mínimas
-            if 'Data' in df.columns and 'Horario' in df.columns:
-                print(f"Leitura bem sucedida: header={header} para '{path}'")
-                return df
-            tried.append((header, list(df.columns)))
-        except Exception as e:
-            tried.append((header, f"erro:{e}"))
-    # Se não encontrou 'Data'/'Horario', devolve o último df lido (ou levanta)
-    print(f"Atenção: não foi possível detectar 'Data'/'Horario' com header 0/2. Tentativas: {tried}")
-    # Tentar abrir com header=0 mesmo assim para mostrar colunas/erro
-    df = pd.read_excel(path, header=0)
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    df.columns = df.columns.str.strip()
+    # uma leitura só: o cabeçalho é a linha que contém 'Data'/'Horario'
+    df, header = get_template_reader().read(path)
+    if 'Data' in df.columns and 'Horario' in df.columns:
+        print(f"Leitura bem sucedida: cabeçalho na linha {header['header_row']} para '{path}'")
+    else:
+        print(f"Atenção: não foi possível detectar 'Data'/'Horario' nas primeiras linhas. "
+              f"Usando a linha {header['header_row']}: {list(df.columns)}")
     return df
 
 def detect_program_column(df):
@@ -47,64 +28,11 @@ def detect_program_column(df):
         if c in df.columns:
             return c
     # fallback: procura coluna cujo nome contenha 'program' (ignorando acentos e case)
-    def strip_acc(s):
-        s = unicodedata.normalize('NFKD', str(s)).encode('ascii', 'ignore').decode('utf-8')
-        return s.lower()
     for c in df.columns:
-        if 'program' in strip_acc(c) or 'programa' in strip_acc(c) or 'nome' in strip_acc(c):
+        if 'program' in normalize_text(c) or 'programa' in normalize_text(c) or 'nome' in normalize_text(c):
             return c
     return None
 
-def _normalize_time_to_hhmm(value):
-    """Retorna string 'HH:MM' a partir de vários formatos (str, time, Timestamp)."""
-    if pd.isna(value):
-        return "00:00"
-    # se vier como objeto com hour/minute (p.ex. python datetime.time ou pandas Timestamp)
-    try:
-        if hasattr(value, 'hour') and hasattr(value, 'minute'):
-            h = int(value.hour)
-            m = int(value.minute)
-            return f"{h:02}:{m:02}"
-    except Exception:
-        pass
-    s = str(value).strip()
-    # procura HH:MM dentro da string (aceita HH:MM(:SS) também)
-    m = re.search(r'(\d{1,2}:\d{2})', s)
-    if m:
-        hhmm = m.group(1)
-        # normaliza padding (ex: '7:5' -> '07:05' não esperado, mas tratar)
-        parts = hhmm.split(':')
-        h = int(parts[0]); mm = int(parts[1])
-        return f"{h:02}:{mm:02}"
-    # fallback: tenta converter com pandas e extrair hora/min
-    try:
-        ts = pd.to_datetime(s, errors='coerce', dayfirst=True)
-        if not pd.isna(ts):
-            return f"{ts.hour:02}:{ts.minute:02}"
-    except Exception:
-        pass
-    # último recurso: pega primeiros 5 caracteres (ruim, mas evita crash)
-    return (s + "00000")[:5]
-
-def get_weekday_key(row, day_index_map=None):
-    """
-    Gera chave baseada em Índice Sequencial de Dia (0-6: sábado-sexta) + HH:MM.
-    Aceita 'Data' como string/objeto e 'Horario' em vários formatos.
-    Se day_index_map for fornecido, usa o mapa para converter Data → índice.
-    """
-    try:
-        data_str = str(row.get('Data', ''))
-        if day_index_map and data_str in day_index_map:
-            day_index = day_index_map[data_str]
-        else:
-            # fallback: não temos mapa, assume índice 0
-            day_index = 0
-        
-        time_str = _normalize_time_to_hhmm(row.get('Horario', ""))
-        return f"{day_index}_{time_str}"
-    except Exception:
-        return f"ERR_{row.get('Data')}_{row.get('Horario')}"
-
 def analyze(nova_path, antiga_path, out_path="grade_diff_report.xlsx", sample_limit=20):
     print("cwd:", os.getcwd())
     print("nova_path:", nova_path)
@@ -148,23 +76,23 @@ def analyze(nova_path, antiga_path, out_path="grade_diff_report.xlsx", sample_li
     day_index_map_antigo = {date_str: idx for idx, date_str in enumerate(unique_dates_antigo)}
 
     # Normaliza Horario na própria tabela para consistência
-    df_novo['Horario_norm'] = df_novo['Horario'].apply(_normalize_time_to_hhmm)
-    df_antigo['Horario_norm'] = df_antigo['Horario'].apply(_normalize_time_to_hhmm)
+    df_novo['Horario_norm'] = normalize_time_series(df_novo['Horario'], na_value="00:00", zero_pad=True)
+    df_antigo['Horario_norm'] = normalize_time_series(df_antigo['Horario'], na_value="00:00", zero_pad=True)
     # redefine a coluna Horario usada para chave (manter o original também)
     df_novo['Horario'] = df_novo['Horario_norm']
     df_antigo['Horario'] = df_antigo['Horario_norm']
 
     # Gera chaves com mapa de índices de dia
-    df_novo['chave'] = df_novo.apply(lambda row: get_weekday_key(row, day_index_map_novo), axis=1)
-    df_antigo['chave'] = df_antigo.apply(lambda row: get_weekday_key(row, day_index_map_antigo), axis=1)
+    df_novo['chave'] = build_weekday_keys(df_novo, day_index_map_novo)
+    df_antigo['chave'] = build_weekday_keys(df_antigo, day_index_map_antigo)
 
     # Normaliza programas padronizados (do antigo) e novos
     if 'Programa_Padronizado' in df_antigo.columns:
-        df_antigo['prog_norm'] = df_antigo['Programa_Padronizado'].astype(str).apply(norm)
+        df_antigo['prog_norm'] = normalize_series(df_antigo['Programa_Padronizado'].astype(str))
     else:
         # fallback: use detected coluna se existir
         if prog_col_antiga:
-            df_antigo['prog_norm'] = df_antigo[prog_col_antiga].astype(str).apply(norm)
+            df_antigo['prog_norm'] = normalize_series(df_antigo[prog_col_antiga].astype(str))
         else:
             df_antigo['prog_norm'] = pd.Series([""] * len(df_antigo))
 
@@ -178,32 +106,19 @@ def analyze(nova_path, antiga_path, out_path="grade_diff_report.xlsx", sample_li
     else:
         raise SystemExit(f"Não foi possível localizar coluna de programa na planilha nova. Colunas: {list(df_novo.columns)}")
 
-    df_novo['prog_norm'] = df_novo[col_novo].astype(str).apply(norm)
-
-    # Mapa antigo: chave -> programa (usa última ocorrência)
-    mapa_antigo = df_antigo.drop_duplicates(subset=['chave'], keep='last').set_index('chave')['prog_norm'].to_dict()
-
-    registros = []
-    for _, row in df_novo.iterrows():
-        chave = row['chave']
-        novo = row['prog_norm']
-        antigo = mapa_antigo.get(chave, None)
-        status = 'SEM MUDANÇA'
-        if antigo is None or antigo == "":
-            status = 'NOVO'
-        elif antigo != novo:
-            status = 'ALTERADO'
-        registros.append({
-            'Data': row['Data'],
-            'Horario': row['Horario'],
-            'Programa_Original': row.get(col_novo, ''),
-            'Programa_Normalizado': novo,
-            'Chave': chave,
-            'Antigo_Normalizado': antigo if antigo is not None else '',
-            'Status': status
-        })
-
-    df_reg = pd.DataFrame(registros)
+    df_novo['prog_norm'] = normalize_series(df_novo[col_novo].astype(str))
+
+    # Diff por junção na chave (mesmo motor do relatório comparativo)
+    df_diff = diff_schedules(df_novo, df_antigo, programa_novo='prog_norm', programa_antigo='prog_norm', metadata_columns=[])
+    df_reg = pd.DataFrame({
+        'Data': df_novo['Data'].to_numpy(),
+        'Horario': df_novo['Horario'].to_numpy(),
+        'Programa_Original': df_novo[col_novo].to_numpy(),
+        'Programa_Normalizado': df_diff['Programa'],
+        'Chave': df_diff['chave'],
+        'Antigo_Normalizado': df_diff['Programa_Anterior'],
+        'Status': df_diff['Status'].astype(str),
+    })
     counts = df_reg['Status'].value_counts().to_dict()
 
     # Resumo no console